@@ -0,0 +1,108 @@
+# api/AIChat/archive.py
+"""
+Cold tier for chat history.
+
+Conversations idle for CHAT_ARCHIVE_AFTER_DAYS have their messages moved
+into one zstd-compressed JSON object under `archives/` in Storage
+(jobs/chat_archive.py); the conversation row stays behind as a stub with
+its preview, counters and `archive_path`. Reading an archived conversation
+moves its messages back into `messages` first, so callers never see the
+difference and an active conversation is never archived. Restoring bumps
+`updated_at`, and every archive gets its own object, so a rehydration that
+removes its archive late can never delete a newer one.
+"""
+import uuid
+import orjson
+import zstandard
+from core.database import supabase
+from core.storage import BUCKET, remove_paths
+from core.utils import run_query
+
+ARCHIVE_PREFIX = "archives"
+# Archiving runs in the background, so it can afford a slow, dense level
+ZSTD_LEVEL = 19
+MESSAGE_COLUMNS = "id, conversation_id, role, content, created_at"
+
+
+class ArchiveConflict(Exception):
+    """The conversation changed while it was being archived"""
+
+
+def archive_path(conversation):
+    """A new object path for each archive of `conversation`"""
+    return (f"{ARCHIVE_PREFIX}/conversations/{conversation['user_id']}/"
+            f"{conversation['id']}.{uuid.uuid4().hex[:12]}.json.zst")
+
+
+def unpack(blob):
+    return orjson.loads(zstandard.ZstdDecompressor().decompress(blob))
+
+
+async def archive_conversation(conversation):
+    """
+    Move `conversation`'s messages into a Storage archive.
+    Returns (raw_bytes, compressed_bytes, message_count). Raises
+    ArchiveConflict, after removing the upload, when a message arrived
+    between reading the history and deleting it.
+    """
+    result = await run_query(
+        lambda: supabase.table("messages")
+        .select(MESSAGE_COLUMNS)
+        .eq("conversation_id", conversation["id"])
+        .order("created_at")
+        .execute()
+    )
+    messages = result.data or []
+    raw = orjson.dumps(messages)
+    blob = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    path = archive_path(conversation)
+
+    await run_query(lambda: supabase.storage.from_(BUCKET).upload(
+        path, blob, {"content-type": "application/zstd", "upsert": "true"}
+    ))
+    # Deletes the rows and leaves the stub only if the history is still the one uploaded
+    archived = await run_query(lambda: supabase.rpc("archive_conversation_messages", {
+        "p_conversation_id": conversation["id"],
+        "p_path": path,
+        "p_bytes": len(blob),
+        "p_raw_bytes": len(raw),
+        "p_message_count": len(messages),
+    }).execute())
+    if not archived.data:
+        await remove_paths([path])
+        raise ArchiveConflict(conversation["id"])
+    return len(raw), len(blob), len(messages)
+
+
+async def rehydrate(conversation_id, path):
+    """
+    Move an archived conversation's messages back into `messages` and drop
+    its archive. Returns the archived messages; concurrent rehydrations
+    restore them once. When another request restored the conversation and
+    removed its archive first, the download fails and the restored messages
+    are read back from `messages` instead.
+    """
+    try:
+        blob = await run_query(lambda: supabase.storage.from_(BUCKET).download(path))
+    except Exception:
+        conversation = await run_query(
+            lambda: supabase.table("conversations").select("archive_path").eq("id", conversation_id).execute()
+        )
+        if conversation.data and conversation.data[0].get("archive_path"):
+            raise
+        result = await run_query(
+            lambda: supabase.table("messages")
+            .select(MESSAGE_COLUMNS)
+            .eq("conversation_id", conversation_id)
+            .order("created_at")
+            .execute()
+        )
+        return result.data or []
+    messages = unpack(blob)
+    restored = await run_query(lambda: supabase.rpc("restore_conversation_messages", {
+        "p_conversation_id": conversation_id,
+        "p_messages": messages,
+    }).execute())
+    if restored.data:
+        await remove_paths([path])
+    return messages
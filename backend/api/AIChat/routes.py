@@ -1,24 +1,32 @@
 from fastapi import Depends, APIRouter, HTTPException
-import os
-from groq import Groq
+import asyncio
 from dotenv import load_dotenv
 from pydantic import BaseModel
 from core.database import supabase
-import fitz  # PyMuPDF
 import httpx
 import re
 from io import BytesIO
-from pptx import Presentation
-from docx import Document
 from core.security import get_current_user
+from core.routing import FastJSONRoute
 from datetime import datetime
+from core.llm import LLMUnavailable, llm
+from core.ratelimit import llm_limiter
+from core.tokens import PromptTooLarge, count_text, fit_messages
+from core.utils import run_query
+from api.AIChat.archive import rehydrate
 from api.AIChat.schemas import ConversationCreate, MessageCreate, ChatMessage
+from api.files.service import get_extracted_text, save_extracted_text
 from uuid import uuid4
 
 load_dotenv()
 
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+
+# Sidebar preview length and the columns /get-conversations returns
+PREVIEW_CHARS = 120
+CONVERSATION_LIST_COLUMNS = (
+    "id, title, created_at, updated_at, last_message, last_message_role, last_message_at, message_count, token_total"
+)
 
 
 @router.post("/start-conversation")
@@ -49,10 +57,24 @@ def generate_title_from_message(message: str) -> str:
 
 
 
+def message_preview(content: str) -> str:
+    # Whitespace collapsed so multi-line answers still fill the sidebar line
+    preview = " ".join(content.split())
+    return preview[:PREVIEW_CHARS - 3] + "..." if len(preview) > PREVIEW_CHARS else preview
+
+
 @router.get("/get-conversations")
 async def get_conversations(user = Depends(get_current_user)):
     try:
-        result = supabase.table("conversations").select("*").eq("user_id", user["id"]).order("updated_at", desc=True).execute()
+        # Previews and counters live on the row (maintained by append_message), so the
+        # sidebar needs no per-conversation message loads
+        result = await run_query(
+            lambda: supabase.table("conversations")
+            .select(CONVERSATION_LIST_COLUMNS)
+            .eq("user_id", user["id"])
+            .order("updated_at", desc=True)
+            .execute()
+        )
         return {"conversations": result.data}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -61,20 +83,22 @@ async def get_conversations(user = Depends(get_current_user)):
 @router.post("/save-message")
 async def save_message(message: MessageCreate):
     try:
-        new_message = {
-            "id": str(uuid4()),
-            "conversation_id": message.conversation_id,
-            "role": message.role,
-            "content": message.content,
-            "created_at": datetime.utcnow().isoformat()
-        }
-
-        supabase.table("conversations").update({
-            "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", message.conversation_id).execute()
-
-        result = supabase.table("messages").insert(new_message).execute()
-        return {"success": True}
+        tokens = await asyncio.to_thread(count_text, message.content)
+        # Inserts the message and updates the conversation's preview and counters in one statement
+        result = await run_query(lambda: supabase.rpc("append_message", {
+            "p_id": str(uuid4()),
+            "p_conversation_id": message.conversation_id,
+            "p_role": message.role,
+            "p_content": message.content,
+            "p_tokens": tokens,
+            "p_preview": message_preview(message.content),
+        }).execute())
+
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        return {"success": True, "conversation": result.data}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -82,14 +106,26 @@ async def save_message(message: MessageCreate):
 @router.get("/get-messages/{conversation_id}")
 async def get_messages(conversation_id: str):
     try:
-        result = supabase.table("messages").select("*").eq("conversation_id", conversation_id).order("created_at", desc=False).execute()
-        return {"messages": result.data}
+        conversation, result = await asyncio.gather(
+            run_query(lambda: supabase.table("conversations").select("archive_path").eq("id", conversation_id).execute()),
+            run_query(
+                lambda: supabase.table("messages").select("*").eq("conversation_id", conversation_id).order("created_at", desc=False).execute()
+            ),
+        )
+        messages = result.data
+        archived = conversation.data[0].get("archive_path") if conversation.data else None
+        if archived:
+            # Idle conversations live in a compressed archive; opening one brings it back
+            hot = {message["id"] for message in messages}
+            restored = [message for message in await rehydrate(conversation_id, archived) if message["id"] not in hot]
+            messages = sorted(restored + messages, key=lambda message: message["created_at"])
+        return {"messages": messages}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/ai-chat")
-async def ai_chat(messages: list[ChatMessage]):
+async def ai_chat(messages: list[ChatMessage], user=Depends(get_current_user)):
     try:
         last_message = messages[-1].content.lower()
 
@@ -97,40 +133,61 @@ async def ai_chat(messages: list[ChatMessage]):
             file_name = extract_file_name_from_message(last_message)
             file_result = supabase.table("files").select("file_name").eq("file_name", file_name).execute()
             if file_result.data:
-                return await explain_file(file_name)
+                return await explain_file(file_name, user)
         except HTTPException as fe:
             if fe.status_code != 400:
                 raise fe
 
-        chat_completion = client.chat.completions.create(
-            messages=[msg.dict() for msg in messages],
-            model="llama-3.3-70b-versatile",
-        )
-        reply = chat_completion.choices[0].message.content
-        return {"reply": reply}
+        payload = [msg.dict() for msg in messages]
+        # Counted and fitted locally (documents can be large), so an oversized prompt never reaches the provider
+        try:
+            budget = await asyncio.to_thread(fit_messages, payload)
+        except PromptTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+        # Per-user budgets and a fair share of the global concurrency; 429 when exhausted
+        async with llm_limiter.acquire(user["id"], budget.reserved_tokens) as permit:
+            try:
+                completion = await llm.complete(budget.messages, max_tokens=budget.max_output_tokens)
+            except LLMUnavailable as e:
+                raise HTTPException(status_code=503, detail=f"AI service unavailable: {str(e)}")
+            if completion.usage.get("total_tokens"):
+                permit.settle(completion.usage["total_tokens"])
+        return {"reply": completion.content, "tokens": {**budget.as_dict(), "usage": completion.usage}}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"AI request failed: {str(e)}")
 
 
 @router.post("/explain_file")
-async def explain_file(file_name: str):
+async def explain_file(file_name: str, user=Depends(get_current_user)):
     try:
         file_result = supabase.table("files").select("*").eq("file_name", file_name).execute()
         if not file_result.data:
             raise HTTPException(status_code=404, detail="File not found")
 
-        file_path = file_result.data[0]["file_path"]
-        signed_url = supabase.storage.from_("filesb").create_signed_url(file_path, 3600)
-        if isinstance(signed_url, dict) and "error" in signed_url:
-            raise HTTPException(status_code=400, detail=signed_url["error"])
+        # Extracted text is shared by every upload of the same content
+        content_hash = file_result.data[0].get("content_hash")
+        extracted_text = await get_extracted_text(content_hash) if content_hash else None
+
+        if extracted_text is None:
+            file_path = file_result.data[0]["file_path"]
+            signed_url = supabase.storage.from_("filesb").create_signed_url(file_path, 3600)
+            if isinstance(signed_url, dict) and "error" in signed_url:
+                raise HTTPException(status_code=400, detail=signed_url["error"])
 
-        file_content = await download_file(signed_url['signedURL'])
-        extracted_text = extract_text_by_file_type(file_name, file_content)
+            file_content = await download_file(signed_url['signedURL'])
+            extracted_text = extract_text_by_file_type(file_name, file_content)
+            if content_hash:
+                await save_extracted_text(content_hash, extracted_text)
 
         ai_response = await ai_chat([
             ChatMessage(role="user", content=f"Explain this content: {extracted_text}")
-        ])
-        return {"reply": ai_response['reply']}
+        ], user)
+        return {"reply": ai_response['reply'], "tokens": ai_response.get("tokens")}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to explain the file: {str(e)}")
 
@@ -155,11 +212,13 @@ def extract_text_by_file_type(file_name: str, file_content: bytes) -> str:
 
 
 def extract_pdf_text(pdf_content: bytes) -> str:
+    import fitz  # PyMuPDF
     doc = fitz.open(stream=pdf_content, filetype="pdf")
     return "\n".join(page.get_text("text") for page in doc)
 
 
 def extract_pptx_text(pptx_content: bytes) -> str:
+    from pptx import Presentation
     prs = Presentation(BytesIO(pptx_content))
     text = []
     for slide in prs.slides:
@@ -170,6 +229,7 @@ def extract_pptx_text(pptx_content: bytes) -> str:
 
 
 def extract_docx_text(docx_content: bytes) -> str:
+    from docx import Document
     doc = Document(BytesIO(docx_content))
     return "\n".join(paragraph.text for paragraph in doc.paragraphs)
 
@@ -0,0 +1,271 @@
+# api/announcements/feed.py
+"""
+Process-wide snapshot of the open announcements board.
+
+Every viewer sees the same open announcements minus their own, so one
+snapshot with author cards joined serves them all: it is loaded with one
+query plus one batched profile fetch, then kept current by the
+announcement events (core.events) instead of being re-queried. With
+REDIS_URL set every worker receives every write, and the snapshot is only
+reloaded every few minutes to pick up writes made outside the API and
+profile edits. Without it a worker only sees its own writes, so the
+snapshot is reloaded every few seconds to bound how stale other workers'
+boards get (ANNOUNCEMENT_FEED_MAX_AGE_SECONDS overrides both).
+
+The snapshot also keeps inverted indexes from category and from title
+terms to announcement ids, maintained with the rows, so category filters,
+title search and suggestions look up ids instead of scanning the board.
+"""
+import asyncio
+import bisect
+import re
+import time
+import unicodedata
+from core.cache import TTLCache
+from core.config import settings
+from core.database import supabase
+from core.events import events
+from core.metrics import record_cache_lookup
+from core.utils import run_query, select_in
+from utils.course_categories import get_categories_by_specialization
+
+CHANNEL = "announcements"
+# Owners' own announcements, open or not, with the fields of /my_announcements
+OWNER_CHANNEL = "announcements:owner"
+# Snapshot reload interval, in seconds, with and without a shared event bus
+MAX_AGE_WITH_REDIS = 300
+MAX_AGE_WITHOUT_REDIS = 10
+FEED_COLUMNS = ("id", "title", "contact_value", "status", "contact_method", "user_id", "created_at", "categorie")
+
+# Too common in titles to say anything about the topic
+STOPWORDS = frozenset(
+    "a an and au aux avec besoin ce cherche dans de des du en et for help i in is la le les looking "
+    "me mon my need of on ou par pour sur the to un une with".split()
+)
+
+
+def normalize(text):
+    """`text` casefolded and without accents, so "Électronique" matches "electronique" """
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold().strip()
+
+
+def terms(text):
+    return {term for term in re.findall(r"\w+", normalize(text)) if len(term) > 1 and term not in STOPWORDS}
+
+
+# Author name and avatar attached to pushed announcements; a profile edit shows up within the TTL
+author_cards = TTLCache("announcement_authors", 300)
+
+
+def _card(profile):
+    return {"full_name": profile.get("full_name", ""), "image_url": profile.get("image_url", "")}
+
+
+async def author_card(user_id):
+    async def load():
+        result = await run_query(
+            lambda: supabase.table("profiles").select("full_name, image_url").eq("id", user_id).execute()
+        )
+        return _card(result.data[0] if result.data else {})
+    return await author_cards.get_or_load(user_id, load)
+
+
+# Suggestion weights: categories of the viewer's own courses count most
+COURSE_CATEGORY_WEIGHT = 3
+SPECIALIZATION_CATEGORY_WEIGHT = 2
+KEYWORD_WEIGHT = 1
+
+_specialization_interests = {}
+
+
+def _specialization_weights(specialization):
+    weights = _specialization_interests.get(specialization)
+    if weights is None:
+        categories, keywords = {}, {}
+        for category in get_categories_by_specialization(specialization):
+            categories[normalize(category["value"])] = SPECIALIZATION_CATEGORY_WEIGHT
+            for term in terms(category["label"]):
+                keywords[term] = KEYWORD_WEIGHT
+        weights = _specialization_interests[specialization] = (categories, keywords)
+    return weights
+
+
+def interests(specialization, course_categories):
+    """
+    Category and title-term weights for a viewer from their specialization's
+    categories and the categories of their own courses. The specialization
+    part is built once per specialization.
+    """
+    categories, keywords = (dict(weights) for weights in _specialization_weights(specialization))
+    for category in course_categories:
+        if category and category != "other":
+            categories[normalize(category)] = COURSE_CATEGORY_WEIGHT
+            for term in terms(category):
+                keywords[term] = KEYWORD_WEIGHT
+    return categories, keywords
+
+
+class AnnouncementFeed:
+    def __init__(self, max_age):
+        self.max_age = max_age
+        self._rows = None
+        self._ordered = None
+        self._by_category = {}
+        self._by_term = {}
+        self._vocabulary = None
+        self._loaded_at = 0.0
+        self._loading = None
+        self._pending = None
+
+    def _fresh(self):
+        return self._rows is not None and time.monotonic() - self._loaded_at < self.max_age
+
+    async def _load(self):
+        result = await run_query(
+            lambda: supabase.table("help_announcements")
+            .select(", ".join(FEED_COLUMNS))
+            .eq("status", "open")
+            .execute()
+        )
+        rows = result.data or []
+        profiles = await select_in("profiles", "id", [row["user_id"] for row in rows], "id, full_name, image_url")
+        cards = {profile["id"]: _card(profile) for profile in profiles}
+        for user_id, card in cards.items():
+            author_cards.set(user_id, card)
+        return {row["id"]: {**row, **cards.get(row["user_id"], {})} for row in rows}
+
+    async def _reload(self):
+        # Events arriving while the query runs are replayed on top of its result
+        self._pending = []
+        try:
+            rows = await self._load()
+        except BaseException:
+            self._pending = None
+            raise
+        pending, self._pending = self._pending, None
+        self._rows, self._ordered = {}, None
+        self._by_category, self._by_term, self._vocabulary = {}, {}, None
+        for row in rows.values():
+            self._add(row)
+        self._loaded_at = time.monotonic()
+        for event in pending:
+            self.apply(event)
+
+    async def _ensure_loaded(self):
+        fresh = self._fresh()
+        record_cache_lookup("announcement_feed", fresh)
+        if not fresh:
+            if self._loading is None:
+                self._loading = asyncio.ensure_future(self._reload())
+                self._loading.add_done_callback(lambda _: setattr(self, "_loading", None))
+            await asyncio.shield(self._loading)
+
+    def _newest_first(self, ids=None):
+        if ids is not None:
+            return sorted((self._rows[i] for i in ids), key=lambda row: row["created_at"], reverse=True)
+        if self._ordered is None:
+            self._ordered = sorted(self._rows.values(), key=lambda row: row["created_at"], reverse=True)
+        return self._ordered
+
+    # --- Indexes ---
+
+    def _add(self, row):
+        self._rows[row["id"]] = row
+        self._by_category.setdefault(normalize(row.get("categorie")), set()).add(row["id"])
+        for term in terms(row.get("title")):
+            if term not in self._by_term:
+                self._vocabulary = None
+            self._by_term.setdefault(term, set()).add(row["id"])
+        self._ordered = None
+
+    def _remove(self, announcement_id):
+        row = self._rows.pop(announcement_id, None)
+        if row is None:
+            return
+        for index, keys in ((self._by_category, [normalize(row.get("categorie"))]), (self._by_term, terms(row.get("title")))):
+            for key in keys:
+                ids = index.get(key)
+                if ids is not None:
+                    ids.discard(announcement_id)
+                    if not ids:
+                        del index[key]
+                        self._vocabulary = None
+        self._ordered = None
+
+    def _prefixed(self, prefix):
+        """Ids of announcements with a title term starting with `prefix`"""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._by_term)
+        ids = set()
+        position = bisect.bisect_left(self._vocabulary, prefix)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(prefix):
+            ids |= self._by_term[self._vocabulary[position]]
+            position += 1
+        return ids
+
+    # --- Reads ---
+
+    async def open_announcements(self, exclude_user_id, category=None, q=None):
+        """
+        Open announcements newest first, without `exclude_user_id`'s own.
+        `category` matches `categorie` ignoring case and accents; every word
+        of `q` must appear in the title, the last one as a prefix so results
+        follow typing.
+        """
+        await self._ensure_loaded()
+        ids = None
+        if category:
+            ids = set(self._by_category.get(normalize(category), ()))
+        if q:
+            words = [term for term in re.findall(r"\w+", normalize(q)) if term not in STOPWORDS]
+            for position, word in enumerate(words):
+                matched = self._prefixed(word) if position == len(words) - 1 else self._by_term.get(word, set())
+                ids = set(matched) if ids is None else ids & matched
+        return [row for row in self._newest_first(ids) if row["user_id"] != exclude_user_id]
+
+    async def suggested(self, exclude_user_id, categories, keywords, limit):
+        """
+        Open announcements ranked by overlap with a viewer's interests:
+        `categories` and `keywords` map normalized categories and title terms
+        to weights, and each announcement scores the weights it matches.
+        Ties go to the newest; announcements matching nothing are left out.
+        """
+        await self._ensure_loaded()
+        scores = {}
+        for index, weights in ((self._by_category, categories), (self._by_term, keywords)):
+            for key, weight in weights.items():
+                for announcement_id in index.get(key, ()):
+                    scores[announcement_id] = scores.get(announcement_id, 0) + weight
+        ranked = [row for row in self._newest_first(scores.keys()) if row["user_id"] != exclude_user_id]
+        ranked.sort(key=lambda row: scores[row["id"]], reverse=True)
+        return [{**row, "score": scores[row["id"]]} for row in ranked[:limit]]
+
+    def apply(self, event):
+        """Fold one announcement event into the snapshot"""
+        if self._pending is not None:
+            self._pending.append(event)
+            return
+        if self._rows is None:
+            return
+        if event["type"] == "resync":
+            # Events may have been missed; reload on the next read
+            self._loaded_at = 0.0
+            return
+
+        announcement = event["announcement"]
+        self._remove(announcement["id"])
+        if event["type"] != "deleted" and announcement.get("status") == "open":
+            row = {column: announcement.get(column) for column in FEED_COLUMNS}
+            row.update(full_name=announcement.get("full_name", ""), image_url=announcement.get("image_url", ""))
+            self._add(row)
+
+
+def _max_age():
+    if settings.ANNOUNCEMENT_FEED_MAX_AGE_SECONDS is not None:
+        return settings.ANNOUNCEMENT_FEED_MAX_AGE_SECONDS
+    return MAX_AGE_WITH_REDIS if settings.REDIS_URL else MAX_AGE_WITHOUT_REDIS
+
+
+feed = AnnouncementFeed(_max_age())
+events.add_listener(CHANNEL, feed.apply)
@@ -1,14 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import logging
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from typing import List, Literal, Optional
 from uuid import UUID
+from core.cache import TTLCache
+from core.config import settings
 from core.database import supabase
-from core.security import get_current_user
+from core.events import events
+from core.security import authenticate_token, get_authenticated_user, get_current_user
+from core.routing import FastJSONRoute
+from core.utils import run_query
+from api.announcements.feed import CHANNEL, FEED_COLUMNS, OWNER_CHANNEL, author_card, feed, interests
 from api.announcements.schemas import HelpAnnouncementCreate, HelpAnnouncementUpdate
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+
+logger = logging.getLogger("emsi.announcements")
+
+# Viewer interests for /suggested; course changes show up within the TTL
+viewer_interests = TTLCache("announcement_interests", 300)
 
 # --- SCHEMAS ---
 
+BoardScope = Literal["board", "mine"]
+
+# --- EVENTS ---
+
+async def publish_change(kind, announcement):
+    """
+    Push a created/updated/toggled/deleted delta to board subscribers. Open
+    announcements carry the fields of the public list; one that is no longer
+    open becomes a `closed` event with only its id and user_id, so its
+    contact details stop being pushed. Owners get every delta on
+    OWNER_CHANNEL with the fields of /my_announcements, status included, so
+    their list keeps closed posts. The write has already happened, so a
+    failure here is logged, not raised.
+    """
+    try:
+        if kind == "deleted":
+            deleted = {"id": announcement["id"], "user_id": announcement["user_id"]}
+            await events.publish(CHANNEL, {"type": kind, "announcement": deleted})
+            await events.publish(OWNER_CHANNEL, {"type": kind, "announcement": deleted})
+            return
+        card = await author_card(announcement["user_id"])
+        own = {**{column: announcement.get(column) for column in FEED_COLUMNS}, **card}
+        if announcement.get("status") == "open":
+            await events.publish(CHANNEL, {"type": kind, "announcement": own})
+        else:
+            closed = {"id": announcement["id"], "user_id": announcement["user_id"]}
+            await events.publish(CHANNEL, {"type": "closed", "announcement": closed})
+        await events.publish(OWNER_CHANNEL, {"type": kind, "announcement": own})
+    except Exception:
+        logger.warning("Could not publish announcement %s event", kind, exc_info=True)
+
+
+def _subscribe(user_id, scope, last_event_id):
+    # The board lists other users' open posts, "mine" all of the viewer's own
+    if scope == "mine":
+        return events.subscribe(OWNER_CHANNEL, last_event_id,
+                                lambda event: event["announcement"]["user_id"] == user_id)
+    return events.subscribe(CHANNEL, last_event_id,
+                            lambda event: event["announcement"]["user_id"] != user_id)
+
+
+def _sse(event):
+    lines = f"event: {event['type']}\n"
+    if event["id"]:
+        lines += f"id: {event['id']}\n"
+    return lines + f"data: {orjson.dumps(event).decode()}\n\n"
 
 
 # --- ROUTES ---
@@ -21,43 +82,54 @@ async def create_announcement(data: HelpAnnouncementCreate, user=Depends(get_cur
         if data.contact_method == "email" and not contact_value:
             contact_value = user["email"]
 
-        result = supabase.table("help_announcements").insert({
+        result = await run_query(lambda: supabase.table("help_announcements").insert({
             "title": data.title,
             "contact_method": data.contact_method,
             "contact_value": contact_value,
             "status": data.status,
             "user_id": user["id"],
             "categorie": data.categorie
-        }).execute()
-
-        return result.data[0]
+        }).execute())
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    await publish_change("created", result.data[0])
+    return result.data[0]
+
 @router.get("/announcements", response_model=List[dict])
-async def get_open_announcements_excluding_user(user=Depends(get_current_user)):
+async def get_open_announcements_excluding_user(
+    category: Optional[str] = None,
+    q: Optional[str] = Query(None, max_length=100),
+    user=Depends(get_authenticated_user),
+):
     try:
-        # Fetch all open announcements excluding the user's own
-        result = supabase.table("help_announcements") \
-            .select("id, title, contact_value, status, contact_method,user_id, created_at, categorie") \
-            .eq("status", "open") \
-            .neq("user_id", user["id"]) \
-            .order("created_at", desc=True) \
-            .execute()
+        # Open announcements excluding the user's own, with author full_name and image_url,
+        # served from the shared snapshot kept current by announcement events.
+        # `category` and the title search `q` are answered from its inverted indexes.
+        return await feed.open_announcements(exclude_user_id=user["id"], category=category, q=q)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Fetch user profiles (full_name and image_url) for each announcement's user_id
-        announcements = result.data
-        for announcement in announcements:
-            user_profile = supabase.table("profiles") \
-                .select("full_name, image_url") \
-                .eq("id", announcement["user_id"]) \
-                .execute()
 
-            if user_profile.data:
-                announcement["full_name"] = user_profile.data[0].get("full_name", "")
-                announcement["image_url"] = user_profile.data[0].get("image_url", "")
+async def _load_interests(user_id):
+    profile, courses = await asyncio.gather(
+        run_query(lambda: supabase.table("profiles").select("specialization").eq("id", user_id).execute()),
+        run_query(lambda: supabase.table("courses").select("category").eq("user_id", user_id).execute()),
+    )
+    specialization = profile.data[0].get("specialization") if profile.data else None
+    return interests(specialization, {course["category"] for course in courses.data or []})
 
-        return announcements
+
+@router.get("/suggested", response_model=List[dict])
+async def suggested_announcements(limit: int = Query(20, ge=1, le=100), user=Depends(get_authenticated_user)):
+    """
+    Open announcements the viewer is most likely able to help with, best
+    first: ranked by how well their category and title match the categories
+    of the viewer's courses and specialization. Each carries its `score`.
+    """
+    try:
+        categories, keywords = await viewer_interests.get_or_load(user["id"], lambda: _load_interests(user["id"]))
+        return await feed.suggested(user["id"], categories, keywords, limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -91,30 +163,24 @@ async def list_announcements(user=Depends(get_current_user)):
 @router.patch("/toggle_status/{announcement_id}")
 async def toggle_announcement_status(announcement_id: UUID, user=Depends(get_current_user)):
     try:
-        # Get the current announcement
-        result = supabase.table("help_announcements") \
-            .select("status") \
-            .eq("id", str(announcement_id)) \
-            .eq("user_id", user["id"]) \
-            .single() \
-            .execute()
+        # Flipped in one UPDATE, so concurrent toggles serialise on the row instead of losing a write
+        result = await run_query(
+            lambda: supabase.rpc("toggle_announcement_status", {
+                "p_id": str(announcement_id),
+                "p_user_id": user["id"],
+            }).execute()
+        )
 
         if not result.data:
             raise HTTPException(status_code=404, detail="Announcement not found")
-
-        current_status = result.data["status"]
-        new_status = "closed" if current_status == "open" else "open"
-
-        update_result = supabase.table("help_announcements") \
-            .update({"status": new_status}) \
-            .eq("id", str(announcement_id)) \
-            .eq("user_id", user["id"]) \
-            .execute()
-
-        return update_result.data[0]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    await publish_change("toggled", result.data[0])
+    return result.data[0]
+
 
 @router.put("/update_announcements/{announcement_id}")
 async def update_announcement(announcement_id: UUID, data: HelpAnnouncementUpdate, user=Depends(get_current_user)):
@@ -123,32 +189,98 @@ async def update_announcement(announcement_id: UUID, data: HelpAnnouncementUpdat
         if not update_data:
             raise HTTPException(status_code=400, detail="No fields to update")
 
-        result = supabase.table("help_announcements") \
-            .update(update_data) \
-            .eq("id", str(announcement_id)) \
-            .eq("user_id", user["id"]) \
+        result = await run_query(
+            lambda: supabase.table("help_announcements")
+            .update(update_data)
+            .eq("id", str(announcement_id))
+            .eq("user_id", user["id"])
             .execute()
+        )
 
         if not result.data:
             raise HTTPException(status_code=404, detail="Announcement not found")
-
-        return result.data[0]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    await publish_change("updated", result.data[0])
+    return result.data[0]
+
 
 @router.delete("/delet_announcements/{announcement_id}")
 async def delete_announcement(announcement_id: UUID, user=Depends(get_current_user)):
     try:
-        result = supabase.table("help_announcements") \
-            .delete() \
-            .eq("id", str(announcement_id)) \
-            .eq("user_id", user["id"]) \
+        result = await run_query(
+            lambda: supabase.table("help_announcements")
+            .delete()
+            .eq("id", str(announcement_id))
+            .eq("user_id", user["id"])
             .execute()
+        )
 
         if not result.data:
             raise HTTPException(status_code=404, detail="Announcement not found")
-
-        return {"message": "Announcement deleted"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+    deleted = result.data[0]
+    await publish_change("deleted", {"id": deleted["id"], "user_id": deleted["user_id"]})
+    return {"message": "Announcement deleted"}
+
+
+@router.get("/stream")
+async def stream_announcements(request: Request, scope: BoardScope = "board", user=Depends(get_authenticated_user)):
+    """
+    Server-sent events for the board: load `/announcements` (or
+    `/my_announcements` with scope=mine) once, then apply each delta.
+    `created`, `updated` and `toggled` carry an open announcement with the
+    fields of the public list and its author's full_name and image_url.
+    `closed` (an update or toggle that left it not open) and `deleted` carry
+    only id and user_id: drop it from the board. With scope=mine there is
+    no `closed`: every event but `deleted` carries the announcement with its
+    status, as /my_announcements lists it. On `resync` reload the list. EventSource reconnects send Last-Event-ID, and missed
+    events are replayed when still kept.
+    """
+    subscription = _subscribe(user["id"], scope, request.headers.get("last-event-id"))
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                event = await subscription.next(timeout=settings.EVENTS_KEEPALIVE_SECONDS)
+                # Comments keep proxies from timing out an idle connection
+                yield ": keepalive\n\n" if event is None else _sse(event)
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def announcements_socket(websocket: WebSocket, scope: BoardScope = Query("board"), last_event_id: Optional[str] = None):
+    """The same deltas as /stream, one JSON message each, for clients that prefer a WebSocket"""
+    try:
+        user = await authenticate_token(websocket.cookies.get("access_token"))
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscription = _subscribe(user["id"], scope, last_event_id)
+    try:
+        while True:
+            event = await subscription.next(timeout=settings.EVENTS_KEEPALIVE_SECONDS)
+            if event is None:
+                event = {"id": None, "type": "keepalive"}
+            await websocket.send_text(orjson.dumps(event).decode())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        subscription.close()
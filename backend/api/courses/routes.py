@@ -1,22 +1,42 @@
 from fastapi import Body
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+import orjson
 from typing import List
 from core.database import supabase
 from core.security import get_current_user
+from core.routing import FastJSONRoute
+from core.compression import PrecompressedPayload
+from core.etag import row_etag, row_not_modified, set_validators
 from api.courses.schemas import CourseCreate, CourseOut
+from api.courses.service import delete_course_cascade
 from utils.course_categories import get_categories_by_specialization
 from models.profile import ProfileData
 from typing import List, Dict,Optional
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+
+# The catalog only depends on the specialization: serialize and compress each variant once
+_category_payloads = {}
+
+
+def _category_payload(specialization):
+    payload = _category_payloads.get(specialization)
+    if payload is None:
+        categories = get_categories_by_specialization(specialization=specialization)
+        # Always add "Other" as an option
+        categories.append({"value": "other", "label": "Other"})
+        payload = PrecompressedPayload(orjson.dumps(categories))
+        _category_payloads[specialization] = payload
+    return payload
+
 
 @router.get("/get_categories", response_model=List[Dict[str, str]])
-async def get_my_categories(user=Depends(get_current_user)):
+async def get_my_categories(request: Request, user=Depends(get_current_user)):
     """Get categories for current user based on their profile"""
     try:
         # Get user profile from database
         profile = supabase.table("profiles")\
-            .select("*")\
+            .select("specialization")\
             .eq("id", user["id"])\
             .single()\
             .execute()
@@ -25,14 +45,7 @@ async def get_my_categories(user=Depends(get_current_user)):
             raise HTTPException(status_code=404, detail="User profile not found")
         
         # Get categories based only on specialization (academic_level no longer needed)
-        specialization_categories = get_categories_by_specialization(
-            specialization=profile.data.get("specialization")
-        )
-        
-        # Always add "Other" as an option
-        specialization_categories.append({"value": "other", "label": "Other"})
-        
-        return specialization_categories
+        return _category_payload(profile.data.get("specialization")).response(request)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -79,25 +92,30 @@ async def list_user_courses(user=Depends(get_current_user)):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 @router.get("/get_course/{course_id}", response_model=CourseOut)
-async def get_course(course_id: str, user=Depends(get_current_user)):
+async def get_course(course_id: str, request: Request, response: Response, user=Depends(get_current_user)):
     """Get a specific course by ID for the current user"""
     try:
+        cached = await row_not_modified(request, "courses", course_id, user["id"])
+        if cached:
+            return cached
+
         result = supabase.table("courses")\
             .select("*")\
             .eq("id", course_id)\
             .eq("user_id", user["id"])\
             .single()\
             .execute()
+        set_validators(response, row_etag("courses", course_id, result.data.get("updated_at")), result.data.get("updated_at"))
         return result.data
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 @router.delete("/{course_id}")
 async def delete_course(course_id: str, user=Depends(get_current_user)):
-    """Delete a course and its associated files"""
+    """Delete a course with its files, notes and note images"""
     try:
         # Check ownership
         course = supabase.table("courses")\
-            .select("*")\
+            .select("id")\
             .eq("id", course_id)\
             .eq("user_id", user["id"])\
             .single()\
@@ -105,19 +123,8 @@ async def delete_course(course_id: str, user=Depends(get_current_user)):
         if not course.data:
             raise HTTPException(status_code=404, detail="Course not found")
 
-        # Delete associated files
-        files = supabase.table("files")\
-            .select("*")\
-            .eq("course_id", course_id)\
-            .execute()
-        if files.data:
-            paths = [f["file_path"] for f in files.data]
-            supabase.storage.from_("filesb").remove(paths)
-            supabase.table("files").delete().eq("course_id", course_id).execute()
-
-        # Delete course
-        supabase.table("courses").delete().eq("id", course_id).execute()
-        return {"message": "Course deleted successfully"}
+        deleted = await delete_course_cascade(course_id)
+        return {"message": "Course deleted successfully", "deleted": deleted}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 from fastapi import Path
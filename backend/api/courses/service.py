@@ -0,0 +1,37 @@
+import asyncio
+from core.database import supabase
+from core.utils import run_query
+from api.files.service import release_file_rows
+from api.notes.service import delete_notes_cascade
+
+
+async def delete_course_cascade(course_id: str):
+    """
+    Delete a course and everything hanging off it: course files, the course's
+    notes and the images embedded in those notes.
+    Dependent rows are collected up front, then file rows and the notes cascade
+    are deleted concurrently before file blob references are released.
+    Returns counts of what was deleted.
+    """
+    files, notes = await asyncio.gather(
+        run_query(lambda: supabase.table("files").select("file_path, content_hash").eq("course_id", course_id).execute()),
+        run_query(lambda: supabase.table("notes").select("id").eq("course_id", course_id).execute()),
+    )
+
+    files_deleted, notes_deleted = await asyncio.gather(
+        run_query(lambda: supabase.table("files").delete().eq("course_id", course_id).execute()),
+        delete_notes_cascade(note["id"] for note in notes.data or []),
+    )
+    # Shared blobs are only removed once their last reference is gone
+    file_blobs_removed, courses_deleted = await asyncio.gather(
+        release_file_rows(files.data or []),
+        run_query(lambda: supabase.table("courses").delete().eq("id", course_id).execute()),
+    )
+
+    return {
+        "courses": len(courses_deleted.data or []),
+        "files": len(files_deleted.data or []),
+        "notes": notes_deleted["notes"],
+        "note_images": notes_deleted["note_images"],
+        "blobs": file_blobs_removed + notes_deleted["blobs"],
+    }
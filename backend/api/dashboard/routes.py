@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, HTTPException
+from core.cache import TTLCache
+from core.config import settings
+from core.security import get_authenticated_user
+from core.routing import FastJSONRoute
+from api.dashboard.service import SECTIONS, build_dashboard
+
+router = APIRouter(route_class=FastJSONRoute)
+
+# Short-lived: writes elsewhere do not invalidate it, so it only absorbs repeated home-screen loads
+dashboard_cache = TTLCache("dashboard", settings.DASHBOARD_CACHE_SECONDS)
+
+
+@router.get("")
+async def get_dashboard(refresh: bool = False, user=Depends(get_authenticated_user)):
+    """
+    Everything the home screen shows in one call: profile, counts, courses,
+    the next exams, open tasks due soon, recent notes and conversations.
+    Sections load concurrently after a single authentication; one that fails
+    is null and explained under `errors`. Complete results are cached per
+    user for DASHBOARD_CACHE_SECONDS; `refresh=true` skips the cache.
+    """
+    if refresh:
+        dashboard_cache.invalidate(user["id"])
+    dashboard = await dashboard_cache.get_or_load(
+        user["id"],
+        lambda: build_dashboard(user["id"]),
+        cacheable=lambda result: not result["errors"],
+    )
+    if len(dashboard["errors"]) == len(SECTIONS):
+        raise HTTPException(status_code=503, detail={"message": "Dashboard unavailable", "errors": dashboard["errors"]})
+    return dashboard
@@ -0,0 +1,113 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from core.config import settings
+from core.database import supabase
+from core.utils import run_query
+
+PROFILE_COLUMNS = "full_name, academic_level, specialization, is_anonymous, email, image_url"
+
+
+def _rows(query):
+    return run_query(lambda: query.execute().data or [])
+
+
+async def load_profile(user_id):
+    rows = await _rows(supabase.table("profiles").select(PROFILE_COLUMNS).eq("id", user_id))
+    return {**rows[0], "profile_complete": True} if rows else {"profile_complete": False}
+
+
+async def load_counts(user_id):
+    # Four counts in one round trip
+    result = await run_query(lambda: supabase.rpc("dashboard_counts", {"p_user_id": user_id}).execute())
+    return result.data
+
+
+async def load_courses(user_id):
+    # The most recent ones; the total is in counts
+    return await _rows(
+        supabase.table("courses")
+        .select("id, title, category")
+        .eq("user_id", user_id)
+        .order("created_at", desc=True)
+        .limit(settings.DASHBOARD_ITEMS)
+    )
+
+
+async def load_upcoming_exams(user_id):
+    now = datetime.now(timezone.utc)
+    return await _rows(
+        supabase.table("exams")
+        .select("id, title, exam_date, priority")
+        .eq("user_id", user_id)
+        .gte("exam_date", now.replace(hour=0, minute=0, second=0, microsecond=0).isoformat())
+        .order("exam_date")
+        .limit(settings.DASHBOARD_ITEMS)
+    )
+
+
+async def load_due_tasks(user_id):
+    """Open tasks that are overdue or due within the horizon, soonest first"""
+    horizon = datetime.now(timezone.utc) + timedelta(days=settings.DASHBOARD_TASK_HORIZON_DAYS)
+    return await _rows(
+        supabase.table("tasks")
+        .select("task_id, title, category, due_date, completed")
+        .eq("user_id", user_id)
+        .eq("completed", False)
+        .lt("due_date", horizon.isoformat())
+        .order("due_date")
+        .limit(settings.DASHBOARD_ITEMS * 2)
+    )
+
+
+async def load_recent_notes(user_id):
+    # Note bodies are large TipTap documents; the dashboard only lists titles
+    return await _rows(
+        supabase.table("notes")
+        .select("id, title, course_id, created_at, updated_at")
+        .eq("user_id", user_id)
+        .order("updated_at", desc=True)
+        .limit(settings.DASHBOARD_ITEMS)
+    )
+
+
+async def load_recent_conversations(user_id):
+    return await _rows(
+        supabase.table("conversations")
+        .select("id, title, updated_at, last_message, message_count")
+        .eq("user_id", user_id)
+        .order("updated_at", desc=True)
+        .limit(settings.DASHBOARD_ITEMS)
+    )
+
+
+SECTIONS = {
+    "profile": load_profile,
+    "counts": load_counts,
+    "courses": load_courses,
+    "upcoming_exams": load_upcoming_exams,
+    "due_tasks": load_due_tasks,
+    "recent_notes": load_recent_notes,
+    "recent_conversations": load_recent_conversations,
+}
+
+
+async def build_dashboard(user_id):
+    """
+    Load every section concurrently, each bounded by DASHBOARD_SECTION_TIMEOUT.
+    A failed or slow section comes back as None with its error listed under
+    `errors`, so one bad query never fails the whole dashboard.
+    """
+    names = list(SECTIONS)
+    results = await asyncio.gather(
+        *(asyncio.wait_for(SECTIONS[name](user_id), settings.DASHBOARD_SECTION_TIMEOUT) for name in names),
+        return_exceptions=True,
+    )
+
+    dashboard = {"generated_at": datetime.now(timezone.utc).isoformat(), "errors": {}}
+    for name, result in zip(names, results):
+        if isinstance(result, BaseException):
+            dashboard[name] = None
+            dashboard["errors"][name] = "timed out" if isinstance(result, asyncio.TimeoutError) else str(result)
+        else:
+            dashboard[name] = result
+    return dashboard
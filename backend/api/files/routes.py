@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile
+import re
+from fastapi import APIRouter, Depends, HTTPException, File, Request, UploadFile
+from fastapi.responses import Response, StreamingResponse
+from core.config import settings
 from core.database import supabase
-from core.security import get_current_user
+from core.security import get_authenticated_user, get_current_user
+from core.routing import FastJSONRoute
+from core.storage import stream_object
+from core.utils import run_query
+from core.zipstream import ZipPlan, ZipTooLarge
+from api.files.service import read_and_hash, acquire_blob, course_zip_entries, release_blobs, release_file_rows
 from slugify import slugify
 import os
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 def sanitize_filename(filename: str) -> str:
     """Sanitize the filename to be safe for storage and avoid invalid characters."""
     name, ext = os.path.splitext(filename)
@@ -17,7 +25,7 @@ async def upload_file(
     file: UploadFile = File(...),
     user=Depends(get_current_user)
 ):
-    """Handle file upload for a specific course."""
+    """Handle file upload for a specific course, storing each distinct content once."""
     try:
         # Verify course ownership
         course_result = supabase.table("courses").select("user_id").eq("id", course_id).execute()
@@ -26,34 +34,31 @@ async def upload_file(
         if course_result.data[0]['user_id'] != user["id"]:
             raise HTTPException(status_code=403, detail="User is not the owner")
 
-        # Process file
-        file_content = await file.read()
+        # Hash while reading so identical uploads share one stored blob
+        file_content, content_hash, crc32 = await read_and_hash(file)
         safe_file_name = sanitize_filename(file.filename)
-        file_path = f"courses/{course_id}/{safe_file_name}"
-
-        # Upload to Supabase
-        upload_result = supabase.storage.from_('filesb').upload(
-            file_path,
-            file_content,
-            {"content-type": file.content_type}
-        )
-
-        if isinstance(upload_result, dict) and 'error' in upload_result:
-            raise HTTPException(status_code=400, detail=upload_result['error'])
+        blob = await acquire_blob(file_content, content_hash, file.content_type, crc32)
 
         # Save metadata
         file_data = {
             "course_id": course_id,
             "file_name": safe_file_name,
-            "file_path": file_path,
+            "file_path": blob["storage_path"],
             "file_type": file.content_type,
             "file_size": len(file_content),
+            "content_hash": content_hash,
         }
         insert_result = supabase.table("files").insert(file_data).execute()
         if not insert_result.data:
+            await release_blobs([content_hash])
             raise HTTPException(status_code=400, detail="Failed to save metadata")
 
-        return {"message": "File uploaded successfully", "file_data": insert_result.data[0]}
+        return {
+            "message": "File uploaded successfully",
+            "file_data": insert_result.data[0],
+            "deduplicated": not blob["created"],
+            "thumbnail_path": blob.get("thumbnail_path"),
+        }
 
     except HTTPException as he:
         raise
@@ -139,8 +144,11 @@ async def generate_download_url(
         if not file_result.data:
             raise HTTPException(status_code=404, detail="File not found")
 
+        # Blobs are stored under their hash, so name the download explicitly
         file_path = file_result.data[0]['file_path']
-        signed_url = supabase.storage.from_('filesb').create_signed_url(file_path, 3600)
+        signed_url = supabase.storage.from_('filesb').create_signed_url(
+            file_path, 3600, {"download": file_result.data[0]['file_name']}
+        )
         
         if isinstance(signed_url, dict) and 'error' in signed_url:
             raise HTTPException(status_code=400, detail=signed_url['error'])
@@ -167,23 +175,94 @@ async def delete_file(
             raise HTTPException(status_code=403, detail="User is not the owner")
 
         # Get file metadata
-        file_result = supabase.table("files").select("*").eq("id", file_id).execute()
+        file_result = supabase.table("files").select("*").eq("id", file_id).eq("course_id", course_id).execute()
         if not file_result.data:
             raise HTTPException(status_code=404, detail="File not found")
 
         file_data = file_result.data[0]
 
-        # Delete from storage
-        delete_result = supabase.storage.from_('filesb').remove([file_data['file_path']])
-        if isinstance(delete_result, dict) and 'error' in delete_result:
-            raise HTTPException(status_code=400, detail=delete_result['error'])
-
-        # Delete from database
+        # Delete from database, then release the blob (removed with its last reference)
         supabase.table("files").delete().eq("id", file_id).execute()
+        await release_file_rows([file_data])
 
         return {"message": "File deleted successfully"}
 
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _byte_range(header, size):
+    """(start, end) for a single `bytes=` range, None to send everything, or 416"""
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", (header or "").strip())
+    if not match or match.groups() == ("", ""):
+        # Multiple ranges and other units are optional for servers: answer with the full body
+        return None
+    first, last = match.groups()
+    if first and last and int(last) < int(first):
+        # Syntactically invalid (RFC 9110 §14.1.1): ignore the header
+        return None
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(size - int(last), 0), size - 1
+    if start >= size:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+@router.api_route("/download_course/{course_id}", methods=["GET", "HEAD"])
+async def download_course(course_id: str, request: Request, user=Depends(get_authenticated_user)):
+    """
+    Every file of a course as one ZIP, built while it streams. Files are
+    stored uncompressed with CRC-32s recorded at upload, so the length and
+    bytes are fixed in advance: `Content-Length` and a strong `ETag` are
+    sent, and `Range` (with `If-Range`) resumes an interrupted download.
+    Files are fetched from Storage a few at a time with a bounded buffer.
+    Courses whose archive would exceed 4 GiB or 65535 files get 413.
+    """
+    try:
+        course = await run_query(lambda: supabase.table("courses").select("user_id, title").eq("id", course_id).execute())
+        if not course.data:
+            raise HTTPException(status_code=404, detail="Course not found")
+        if course.data[0]["user_id"] != user["id"]:
+            raise HTTPException(status_code=403, detail="User is not the owner")
+
+        plan = ZipPlan(await course_zip_entries(course_id))
+    except HTTPException:
+        raise
+    except ZipTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"Course too large for a ZIP download: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    filename = sanitize_filename(f"{course.data[0].get('title') or 'course'}.zip")
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": plan.etag,
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+    byte_range = None
+    # A resume against a different archive (files added or removed since) gets the whole new one
+    if request.headers.get("range") and request.headers.get("if-range", plan.etag) == plan.etag:
+        byte_range = _byte_range(request.headers["range"], plan.size)
+    start, end = byte_range or (0, plan.size - 1)
+    headers["Content-Length"] = str(end - start + 1)
+    status_code = 200
+    if byte_range:
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{plan.size}"
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type="application/zip")
+
+    def open_data(entry, offset, length):
+        return stream_object(entry.source, offset, length)
+
+    return StreamingResponse(
+        plan.stream(open_data, start, end, settings.ZIP_READ_AHEAD_FILES, settings.ZIP_READ_AHEAD_CHUNKS),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/zip",
+    )
@@ -0,0 +1,240 @@
+import asyncio
+import hashlib
+import zlib
+from datetime import datetime, timezone
+from fastapi import UploadFile
+from core.database import supabase
+from core.images import process_image, ImageProcessingError
+from core.storage import BUCKET, remove_paths, stream_object
+from core.utils import run_query, select_in
+from core.zipstream import ZipEntry, unique_names
+
+# Bytes read from the upload stream per hashing step
+READ_CHUNK_SIZE = 1024 * 1024
+
+BLOB_PREFIX = "blobs"
+THUMBNAIL_VARIANT = {"thumbnail": 320}
+
+
+def blob_path(content_hash: str) -> str:
+    """Content-addressed Storage path for a SHA-256 digest"""
+    return f"{BLOB_PREFIX}/sha256/{content_hash[:2]}/{content_hash}"
+
+
+async def read_and_hash(file: UploadFile):
+    """
+    Read an upload chunk by chunk, hashing as the bytes arrive.
+    The chunks are still joined in memory: the Storage client uploads a
+    complete body, and image uploads are re-encoded from it.
+    Returns the content, its SHA-256 hex digest and its CRC-32 (for ZIP downloads).
+    """
+    digest = hashlib.sha256()
+    crc = 0
+    chunks = []
+    while chunk := await file.read(READ_CHUNK_SIZE):
+        digest.update(chunk)
+        crc = zlib.crc32(chunk, crc)
+        chunks.append(chunk)
+    return b"".join(chunks), digest.hexdigest(), crc
+
+
+async def acquire_blob(content: bytes, content_hash: str, content_type: str, crc32: int = None) -> dict:
+    """
+    Take a reference on the blob for `content_hash`, uploading the bytes
+    unless an earlier upload of them has finished. The reference count is
+    incremented atomically by the `acquire_file_blob` RPC; `uploaded` is only
+    set once the object is stored, so a blob whose first upload is still
+    running (or failed) is never shared without its bytes. The bytes go to
+    the storage_path the RPC returns: a blob revived while its release is
+    still removing the old object gets a new one.
+    Returns:
+        The `file_blobs` row: storage_path, thumbnail_path, ref_count, created, uploaded
+    """
+    path = blob_path(content_hash)
+    acquired = await run_query(lambda: supabase.rpc("acquire_file_blob", {
+        "p_content_hash": content_hash,
+        "p_storage_path": path,
+        "p_size": len(content),
+        "p_content_type": content_type,
+        "p_crc32": crc32,
+    }).execute())
+    blob = acquired.data[0]
+    if blob.get("uploaded"):
+        return blob
+
+    path = blob["storage_path"]
+    try:
+        # upsert makes concurrent uploads of the same bytes harmless
+        await run_query(lambda: supabase.storage.from_(BUCKET).upload(
+            path, content, {"content-type": content_type, "upsert": "true"}
+        ))
+        if content_type and content_type.startswith("image/") and not blob.get("thumbnail_path"):
+            blob["thumbnail_path"] = await _store_thumbnail(content_hash, path, content)
+        await run_query(lambda: supabase.table("file_blobs")
+                        .update({"uploaded": True})
+                        .eq("content_hash", content_hash)
+                        .execute())
+        blob["uploaded"] = True
+    except Exception:
+        await release_blobs([content_hash])
+        raise
+    return blob
+
+
+async def _store_thumbnail(content_hash: str, storage_path: str, content: bytes):
+    """Render the shared thumbnail for an image blob; returns its path or None"""
+    try:
+        rendered = await process_image(content, THUMBNAIL_VARIANT)
+    except ImageProcessingError:
+        return None
+    path = f"{storage_path}.thumb.webp"
+    await run_query(lambda: supabase.storage.from_(BUCKET).upload(
+        path, rendered["thumbnail"]["content"], {"content-type": "image/webp", "upsert": "true"}
+    ))
+    await run_query(lambda: supabase.table("file_blobs")
+                    .update({"thumbnail_path": path})
+                    .eq("content_hash", content_hash)
+                    .execute())
+    return path
+
+
+async def release_blobs(content_hashes) -> int:
+    """
+    Drop one reference per hash (duplicates count twice). Blobs whose count
+    reaches zero are tombstoned by the `release_file_blobs` RPC, which returns
+    their paths; their rows are deleted only after the objects are removed.
+    Returns the number of objects removed.
+    """
+    content_hashes = list(content_hashes)
+    if not content_hashes:
+        return 0
+    released = await run_query(lambda: supabase.rpc(
+        "release_file_blobs", {"p_content_hashes": content_hashes}
+    ).execute())
+    return await remove_released_blobs(released.data or [])
+
+
+async def remove_released_blobs(rows) -> int:
+    """
+    Remove the objects of tombstoned `file_blobs` rows, then delete the rows.
+    A failed remove leaves the tombstones for jobs.blob_refs to retry.
+    Returns the number of objects removed.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    removed = await remove_paths(
+        path for row in rows for path in (row["storage_path"], row.get("thumbnail_path"))
+    )
+    storage_paths = [row["storage_path"] for row in rows]
+    await run_query(lambda: supabase.rpc(
+        "delete_released_file_blobs", {"p_storage_paths": storage_paths}
+    ).execute())
+    return removed
+
+
+async def release_file_rows(rows) -> int:
+    """
+    Free the Storage behind deleted `files` rows. Deduplicated rows release
+    their blob reference; rows uploaded before deduplication own their object.
+    Returns the number of objects removed.
+    """
+    rows = list(rows)
+    hashed = [row["content_hash"] for row in rows if row.get("content_hash")]
+    legacy = [row["file_path"] for row in rows if not row.get("content_hash")]
+    released, removed = await asyncio.gather(release_blobs(hashed), remove_paths(legacy))
+    return released + removed
+
+
+async def get_extracted_text(content_hash: str):
+    """Extracted text shared by every file with this content, if already computed"""
+    result = await run_query(lambda: supabase.table("file_blobs")
+                             .select("extracted_text")
+                             .eq("content_hash", content_hash)
+                             .execute())
+    return result.data[0].get("extracted_text") if result.data else None
+
+
+async def save_extracted_text(content_hash: str, text: str):
+    await run_query(lambda: supabase.table("file_blobs")
+                    .update({"extracted_text": text})
+                    .eq("content_hash", content_hash)
+                    .execute())
+
+
+# Objects read at once when computing CRC-32s missing from blobs uploaded before they were recorded
+CRC_BACKFILL_CONCURRENCY = 4
+
+
+async def _object_crc32(path):
+    crc, size = 0, 0
+    async for chunk in stream_object(path):
+        crc = zlib.crc32(chunk, crc)
+        size += len(chunk)
+    return crc, size
+
+
+def _modified(row):
+    try:
+        return datetime.fromisoformat(row["created_at"].replace("Z", "+00:00"))
+    except (KeyError, AttributeError, ValueError):
+        return datetime(1980, 1, 1, tzinfo=timezone.utc)
+
+
+async def course_zip_entries(course_id: str) -> list:
+    """
+    ZIP entries for every file of a course, oldest first, with sizes and
+    CRC-32s from `file_blobs`, or from the `files` row for files uploaded
+    before deduplication. Files from before CRC-32s were recorded are read
+    once to compute it, and it is saved (on the blob, or on the row) for the
+    next download.
+    """
+    files = await run_query(lambda: supabase.table("files")
+                            .select("id, file_name, file_path, file_size, content_hash, crc32, created_at")
+                            .eq("course_id", course_id)
+                            .order("created_at")
+                            .order("id")
+                            .execute())
+    rows = files.data or []
+    blobs = await select_in("file_blobs", "content_hash", [r["content_hash"] for r in rows if r.get("content_hash")],
+                            "content_hash, size, crc32")
+    blobs = {blob["content_hash"]: blob for blob in blobs}
+
+    semaphore = asyncio.Semaphore(CRC_BACKFILL_CONCURRENCY)
+    computed = {}
+
+    def known(row):
+        """(crc32, size) already recorded for `row`, or None"""
+        blob = blobs.get(row.get("content_hash"))
+        if blob is not None:
+            return (blob["crc32"], blob["size"]) if blob.get("crc32") is not None else None
+        return (row["crc32"], row["file_size"]) if row.get("crc32") is not None else None
+
+    async def backfill(path, holders):
+        async with semaphore:
+            crc, size = await _object_crc32(path)
+        computed[path] = (crc, size)
+        hashes = {row["content_hash"] for row in holders if row.get("content_hash") in blobs}
+        ids = [row["id"] for row in holders if row.get("content_hash") not in blobs]
+        if hashes:
+            await run_query(lambda: supabase.table("file_blobs")
+                            .update({"crc32": crc})
+                            .in_("content_hash", list(hashes))
+                            .execute())
+        if ids:
+            await run_query(lambda: supabase.table("files")
+                            .update({"crc32": crc, "file_size": size})
+                            .in_("id", ids)
+                            .execute())
+
+    missing = {}
+    for row in rows:
+        if known(row) is None:
+            missing.setdefault(row["file_path"], []).append(row)
+    await asyncio.gather(*(backfill(path, holders) for path, holders in missing.items()))
+
+    entries = []
+    for row, name in zip(rows, unique_names([r["file_name"] for r in rows])):
+        crc, size = computed.get(row["file_path"]) or known(row)
+        entries.append(ZipEntry(name, size, crc, _modified(row), row["file_path"]))
+    return entries
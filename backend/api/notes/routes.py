@@ -1,16 +1,21 @@
-from fastapi import APIRouter, Depends, File, UploadFile,HTTPException
+from fastapi import APIRouter, Depends, File, UploadFile,HTTPException, Request, Response
 from typing import List
 from core.database import supabase
 from core.security import get_current_user
+from core.routing import FastJSONRoute
+from core.etag import row_etag, row_not_modified, set_validators
 from models.profile import ProfileData
 from api.notes.Schemas import NoteCreate, NoteOut, NoteUpdate
+from api.notes.service import delete_notes_cascade
 from api.courses.schemas import CourseOut
 from fastapi import Body
 from slugify import slugify
-from urllib.parse import urlparse
+from core.storage import path_from_public_url
+from core.images import store_image_variants, variant_paths, ImageProcessingError, NOTE_IMAGE_VARIANTS
+from uuid import uuid4
 import os
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 def sanitize_filename(filename: str) -> str:
     """Sanitize the filename to be safe for storage and avoid invalid characters."""
     name, ext = os.path.splitext(filename)
@@ -24,7 +29,7 @@ async def upload_image(
     file: UploadFile = File(...),
     user=Depends(get_current_user)
 ):
-    """Handle image upload for a specific note."""
+    """Handle image upload for a specific note, storing thumbnail/display/original WebP variants."""
     try:
         # Verify the note exists and belongs to the current user
         note_result = supabase.table("notes").select("user_id").eq("id", note_id).execute()
@@ -33,28 +38,25 @@ async def upload_image(
         if note_result.data[0]['user_id'] != user["id"]:
             raise HTTPException(status_code=403, detail="User is not the owner")
 
-        # Process file
+        # Process file into resized, metadata-free WebP variants
         file_content = await file.read()
-        safe_file_name = sanitize_filename(file.filename)
-        file_path = f"notes/{note_id}/{safe_file_name}"
-
-        # Upload the file to Supabase Storage (filesb bucket)
-        upload_result = supabase.storage.from_("filesb").upload(
-            file_path,
-            file_content,
-            {"content-type": file.content_type}
-        )
-
-        if isinstance(upload_result, dict) and 'error' in upload_result:
-            raise HTTPException(status_code=400, detail=upload_result['error'])
+        stem = os.path.splitext(sanitize_filename(file.filename))[0] or "image"
+        base_path = f"notes/{note_id}/{stem}-{uuid4().hex[:8]}"
+        try:
+            variants = await store_image_variants(base_path, file_content, NOTE_IMAGE_VARIANTS)
+        except ImageProcessingError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-        # Save image metadata in the database (notes_files table)
+        # Save image metadata in the database (notes_files table);
+        # file_path points at the display variant the editor embeds
+        display = variants["display"]
         file_data = {
             "note_id": note_id,
-            "file_name": safe_file_name,
-            "file_path": file_path,
-            "file_type": file.content_type,
-            "file_size": len(file_content),
+            "file_name": f"{stem}.webp",
+            "file_path": display["path"],
+            "file_type": "image/webp",
+            "file_size": display["bytes"],
+            "variants": variants,
         }
         insert_result = supabase.table("notes_files").insert(file_data).execute()
         if not insert_result.data:
@@ -127,9 +129,14 @@ async def list_user_notes(user=Depends(get_current_user)):
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/get_note/{note_id}", response_model=NoteOut)
-async def get_note(note_id: str, user=Depends(get_current_user)):
+async def get_note(note_id: str, request: Request, response: Response, user=Depends(get_current_user)):
     """Get a specific note by ID for the current user"""
     try:
+        # Probe updated_at first so an unchanged document is never re-sent
+        cached = await row_not_modified(request, "notes", note_id, user["id"])
+        if cached:
+            return cached
+
         result = supabase.table("notes")\
             .select("*")\
             .eq("id", note_id)\
@@ -140,6 +147,7 @@ async def get_note(note_id: str, user=Depends(get_current_user)):
         if not result.data:
             raise HTTPException(status_code=404, detail="Note not found")
 
+        set_validators(response, row_etag("notes", note_id, result.data["updated_at"]), result.data["updated_at"])
         return result.data
 
     except Exception as e:
@@ -193,11 +201,11 @@ async def edit_note(note_id: str, note_data: NoteUpdate, user=Depends(get_curren
 
 @router.delete("/delete_note/{note_id}")
 async def delete_note(note_id: str, user=Depends(get_current_user)):
-    """Delete a note owned by the user"""
+    """Delete a note owned by the user together with its images"""
     try:
         # Check if note exists and belongs to the user
         note = supabase.table("notes")\
-            .select("*")\
+            .select("id")\
             .eq("id", note_id)\
             .eq("user_id", user["id"])\
             .single()\
@@ -206,21 +214,10 @@ async def delete_note(note_id: str, user=Depends(get_current_user)):
         if not note.data:
             raise HTTPException(status_code=404, detail="Note not found")
 
-        # Delete associated files if any (assuming files are stored in a related "files" table)
-        files = supabase.table("files")\
-            .select("*")\
-            .eq("note_id", note_id)\
-            .execute()
-
-        if files.data:
-            paths = [f["file_path"] for f in files.data]
-            supabase.storage.from_("filesb").remove(paths)
-            supabase.table("files").delete().eq("note_id", note_id).execute()
-
-        # Delete the note
-        supabase.table("notes").delete().eq("id", note_id).execute()
+        # Images live in notes_files, not in the course files table
+        deleted = await delete_notes_cascade([note_id])
 
-        return {"message": "Note deleted successfully"}
+        return {"message": "Note deleted successfully", "deleted": deleted}
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -254,16 +251,13 @@ async def delete_image(
     """
     try:
         # Parse URL and extract file path
-        url_obj = urlparse(url)
-        path_parts = url_obj.path.split('/filesb/')
-        if len(path_parts) < 2:
+        file_path = path_from_public_url(url)
+        if not file_path:
             raise HTTPException(status_code=400, detail="Invalid image URL format")
         
-        file_path = path_parts[1].lstrip('/')
-        
         # 1. First verify the image exists and belongs to user
         file_record = supabase.table("notes_files") \
-            .select("note_id, file_path") \
+            .select("note_id, file_path, variants") \
             .eq("file_path", file_path) \
             .maybe_single() \
             .execute()
@@ -284,7 +278,10 @@ async def delete_image(
         # 3. Delete from storage
         try:
             # Supabase Python client v2 returns a list of results
-            storage_result = supabase.storage.from_("filesb").remove([file_path])
+            # Remove every stored variant along with the embedded one
+            storage_result = supabase.storage.from_("filesb").remove(
+                list(dict.fromkeys([file_path] + variant_paths(file_record.data.get("variants"))))
+            )
             
             # Check if we got an error response
             if isinstance(storage_result, dict) and storage_result.get("error"):
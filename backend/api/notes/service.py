@@ -0,0 +1,31 @@
+import asyncio
+from core.images import variant_paths
+from core.storage import remove_paths
+from core.utils import select_in, delete_in
+
+
+async def delete_notes_cascade(note_ids):
+    """
+    Delete notes together with their `notes_files` images and all image variants.
+    Image blobs and image rows are removed concurrently; the notes go last so
+    a failure never leaves images pointing at a missing note.
+    Returns counts of what was deleted.
+    """
+    note_ids = list(dict.fromkeys(note_ids))
+    if not note_ids:
+        return {"notes": 0, "note_images": 0, "blobs": 0}
+
+    images = await select_in("notes_files", "note_id", note_ids, "file_path, variants")
+    paths = [path for image in images for path in [image["file_path"]] + variant_paths(image.get("variants"))]
+
+    blobs_removed, images_deleted = await asyncio.gather(
+        remove_paths(paths),
+        delete_in("notes_files", "note_id", note_ids),
+    )
+    notes_deleted = await delete_in("notes", "id", note_ids)
+
+    return {
+        "notes": notes_deleted,
+        "note_images": images_deleted,
+        "blobs": blobs_removed,
+    }
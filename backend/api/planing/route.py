@@ -1,16 +1,15 @@
-from fastapi import APIRouter, Depends,Response, HTTPException
+from fastapi import APIRouter, Depends,Response, HTTPException, Request
 from typing import List
 from core.database import supabase
 from core.security import get_current_user
+from core.routing import FastJSONRoute
+from core.etag import collection_version, not_modified, set_validators
+from core.utils import run_query
 from api.courses.schemas import CourseOut
 from api.planing.schemas import ExamCreate, ExamOut
 from datetime import datetime
-from reportlab.pdfgen import canvas  # Import canvas here
-from reportlab.lib.pagesizes import letter  
-from fpdf import FPDF
-from .pdf_generator import generate_study_plan_pdf
 from datetime import date, timedelta
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 
 # Endpoint to get course names for a user
 
@@ -40,14 +39,20 @@ async def add_exam(
         raise HTTPException(status_code=400, detail=str(e))
 # Endpoint to get all exams for a user
 @router.get("/get_exams", response_model=List[ExamOut])
-async def get_exams_for_user(user=Depends(get_current_user)):
+async def get_exams_for_user(request: Request, response: Response, user=Depends(get_current_user)):
     """Get all exams for a user."""
     try:
+        etag, last_modified = await collection_version(user["id"], "exams")
+        cached = not_modified(request, etag, last_modified)
+        if cached:
+            return cached
+
         result = supabase.table("exams")\
             .select("*")\
             .eq("user_id", user["id"])\
             .order("exam_date", desc=True)\
             .execute()
+        set_validators(response, etag, last_modified)
         return result.data
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -56,22 +61,18 @@ async def get_exams_for_user(user=Depends(get_current_user)):
 async def delete_exam(exam_id: str, user=Depends(get_current_user)):
     """Delete an exam by its ID."""
     try:
-        # Check if the exam exists and belongs to the current user
-        result = supabase.table("exams")\
-            .select("*")\
-            .eq("id", exam_id)\
-            .eq("user_id", user["id"])\
-            .single()\
-            .execute()
+        # Filtered by owner, so the delete itself is the ownership check: one round trip
+        result = await run_query(
+            lambda: supabase.table("exams").delete().eq("id", exam_id).eq("user_id", user["id"]).execute()
+        )
 
         if not result.data:
             raise HTTPException(status_code=404, detail="Exam not found or you are not the owner")
 
-        # Delete the exam
-        supabase.table("exams").delete().eq("id", exam_id).execute()
-
         return {"message": "Exam deleted successfully"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -94,6 +95,8 @@ async def generate_study_plan(user=Depends(get_current_user)):
         if not exams:
             raise HTTPException(status_code=404, detail="No upcoming exams found")
 
+        # reportlab is only loaded when a plan is actually generated
+        from .pdf_generator import generate_study_plan_pdf
         pdf_content = generate_study_plan_pdf(exams)
 
         return Response(
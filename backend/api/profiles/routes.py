@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Request, HTTPException, status, Depends, File, UploadFile
+from fastapi import APIRouter, Request, Response, HTTPException, status, Depends, File, UploadFile
 from core.database import supabase
 from core.utils import get_session_from_request, create_redirect_response
 from models.profile import ProfileData
 from core.config import settings
 from core.security import get_current_user
+from core.routing import FastJSONRoute
+from core.etag import row_etag, row_not_modified, set_validators
+from core.images import store_image_variants, variant_paths, ImageProcessingError, AVATAR_VARIANTS
+from core.storage import path_from_public_url, remove_paths
+from uuid import uuid4
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 
 @router.post("/complete-profile")
 async def complete_profile(profile_data: ProfileData, request: Request):
@@ -42,17 +47,22 @@ async def complete_profile(profile_data: ProfileData, request: Request):
 
 
 @router.get("/me")
-async def get_current_profile(user=Depends(get_current_user)):
+async def get_current_profile(request: Request, response: Response, user=Depends(get_current_user)):
     try:
-        response = supabase.table("profiles")\
+        cached = await row_not_modified(request, "profiles", user["id"])
+        if cached:
+            return cached
+
+        result = supabase.table("profiles")\
             .select("*")\
             .eq("id", user["id"])\
             .execute()
 
-        if not response.data:
+        if not result.data:
             return {"profile_complete": False}
 
-        profile = response.data[0]  # Fix: access first item
+        profile = result.data[0]  # Fix: access first item
+        set_validators(response, row_etag("profiles", user["id"], profile.get("updated_at")), profile.get("updated_at"))
 
         return {
             "full_name": profile.get("full_name", ""),
@@ -117,22 +127,33 @@ async def delete_profile(user=Depends(get_current_user)):
 async def upload_profile_image(file: UploadFile = File(...), user=Depends(get_current_user)):
     try:
         file_content = await file.read()
-        file_ext = file.filename.split('.')[-1]
-        file_path = f"profiles/{user['id']}/profile.{file_ext}"
-
-        upload_result = supabase.storage.from_("filesb").upload(
-            path=file_path,
-            file=file_content,
-            file_options={"content-type": file.content_type}
-        )
+        # A fresh folder per upload keeps avatar URLs cache-safe
+        base_path = f"profiles/{user['id']}/avatar-{uuid4().hex[:8]}"
+        try:
+            variants = await store_image_variants(base_path, file_content, AVATAR_VARIANTS)
+        except ImageProcessingError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        previous = supabase.table("profiles")\
+            .select("image_url, image_variants")\
+            .eq("id", user["id"])\
+            .execute()
 
-        if isinstance(upload_result, dict) and upload_result.get("error"):
-            raise HTTPException(status_code=400, detail=upload_result["error"])
+        public_url = variants["display"]["url"]
+        supabase.table("profiles").update({
+            "image_url": public_url,
+            "image_variants": variants
+        }).eq("id", user["id"]).execute()
 
-        public_url = supabase.storage.from_("filesb").get_public_url(file_path)
-        supabase.table("profiles").update({"image_url": public_url}).eq("id", user["id"]).execute()
+        # Drop the replaced avatar once the profile points at the new one
+        if previous.data:
+            old = previous.data[0]
+            old_paths = variant_paths(old.get("image_variants")) + [path_from_public_url(old.get("image_url"))]
+            await remove_paths(p for p in old_paths if p and not p.startswith(base_path))
 
-        return {"message": "Image uploaded successfully", "image_url": public_url}
+        return {"message": "Image uploaded successfully", "image_url": public_url, "variants": variants}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Image upload failed: {str(e)}")
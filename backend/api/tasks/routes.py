@@ -1,10 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, Body, HTTPException, Depends, Query, Request, Response
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from pydantic import ValidationError
 from core.database import supabase
 from core.security import get_current_user
-from api.tasks.shemas import Task,TaskCreate  # Make sure this import matches the file structure
+from core.routing import FastJSONRoute
+from core.etag import collection_version, not_modified, set_validators
+from core.utils import run_query
+from api.tasks.shemas import (  # Make sure this import matches the file structure
+    MAX_BULK_TASKS, MAX_TASK_PAGE, BulkTaskResponse, Task, TaskComplete, TaskCreate, TaskIds, TaskSort,
+    TaskUpdateItem, as_utc,
+)
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 # Create Task
 @router.post("/create_task", response_model=Task)  # Response model is Task, request model is TaskCreate
 async def create_task(task: TaskCreate, user=Depends(get_current_user)):
@@ -14,7 +22,7 @@ async def create_task(task: TaskCreate, user=Depends(get_current_user)):
             "title": task.title.strip(),
             "description": task.description,
             "category": task.category,
-            "due_date": task.due_date,
+            "due_date": task.due_date.isoformat() if task.due_date else None,
             "completed": task.completed
         }
         
@@ -30,14 +38,62 @@ async def create_task(task: TaskCreate, user=Depends(get_current_user)):
 
 # Get All Tasks for the Current User
 @router.get("/get_tasks", response_model=List[Task])
-async def get_tasks(user=Depends(get_current_user)):
+async def get_tasks(
+    request: Request,
+    response: Response,
+    due_before: Optional[datetime] = Query(None, description="Only tasks due before this time (naive values are UTC)"),
+    due_after: Optional[datetime] = Query(None, description="Only tasks due at or after this time"),
+    category: Optional[str] = None,
+    completed: Optional[bool] = None,
+    sort: Optional[TaskSort] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_TASK_PAGE),
+    offset: int = Query(0, ge=0),
+    user=Depends(get_current_user),
+):
+    """
+    The user's tasks, filtered and ordered by the database (indexed on
+    user_id with due_date, category and completed). With `limit`, one page is
+    returned and `X-Total-Count` carries the number of matching tasks.
+    """
     try:
-        response = supabase.table("tasks").select("*").eq("user_id", user["id"]).execute()
+        # The version counter changes on every task write; probe it before pulling the list.
+        # Each filter combination is its own representation, so the query is part of the ETag.
+        etag, last_modified = await collection_version(user["id"], "tasks", str(request.query_params))
+        cached = not_modified(request, etag, last_modified)
+        if cached:
+            return cached
 
-        if not response.data:
+        def fetch():
+            query = supabase.table("tasks").select("*", count="exact" if limit else None).eq("user_id", user["id"])
+            if due_before is not None:
+                query = query.lt("due_date", as_utc(due_before).isoformat())
+            if due_after is not None:
+                query = query.gte("due_date", as_utc(due_after).isoformat())
+            if category is not None:
+                query = query.eq("category", category)
+            if completed is not None:
+                query = query.eq("completed", completed)
+            # Always a total order, with the key as tie-breaker, so pages never overlap or skip rows
+            if sort:
+                query = query.order(sort.lstrip("-"), desc=sort.startswith("-"), nullsfirst=False)
+            else:
+                query = query.order("created_at")
+            query = query.order("task_id")
+            if limit:
+                query = query.range(offset, offset + limit - 1)
+            elif offset:
+                query = query.offset(offset)
+            return query.execute()
+
+        result = await run_query(fetch)
+        set_validators(response, etag, last_modified)
+        if limit and result.count is not None:
+            response.headers["X-Total-Count"] = str(result.count)
+
+        if not result.data:
             return []
 
-        return response.data
+        return result.data
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching tasks: {str(e)}")
@@ -47,27 +103,26 @@ async def get_tasks(user=Depends(get_current_user)):
 @router.put("/update_task/{task_id}", response_model=Task)
 async def update_task(task_id: str, task: Task, user=Depends(get_current_user)):
     try:
-        # Check if task exists and belongs to the user
-        response = supabase.table("tasks").select("*").eq("task_id", task_id).eq("user_id", user["id"]).execute()
-
-        if not response.data:
-            raise HTTPException(status_code=404, detail="Task not found or does not belong to the user")
-
         task_data = {
             "title": task.title.strip(),
             "description": task.description,
             "category": task.category,
-            "due_date": task.due_date,
+            "due_date": task.due_date.isoformat() if task.due_date else None,
             "completed": task.completed
         }
 
-        result = supabase.table("tasks").update(task_data).eq("task_id", task_id).execute()
+        # Filtered by owner, so the update itself is the ownership check: one round trip
+        result = await run_query(
+            lambda: supabase.table("tasks").update(task_data).eq("task_id", task_id).eq("user_id", user["id"]).execute()
+        )
 
         if not result.data:
-            raise HTTPException(status_code=400, detail="Task update failed")
+            raise HTTPException(status_code=404, detail="Task not found or does not belong to the user")
 
         return result.data[0]
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating task: {str(e)}")
 
@@ -76,18 +131,150 @@ async def update_task(task_id: str, task: Task, user=Depends(get_current_user)):
 @router.delete("/delete_task/{task_id}", response_model=dict)
 async def delete_task(task_id: str, user=Depends(get_current_user)):
     try:
-        # Check if the task exists and belongs to the user
-        response = supabase.table("tasks").select("*").eq("task_id", task_id).eq("user_id", user["id"]).execute()
-
-        if not response.data:
-            raise HTTPException(status_code=404, detail="Task not found or does not belong to the user")
-
-        result = supabase.table("tasks").delete().eq("task_id", task_id).execute()
+        result = await run_query(
+            lambda: supabase.table("tasks").delete().eq("task_id", task_id).eq("user_id", user["id"]).execute()
+        )
 
         if not result.data:
-            raise HTTPException(status_code=400, detail="Task deletion failed")
+            raise HTTPException(status_code=404, detail="Task not found or does not belong to the user")
 
         return {"message": "Task deleted successfully"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting task: {str(e)}")
+
+
+# --- Bulk operations ---
+# Each runs as one statement scoped to the caller's user_id, so the number of
+# round trips does not grow with the batch. Items are reported individually.
+
+NOT_FOUND = "Task not found or does not belong to the user"
+
+
+def _bulk_response(results):
+    succeeded = sum(1 for r in results if r["ok"])
+    return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+
+
+def _results_by_id(task_ids, rows):
+    rows_by_id = {str(row["task_id"]): row for row in rows}
+    return _bulk_response([
+        {"index": index, "task_id": task_id, "ok": task_id in rows_by_id,
+         "error": None if task_id in rows_by_id else NOT_FOUND, "task": rows_by_id.get(task_id)}
+        for index, task_id in enumerate(task_ids)
+    ])
+
+
+def _validation_message(error):
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors())
+
+
+@router.post("/bulk_create", response_model=BulkTaskResponse)
+async def bulk_create_tasks(
+    tasks: List[Dict[str, Any]] = Body(..., min_length=1, max_length=MAX_BULK_TASKS),
+    user=Depends(get_current_user),
+):
+    """Create the valid tasks in one insert; invalid items are reported and skipped"""
+    results, rows, positions = [None] * len(tasks), [], []
+    for index, item in enumerate(tasks):
+        try:
+            task = TaskCreate(**item)
+        except ValidationError as e:
+            results[index] = {"index": index, "ok": False, "error": _validation_message(e)}
+            continue
+        rows.append({
+            "user_id": user["id"],
+            "title": task.title.strip(),
+            "description": task.description,
+            "category": task.category,
+            "due_date": task.due_date.isoformat() if task.due_date else None,
+            "completed": task.completed,
+        })
+        positions.append(index)
+
+    try:
+        created = (await run_query(lambda: supabase.table("tasks").insert(rows).execute())).data if rows else []
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creating tasks: {str(e)}")
+
+    # A multi-row insert returns its rows in the order they were given
+    for index, row in zip(positions, created):
+        results[index] = {"index": index, "task_id": str(row["task_id"]), "ok": True, "task": row}
+    for index in positions[len(created):]:
+        results[index] = {"index": index, "ok": False, "error": "Task creation failed"}
+    return _bulk_response(results)
+
+
+@router.put("/bulk_update", response_model=BulkTaskResponse)
+async def bulk_update_tasks(
+    items: List[TaskUpdateItem] = Body(..., min_length=1, max_length=MAX_BULK_TASKS),
+    user=Depends(get_current_user),
+):
+    """Apply per-task partial updates through the bulk_update_tasks RPC (one statement)"""
+    changes = {}
+    for item in items:
+        data = item.dict(exclude_unset=True)
+        # description, category and due_date are cleared by null, as in /update_task; a null title or completed is ignored
+        for key in ("title", "completed"):
+            if data.get(key) is None:
+                data.pop(key, None)
+        if "title" in data:
+            data["title"] = data["title"].strip()
+        if data.get("due_date") is not None:
+            data["due_date"] = data["due_date"].isoformat()
+        # A task listed twice gets its changes merged, later items winning
+        changes.setdefault(item.task_id, {}).update(data)
+
+    try:
+        result = await run_query(
+            lambda: supabase.rpc("bulk_update_tasks", {"p_user_id": user["id"], "p_items": list(changes.values())}).execute()
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error updating tasks: {str(e)}")
+    return _results_by_id([item.task_id for item in items], result.data or [])
+
+
+@router.put("/bulk_complete", response_model=BulkTaskResponse)
+async def bulk_complete_tasks(payload: TaskComplete, user=Depends(get_current_user)):
+    """Mark tasks complete (or not) with one filtered update"""
+    try:
+        result = await run_query(
+            lambda: supabase.table("tasks")
+            .update({"completed": payload.completed})
+            .in_("task_id", list(dict.fromkeys(payload.task_ids)))
+            .eq("user_id", user["id"])
+            .execute()
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error updating tasks: {str(e)}")
+    return _results_by_id(payload.task_ids, result.data or [])
+
+
+@router.post("/bulk_delete", response_model=BulkTaskResponse)
+async def bulk_delete_tasks(payload: TaskIds, user=Depends(get_current_user)):
+    """Delete tasks with one filtered delete"""
+    try:
+        result = await run_query(
+            lambda: supabase.table("tasks")
+            .delete()
+            .in_("task_id", list(dict.fromkeys(payload.task_ids)))
+            .eq("user_id", user["id"])
+            .execute()
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting tasks: {str(e)}")
+    return _results_by_id(payload.task_ids, result.data or [])
+
+
+@router.delete("/clear_completed", response_model=dict)
+async def clear_completed_tasks(user=Depends(get_current_user)):
+    """Delete every completed task of the user in one statement"""
+    try:
+        result = await run_query(
+            lambda: supabase.table("tasks").delete().eq("user_id", user["id"]).eq("completed", True).execute()
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error clearing tasks: {str(e)}")
+    return {"deleted": len(result.data or [])}
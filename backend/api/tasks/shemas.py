@@ -1,20 +1,38 @@
 # In your schemas.py
-from pydantic import BaseModel, Field
-from typing import Optional
-from datetime import date
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Literal, Optional
+from datetime import datetime, timezone
 
-class TaskBase(BaseModel):
+
+def as_utc(value):
+    """Timestamps without an offset are taken as UTC"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class DueDate(BaseModel):
+    # timestamptz; a plain date ("2026-10-19") means midnight UTC
+    due_date: Optional[datetime] = None
+
+    @field_validator("due_date", mode="before")
+    @classmethod
+    def _blank_is_none(cls, value):
+        # The task form sends "" when no date is picked
+        return None if value == "" else value
+
+    @field_validator("due_date")
+    @classmethod
+    def _to_utc(cls, value):
+        return as_utc(value)
+
+
+class TaskBase(DueDate):
     title: str
     description: Optional[str] = None
     category: Optional[str] = "General"
-    due_date: Optional[str] = None  # Changed from date to str
     completed: bool = False
 
-    class Config:
-        json_encoders = {
-            date: lambda v: v.isoformat() if v else None
-        }
-
 class TaskCreate(TaskBase):
     pass
 
@@ -22,4 +40,43 @@ class Task(TaskBase):
     id: str = Field(..., alias="task_id")
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+# Orderings /tasks/get_tasks accepts; a leading "-" sorts descending, undated tasks come last
+TaskSort = Literal["due_date", "-due_date", "created_at", "-created_at", "title", "-title"]
+MAX_TASK_PAGE = 500
+
+
+# Bulk operations run as one statement, so a batch is capped like an `in.(...)` filter
+MAX_BULK_TASKS = 200
+
+
+class TaskUpdateItem(DueDate):
+    """Partial update of one task; only the fields that are set are written"""
+    task_id: str
+    title: Optional[str] = None
+    description: Optional[str] = None
+    category: Optional[str] = None
+    completed: Optional[bool] = None
+
+
+class TaskIds(BaseModel):
+    task_ids: List[str] = Field(..., min_length=1, max_length=MAX_BULK_TASKS)
+
+
+class TaskComplete(TaskIds):
+    completed: bool = True
+
+
+class BulkTaskResult(BaseModel):
+    index: int
+    task_id: Optional[str] = None
+    ok: bool
+    error: Optional[str] = None
+    task: Optional[Task] = None
+
+
+class BulkTaskResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkTaskResult]
@@ -0,0 +1,68 @@
+# bench/compare.py
+"""
+Compares two bench.load_test reports, e.g. from two commits.
+
+Run from backend/:
+    python -m bench.compare baseline.json candidate.json [--metric p95_ms] [--threshold-pct 10]
+Exits non-zero when any scenario's latency metric regressed by more than the threshold.
+"""
+import argparse
+import json
+
+
+def _change(before, after):
+    if not before or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def compare(baseline, candidate, metric, threshold):
+    rows, regressions = [], []
+    for name in sorted(set(baseline["scenarios"]) | set(candidate["scenarios"])):
+        before = baseline["scenarios"].get(name, {})
+        after = candidate["scenarios"].get(name, {})
+        latency = _change(before.get(metric), after.get(metric))
+        throughput = _change(before.get("throughput_ops"), after.get("throughput_ops"))
+        rows.append((name, before.get(metric), after.get(metric), latency,
+                     before.get("throughput_ops"), after.get("throughput_ops"), throughput,
+                     after.get("errors")))
+        if latency is not None and latency > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def _fmt(value, pct=False):
+    if value is None:
+        return "-"
+    return f"{value:+.1f}%" if pct else f"{value:.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", default="p95_ms", choices=["p50_ms", "p95_ms", "p99_ms", "mean_ms"])
+    parser.add_argument("--threshold-pct", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    rows, regressions = compare(baseline, candidate, args.metric, args.threshold_pct)
+    print(f"{baseline.get('commit')} -> {candidate.get('commit')} ({args.metric})")
+    header = ("scenario", "before", "after", "change", "ops/s before", "ops/s after", "change", "errors")
+    print("  ".join(f"{h:>14}" for h in header))
+    for name, before, after, latency, tp_before, tp_after, throughput, errors in rows:
+        print("  ".join(f"{v:>14}" for v in (
+            name, _fmt(before), _fmt(after), _fmt(latency, True),
+            _fmt(tp_before), _fmt(tp_after), _fmt(throughput, True), "-" if errors is None else errors,
+        )))
+    if regressions:
+        print(f"regressed beyond {args.threshold_pct}%: {', '.join(regressions)}")
+    raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# bench/compression.py
+"""
+Bandwidth and latency effect of response compression on realistic payloads:
+a note list, a chat history, an explain_file reply and the category catalog.
+For each available encoding it reports the compressed size, the compression
+CPU time and the estimated time to deliver the body over a given link
+(compression time + transfer time), against the uncompressed body.
+
+Run from backend/:
+    python -m bench.compression [--mbps 10] [--repeat 20]
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+import orjson
+
+from bench.json_render import note_rows
+from core.compression import ENCODINGS, PrecompressedPayload, compress
+from utils.course_categories import get_categories_by_specialization
+
+
+def payloads(seed=7):
+    rng = random.Random(seed)
+    sentences = [
+        "The gradient points in the direction of steepest ascent.",
+        "Backpropagation applies the chain rule layer by layer.",
+        "A normalised database avoids update anomalies.",
+        "TCP retransmits segments that were not acknowledged in time.",
+        "Eigenvectors keep their direction under the linear map.",
+    ]
+    history = [
+        {
+            "id": f"msg-{i}", "conversation_id": "conv-1", "role": "user" if i % 2 == 0 else "assistant",
+            "content": " ".join(rng.choices(sentences, k=3 if i % 2 == 0 else 12)),
+            "created_at": "2026-10-19T09:00:00+00:00",
+        }
+        for i in range(200)
+    ]
+    explanation = {"reply": "\n\n".join(" ".join(rng.choices(sentences, k=8)) for _ in range(30))}
+    categories = get_categories_by_specialization()
+    categories.append({"value": "other", "label": "Other"})
+    return {
+        "note_list": orjson.dumps(note_rows(256, seed)),
+        "chat_history": orjson.dumps(history),
+        "explain_reply": orjson.dumps(explanation),
+        "category_catalog": orjson.dumps(categories),
+    }
+
+
+def _median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mbps", type=float, default=10.0, help="client link speed in megabits per second")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    def transfer_ms(size):
+        return size * 8 / (args.mbps * 1e6) * 1000
+
+    report = {"mbps": args.mbps, "encodings": list(ENCODINGS), "payloads": {}}
+    for name, body in payloads().items():
+        entry = {"bytes": len(body), "identity_ms": round(transfer_ms(len(body)), 2), "encodings": {}}
+        for encoding in ENCODINGS:
+            compressed = compress(encoding, body)
+            cpu_ms = _median_ms(lambda: compress(encoding, body), args.repeat)
+            entry["encodings"][encoding] = {
+                "bytes": len(compressed),
+                "ratio": round(len(body) / len(compressed), 1),
+                "compress_ms": round(cpu_ms, 3),
+                "total_ms": round(cpu_ms + transfer_ms(len(compressed)), 2),
+            }
+        report["payloads"][name] = entry
+
+    # The catalog is served from PrecompressedPayload: no per-request compression
+    catalog = PrecompressedPayload(payloads()["category_catalog"])
+    report["payloads"]["category_catalog"]["precompressed_bytes"] = {
+        encoding: len(data) for encoding, data in catalog.variants.items()
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
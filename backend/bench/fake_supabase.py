@@ -0,0 +1,711 @@
+# bench/fake_supabase.py
+"""
+In-process stand-in for the Supabase services the backend talks to, plus an
+OpenAI-compatible Groq endpoint, so the real FastAPI app can be benchmarked
+without a Supabase project.
+
+Implements the subset the backend uses:
+    PostgREST  /rest/v1/{table}, /rest/v1/rpc/{fn}
+    Storage    /storage/v1/object/...
+    GoTrue     /auth/v1/token, /auth/v1/user, /auth/v1/logout
+    Groq       /openai/v1/chat/completions
+Every request can be delayed with injected latency; LLM calls can also fail
+at a configurable rate.
+"""
+import asyncio
+import base64
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+# Tables whose primary key is not `id`
+PRIMARY_KEYS = {"tasks": "task_id", "file_blobs": "content_hash"}
+# Tables with an `updated_at` column maintained on insert and update
+TOUCHED_TABLES = {"notes", "conversations", "courses", "profiles"}
+# Tables whose writes bump collection_versions (triggers in supabase/migrations)
+VERSIONED_TABLES = {"tasks", "exams"}
+# Column defaults applied on insert (`default` clauses in supabase/migrations)
+COLUMN_DEFAULTS = {"conversations": {"message_count": 0, "token_total": 0}}
+# Query parameters that are not column filters
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+def _as_datetime(value):
+    """Parse a stored ISO date or timestamp; values without an offset are UTC like timestamptz input"""
+    stamp = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return stamp if stamp.tzinfo else stamp.replace(tzinfo=timezone.utc)
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+
+def issue_token(user, ttl=3600):
+    """Unsigned JWT carrying the user id; enough for the clients, which do not verify signatures"""
+    payload = {"sub": user["id"], "email": user["email"], "exp": int(time.time()) + ttl, "role": "authenticated"}
+    return f"{_b64({'alg': 'HS256', 'typ': 'JWT'})}.{_b64(payload)}.bench"
+
+
+def _token_subject(token):
+    try:
+        payload = token.split(".")[1]
+        return json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))["sub"]
+    except (IndexError, KeyError, ValueError):
+        return None
+
+
+def _coerce(value, sample):
+    """Convert a filter literal to the type of the stored value it is compared with"""
+    if value == "null":
+        return None
+    if isinstance(sample, bool):
+        return value.lower() == "true"
+    if isinstance(sample, (int, float)):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _split_list(literal):
+    """Parse `(a,"b,c",d)` as used by the `in` operator"""
+    items, current, quoted = [], "", False
+    for char in literal.strip("()"):
+        if char == '"':
+            quoted = not quoted
+        elif char == "," and not quoted:
+            items.append(current)
+            current = ""
+        else:
+            current += char
+    if current or items:
+        items.append(current)
+    return items
+
+
+def _matches(row, column, expression):
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    operator, _, literal = expression.partition(".")
+    value = row.get(column)
+
+    if operator == "is":
+        result = value is None if literal == "null" else value == (literal == "true")
+    elif operator == "in":
+        result = str(value) in _split_list(literal)
+    elif operator in ("like", "ilike"):
+        pattern = literal.replace("*", "%")
+        text, pattern = (str(value or ""), pattern) if operator == "like" else (str(value or "").lower(), pattern.lower())
+        result = _like(text, pattern)
+    else:
+        literal = _coerce(literal, value)
+        if value is None or literal is None:
+            result = operator == "eq" and value is literal
+        elif operator == "eq":
+            result = value == literal or str(value) == str(literal)
+        elif operator == "neq":
+            result = not (value == literal or str(value) == str(literal))
+        elif operator == "gt":
+            result = value > literal
+        elif operator == "gte":
+            result = value >= literal
+        elif operator == "lt":
+            result = value < literal
+        elif operator == "lte":
+            result = value <= literal
+        else:
+            raise ValueError(f"unsupported operator {operator}")
+    return not result if negate else result
+
+
+def _like(text, pattern):
+    parts = pattern.split("%")
+    if len(parts) == 1:
+        return text == pattern
+    if not text.startswith(parts[0]) or not text.endswith(parts[-1]):
+        return False
+    position = len(parts[0])
+    for part in parts[1:-1]:
+        position = text.find(part, position)
+        if position < 0:
+            return False
+        position += len(part)
+    return True
+
+
+def _project(row, select):
+    if not select or select.strip() == "*":
+        return dict(row)
+    columns = [c.strip() for c in select.split(",") if c.strip()]
+    if "*" in columns:
+        return dict(row)
+    return {c: row.get(c) for c in columns}
+
+
+def _sort(rows, order):
+    for term in reversed(order.split(",")):
+        column, *modifiers = term.split(".")
+        descending = "desc" in modifiers
+        present = [r for r in rows if r.get(column) is not None]
+        missing = [r for r in rows if r.get(column) is None]
+        present.sort(key=lambda r: r[column], reverse=descending)
+        rows = present + missing
+    return rows
+
+
+class FakeSupabase:
+    """Holds the fake database, bucket objects and users, and serves them over HTTP"""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, llm_latency_ms=0.0, llm_error_rate=0.0, seed=7,
+                 llm_slow_rate=0.0, llm_slow_ms=0.0, llm_model_latency_ms=None, llm_context_tokens=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.llm_latency_ms = llm_latency_ms
+        self.llm_error_rate = llm_error_rate
+        # A `llm_slow_rate` share of completions takes `llm_slow_ms` longer (tail latency)
+        self.llm_slow_rate = llm_slow_rate
+        self.llm_slow_ms = llm_slow_ms
+        # Per-model base latency overriding llm_latency_ms, e.g. a slow primary model
+        self.llm_model_latency_ms = llm_model_latency_ms or {}
+        # Prompts plus max_tokens beyond this are rejected like the real API does (0: unlimited)
+        self.llm_context_tokens = llm_context_tokens
+        self.llm_rejected = 0
+        self.llm_calls = {}
+        self.random = random.Random(seed)
+        self.tables = {}
+        self.objects = {}
+        self.users = {}
+        self.rpcs = dict(RPCS)
+        self.requests = 0
+        self.app = Starlette(routes=[
+            Route("/rest/v1/rpc/{fn}", self.rpc, methods=["POST", "GET"]),
+            Route("/rest/v1/{table}", self.rest, methods=["GET", "HEAD", "POST", "PATCH", "DELETE"]),
+            Route("/storage/v1/object/list/{bucket}", self.storage_list, methods=["POST"]),
+            Route("/storage/v1/object/sign/{bucket}/{path:path}", self.storage_sign, methods=["POST", "GET"]),
+            Route("/storage/v1/object/public/{bucket}/{path:path}", self.storage_download, methods=["GET"]),
+            Route("/storage/v1/object/authenticated/{bucket}/{path:path}", self.storage_download, methods=["GET"]),
+            Route("/storage/v1/object/{bucket}/{path:path}", self.storage_object, methods=["POST", "PUT", "GET", "HEAD"]),
+            Route("/storage/v1/object/{bucket}", self.storage_remove, methods=["DELETE"]),
+            Route("/auth/v1/token", self.auth_token, methods=["POST"]),
+            Route("/auth/v1/user", self.auth_user, methods=["GET", "PUT"]),
+            Route("/auth/v1/logout", self.auth_logout, methods=["POST"]),
+            Route("/openai/v1/chat/completions", self.chat_completions, methods=["POST"]),
+        ])
+
+    # --- data helpers ---
+
+    def table(self, name):
+        return self.tables.setdefault(name, [])
+
+    def insert(self, table, row):
+        row = {**COLUMN_DEFAULTS.get(table, {}), **row}
+        key = PRIMARY_KEYS.get(table, "id")
+        row.setdefault(key, str(uuid.uuid4()))
+        row.setdefault("created_at", now_iso())
+        if table in TOUCHED_TABLES:
+            row.setdefault("updated_at", row["created_at"])
+        self.table(table).append(row)
+        self._bump_versions(table, [row])
+        return row
+
+    def _bump_versions(self, table, rows):
+        if table not in VERSIONED_TABLES:
+            return
+        for user_id in {r.get("user_id") for r in rows}:
+            versions = self.table("collection_versions")
+            current = next((v for v in versions if v["user_id"] == user_id and v["collection"] == table), None)
+            if current is None:
+                versions.append({"user_id": user_id, "collection": table, "version": 1, "updated_at": now_iso()})
+            else:
+                current["version"] += 1
+                current["updated_at"] = now_iso()
+
+    def add_user(self, email, password="bench-password"):
+        user = {"id": str(uuid.uuid4()), "email": email, "password": password}
+        self.users[user["id"]] = user
+        return user
+
+    def put_object(self, path, content, content_type="application/octet-stream"):
+        self.objects[path] = {"content": content, "content_type": content_type, "created_at": now_iso()}
+
+    async def _delay(self, base_ms):
+        delay = base_ms + (self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    # --- PostgREST ---
+
+    def _filtered(self, table, params):
+        rows = self.table(table)
+        for column, expression in params:
+            if column in RESERVED_PARAMS:
+                continue
+            rows = [r for r in rows if _matches(r, column, expression)]
+        return rows
+
+    def _respond_rows(self, request, rows, total=None):
+        prefer = request.headers.get("prefer", "")
+        headers = {}
+        if "count=" in prefer:
+            count = len(rows) if total is None else total
+            headers["content-range"] = f"0-{max(len(rows) - 1, 0)}/{count}"
+        if request.headers.get("accept") == "application/vnd.pgrst.object+json":
+            if len(rows) != 1:
+                return JSONResponse({
+                    "code": "PGRST116",
+                    "details": f"The result contains {len(rows)} rows",
+                    "hint": None,
+                    "message": "JSON object requested, multiple (or no) rows returned",
+                }, status_code=406)
+            return JSONResponse(rows[0], headers=headers)
+        if request.method != "GET" and "return=representation" not in prefer:
+            return Response(status_code=204, headers=headers)
+        return JSONResponse(rows, headers=headers)
+
+    async def rest(self, request: Request):
+        await self._delay(self.latency_ms)
+        self.requests += 1
+        table = request.path_params["table"]
+        params = list(request.query_params.multi_items())
+        query = dict(params)
+        select = query.get("select", "*")
+
+        if request.method in ("GET", "HEAD"):
+            rows = self._filtered(table, params)
+            total = len(rows)
+            if "order" in query:
+                rows = _sort(rows, query["order"])
+            offset = int(query.get("offset", 0))
+            rows = rows[offset:offset + int(query["limit"])] if "limit" in query else rows[offset:]
+            return self._respond_rows(request, [_project(r, select) for r in rows], total)
+
+        if request.method == "POST":
+            body = await request.json()
+            payload = body if isinstance(body, list) else [body]
+            prefer = request.headers.get("prefer", "")
+            key = query.get("on_conflict", PRIMARY_KEYS.get(table, "id"))
+            written = []
+            for item in payload:
+                existing = None
+                if "resolution=merge-duplicates" in prefer and item.get(key) is not None:
+                    existing = next((r for r in self.table(table) if r.get(key) == item[key]), None)
+                if existing is not None:
+                    existing.update(item)
+                    if table in TOUCHED_TABLES:
+                        existing["updated_at"] = now_iso()
+                    self._bump_versions(table, [existing])
+                    written.append(existing)
+                else:
+                    written.append(self.insert(table, item))
+            return self._respond_rows(request, [_project(r, select) for r in written])
+
+        if request.method == "PATCH":
+            changes = await request.json()
+            rows = self._filtered(table, params)
+            for row in rows:
+                row.update(changes)
+                if table in TOUCHED_TABLES and "updated_at" not in changes:
+                    row["updated_at"] = now_iso()
+            self._bump_versions(table, rows)
+            return self._respond_rows(request, [_project(r, select) for r in rows])
+
+        rows = self._filtered(table, params)
+        doomed = {id(r) for r in rows}
+        self.tables[table] = [r for r in self.table(table) if id(r) not in doomed]
+        self._bump_versions(table, rows)
+        return self._respond_rows(request, [_project(r, select) for r in rows])
+
+    async def rpc(self, request: Request):
+        await self._delay(self.latency_ms)
+        self.requests += 1
+        fn = self.rpcs.get(request.path_params["fn"])
+        if fn is None:
+            return JSONResponse({"code": "PGRST202", "message": "function not found", "details": None, "hint": None},
+                                status_code=404)
+        params = await request.json() if request.method == "POST" else dict(request.query_params)
+        result = fn(self, params or {})
+        # Functions always return their result, whatever the Prefer header says
+        if isinstance(result, list) and request.headers.get("accept") == "application/vnd.pgrst.object+json":
+            return self._respond_rows(request, result)
+        return JSONResponse(result)
+
+    # --- Storage ---
+
+    async def storage_object(self, request: Request):
+        await self._delay(self.latency_ms)
+        self.requests += 1
+        path = request.path_params["path"]
+        if request.method in ("POST", "PUT"):
+            if path in self.objects and request.method == "POST" and request.headers.get("x-upsert") != "true":
+                return JSONResponse({"statusCode": "409", "error": "Duplicate", "message": "The resource already exists"},
+                                    status_code=400)
+            form = await request.form()
+            upload = form["file"]
+            self.put_object(path, await upload.read(), upload.content_type or "application/octet-stream")
+            return JSONResponse({"Key": f"{request.path_params['bucket']}/{path}"})
+        return self._serve_object(request, path)
+
+    async def storage_download(self, request: Request):
+        await self._delay(self.latency_ms)
+        self.requests += 1
+        return self._serve_object(request, request.path_params["path"])
+
+    def _serve_object(self, request, path):
+        stored = self.objects.get(path)
+        if stored is None:
+            return JSONResponse({"statusCode": "404", "error": "not_found", "message": "Object not found"},
+                                status_code=400)
+        content = stored["content"]
+        range_header = request.headers.get("range")
+        if range_header and range_header.startswith("bytes="):
+            start, _, end = range_header[6:].partition("-")
+            start = int(start)
+            end = int(end) if end else len(content) - 1
+            return Response(content[start:end + 1], status_code=206, media_type=stored["content_type"], headers={
+                "content-range": f"bytes {start}-{end}/{len(content)}",
+                "accept-ranges": "bytes",
+            })
+        return Response(content, media_type=stored["content_type"], headers={"accept-ranges": "bytes"})
+
+    async def storage_sign(self, request: Request):
+        await self._delay(self.latency_ms)
+        self.requests += 1
+        bucket, path = request.path_params["bucket"], request.path_params["path"]
+        if request.method == "GET":
+            return self._serve_object(request, path)
+        return JSONResponse({"signedURL": f"/object/sign/{bucket}/{path}?token=bench"})
+
+    async def storage_remove(self, request: Request):
+        await self._delay(self.latency_ms)
+        self.requests += 1
+        body = await request.json()
+        removed = []
+        for path in body.get("prefixes", []):
+            if self.objects.pop(path, None) is not None:
+                removed.append({"name": path, "bucket_id": request.path_params["bucket"]})
+        return JSONResponse(removed)
+
+    async def storage_list(self, request: Request):
+        await self._delay(self.latency_ms)
+        self.requests += 1
+        body = await request.json()
+        prefix = body.get("prefix", "").strip("/")
+        prefix = f"{prefix}/" if prefix else ""
+        entries = {}
+        for path, stored in self.objects.items():
+            if not path.startswith(prefix):
+                continue
+            name, _, rest = path[len(prefix):].partition("/")
+            if rest:
+                entries.setdefault(name, {"name": name, "id": None, "metadata": None})
+            else:
+                entries[name] = {
+                    "name": name,
+                    "id": path,
+                    "created_at": stored["created_at"],
+                    "updated_at": stored["created_at"],
+                    "metadata": {"size": len(stored["content"]), "mimetype": stored["content_type"]},
+                }
+        listing = sorted(entries.values(), key=lambda e: e["name"])
+        offset, limit = body.get("offset", 0), body.get("limit", 100)
+        return JSONResponse(listing[offset:offset + limit])
+
+    # --- GoTrue ---
+
+    def _user_json(self, user):
+        return {
+            "id": user["id"],
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": user["email"],
+            "app_metadata": {"provider": "email"},
+            "user_metadata": {},
+            "created_at": "2025-01-01T00:00:00+00:00",
+        }
+
+    def _session_json(self, user):
+        return {
+            "access_token": issue_token(user),
+            "refresh_token": f"refresh-{user['id']}",
+            "expires_in": 3600,
+            "expires_at": int(time.time()) + 3600,
+            "token_type": "bearer",
+            "user": self._user_json(user),
+        }
+
+    async def auth_token(self, request: Request):
+        await self._delay(self.latency_ms)
+        self.requests += 1
+        body = await request.json()
+        if request.query_params.get("grant_type") == "refresh_token":
+            user = self.users.get(body.get("refresh_token", "").removeprefix("refresh-"))
+        else:
+            user = next((u for u in self.users.values()
+                         if u["email"] == body.get("email") and u["password"] == body.get("password")), None)
+        if user is None:
+            return JSONResponse({"error": "invalid_grant", "error_description": "Invalid login credentials",
+                                 "code": 400, "msg": "Invalid login credentials"}, status_code=400)
+        return JSONResponse(self._session_json(user))
+
+    async def auth_user(self, request: Request):
+        await self._delay(self.latency_ms)
+        self.requests += 1
+        token = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        user = self.users.get(_token_subject(token))
+        if user is None:
+            return JSONResponse({"code": 401, "msg": "invalid JWT"}, status_code=401)
+        return JSONResponse(self._user_json(user))
+
+    async def auth_logout(self, request: Request):
+        await self._delay(self.latency_ms)
+        return Response(status_code=204)
+
+    # --- Groq ---
+
+    async def chat_completions(self, request: Request):
+        body = await request.json()
+        model = body.get("model", "fake")
+        self.llm_calls[model] = self.llm_calls.get(model, 0) + 1
+        latency = self.llm_model_latency_ms.get(model, self.llm_latency_ms)
+        if self.llm_slow_rate and self.random.random() < self.llm_slow_rate:
+            latency += self.llm_slow_ms
+        await self._delay(latency)
+        self.requests += 1
+        prompt_chars = sum(len(m.get("content") or "") for m in body.get("messages", []))
+        if self.llm_context_tokens and prompt_chars // 4 + (body.get("max_tokens") or 0) > self.llm_context_tokens:
+            self.llm_rejected += 1
+            return JSONResponse({"error": {
+                "message": "Please reduce the length of the messages or completion.",
+                "type": "invalid_request_error", "code": "context_length_exceeded",
+            }}, status_code=400)
+        if self.llm_error_rate and self.random.random() < self.llm_error_rate:
+            return JSONResponse({"error": {"message": "injected failure", "type": "server_error"}}, status_code=503)
+        reply = "This is a benchmark reply. " * 8
+        return JSONResponse({
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(reply) // 4,
+                "total_tokens": prompt_chars // 4 + len(reply) // 4,
+            },
+        })
+
+
+# --- RPCs from supabase/migrations, reimplemented over the fake tables ---
+
+def _acquire_file_blob(db, p):
+    blob = next((b for b in db.table("file_blobs") if b["content_hash"] == p["p_content_hash"]), None)
+    if blob is not None:
+        if blob.get("released_at"):
+            # Revive a tombstone under a new path; its old object may still be being removed
+            blob.update(ref_count=0, uploaded=False, thumbnail_path=None, released_at=None,
+                        storage_path=f"{p['p_storage_path']}.{uuid.uuid4().hex[:8]}")
+        blob["ref_count"] += 1
+        blob["acquired_at"] = now_iso()
+        if blob.get("crc32") is None:
+            blob["crc32"] = p.get("p_crc32")
+        return [{**blob, "created": False}]
+    blob = db.insert("file_blobs", {
+        "content_hash": p["p_content_hash"], "storage_path": p["p_storage_path"], "size": p["p_size"],
+        "content_type": p["p_content_type"], "ref_count": 1, "extracted_text": None, "thumbnail_path": None,
+        "crc32": p.get("p_crc32"), "uploaded": False, "acquired_at": now_iso(), "released_at": None,
+    })
+    return [{**blob, "created": True}]
+
+
+def _release_file_blobs(db, p):
+    live = [b for b in db.table("file_blobs") if not b.get("released_at")]
+    for content_hash in p["p_content_hashes"]:
+        for blob in live:
+            if blob["content_hash"] == content_hash:
+                blob["ref_count"] -= 1
+    released = []
+    for blob in live:
+        if blob["content_hash"] in p["p_content_hashes"] and blob["ref_count"] <= 0:
+            blob["released_at"] = now_iso()
+            released.append({"storage_path": blob["storage_path"], "thumbnail_path": blob["thumbnail_path"]})
+    return released
+
+
+def _delete_released_file_blobs(db, p):
+    doomed = [b for b in db.table("file_blobs")
+              if b["storage_path"] in p["p_storage_paths"] and b.get("released_at")]
+    for blob in doomed:
+        db.tables["file_blobs"].remove(blob)
+    return len(doomed)
+
+
+def _bulk_update_tasks(db, p):
+    updated = []
+    for item in p["p_items"]:
+        for task in db.table("tasks"):
+            if str(task["task_id"]) == str(item["task_id"]) and task["user_id"] == p["p_user_id"]:
+                task.update({k: v for k, v in item.items() if k != "task_id"})
+                updated.append(task)
+    db._bump_versions("tasks", updated)
+    return updated
+
+
+def _toggle_announcement_status(db, p):
+    toggled = []
+    for row in db.table("help_announcements"):
+        if str(row["id"]) == p["p_id"] and row["user_id"] == p["p_user_id"]:
+            row["status"] = "closed" if row["status"] == "open" else "open"
+            toggled.append(row)
+    return toggled
+
+
+def _try_acquire_lease(db, p):
+    leases = db.table("maintenance_leases")
+    now = datetime.now(timezone.utc)
+    lease = next((l for l in leases if l["name"] == p["p_name"]), None)
+    if lease is not None and lease["expires_at"] > now and lease["holder"] != p["p_holder"]:
+        return False
+    if lease is None:
+        lease = {"name": p["p_name"]}
+        leases.append(lease)
+    lease.update(holder=p["p_holder"], expires_at=now + timedelta(seconds=p["p_ttl_seconds"]))
+    return True
+
+
+def _purge_expired_exams(db, p):
+    before = datetime.fromisoformat(p["p_before"])
+    expired = sorted(
+        (e for e in db.table("exams") if _as_datetime(e["exam_date"]) < before),
+        key=lambda e: _as_datetime(e["exam_date"]),
+    )[:p.get("p_batch_size", 1000)]
+    doomed = {id(e) for e in expired}
+    db.tables["exams"] = [e for e in db.table("exams") if id(e) not in doomed]
+    db._bump_versions("exams", expired)
+    return len(expired)
+
+
+def _reconcile_file_blob_refs(db, p):
+    counts = {}
+    for f in db.table("files"):
+        if f.get("content_hash"):
+            counts[f["content_hash"]] = counts.get(f["content_hash"], 0) + 1
+    # p_min_age arrives as a Postgres interval literal, "<n> seconds"
+    now = datetime.now(timezone.utc)
+    min_age = timedelta(seconds=int(p.get("p_min_age", "86400 seconds").split()[0]))
+    grace = timedelta(seconds=int(p.get("p_grace", "3600 seconds").split()[0]))
+    released = []
+    for blob in db.table("file_blobs"):
+        if blob.get("released_at"):
+            # A release that crashed between tombstoning and deleting the row
+            if _as_datetime(blob["released_at"]) < now - grace:
+                blob["released_at"] = now_iso()
+                released.append({"storage_path": blob["storage_path"], "thumbnail_path": blob["thumbnail_path"]})
+            continue
+        acquired_at = _as_datetime(blob.get("acquired_at") or blob["created_at"])
+        if acquired_at >= now - grace:
+            continue
+        blob["ref_count"] = counts.get(blob["content_hash"], 0)
+        if (blob["ref_count"] <= 0 and _as_datetime(blob["created_at"]) < now - min_age
+                and acquired_at < now - max(min_age, grace)):
+            blob["released_at"] = now_iso()
+            released.append({"storage_path": blob["storage_path"], "thumbnail_path": blob["thumbnail_path"]})
+    return released
+
+
+def _dashboard_counts(db, p):
+    def count(table, **filters):
+        return sum(1 for r in db.table(table)
+                   if r.get("user_id") == p["p_user_id"] and all(r.get(k) == v for k, v in filters.items()))
+    return {
+        "courses": count("courses"),
+        "notes": count("notes"),
+        "open_tasks": count("tasks", completed=False),
+        "conversations": count("conversations"),
+    }
+
+
+def _append_message(db, p):
+    conversation = next((c for c in db.table("conversations") if str(c["id"]) == p["p_conversation_id"]), None)
+    if conversation is None:
+        return None
+    now = now_iso()
+    conversation.update(
+        message_count=conversation.get("message_count", 0) + 1,
+        token_total=conversation.get("token_total", 0) + p["p_tokens"],
+        last_message=p["p_preview"],
+        last_message_role=p["p_role"],
+        last_message_at=now,
+        updated_at=now,
+    )
+    db.insert("messages", {
+        "id": p["p_id"], "conversation_id": p["p_conversation_id"],
+        "role": p["p_role"], "content": p["p_content"], "created_at": now,
+    })
+    return {k: conversation[k] for k in (
+        "id", "updated_at", "last_message", "last_message_role", "last_message_at", "message_count", "token_total"
+    )}
+
+
+def _archive_conversation_messages(db, p):
+    conversation = next((c for c in db.table("conversations") if str(c["id"]) == p["p_conversation_id"]), None)
+    if conversation is None or conversation.get("archived_at"):
+        return False
+    messages = [m for m in db.table("messages") if m["conversation_id"] == p["p_conversation_id"]]
+    if len(messages) != p["p_message_count"]:
+        return False
+    db.tables["messages"] = [m for m in db.table("messages") if m["conversation_id"] != p["p_conversation_id"]]
+    conversation.update(archived_at=now_iso(), archive_path=p["p_path"],
+                        archive_bytes=p["p_bytes"], archive_raw_bytes=p["p_raw_bytes"])
+    return True
+
+
+def _restore_conversation_messages(db, p):
+    conversation = next((c for c in db.table("conversations") if str(c["id"]) == p["p_conversation_id"]), None)
+    if conversation is None or not conversation.get("archived_at"):
+        return False
+    conversation.update(archived_at=None, archive_path=None, archive_bytes=None, archive_raw_bytes=None,
+                        updated_at=now_iso())
+    hot = {m["id"] for m in db.table("messages")}
+    db.table("messages").extend(dict(m) for m in p["p_messages"] if m["id"] not in hot)
+    return True
+
+
+RPCS = {
+    "acquire_file_blob": _acquire_file_blob,
+    "release_file_blobs": _release_file_blobs,
+    "delete_released_file_blobs": _delete_released_file_blobs,
+    "bulk_update_tasks": _bulk_update_tasks,
+    "toggle_announcement_status": _toggle_announcement_status,
+    "try_acquire_lease": _try_acquire_lease,
+    "purge_expired_exams": _purge_expired_exams,
+    "reconcile_file_blob_refs": _reconcile_file_blob_refs,
+    "dashboard_counts": _dashboard_counts,
+    "append_message": _append_message,
+    "archive_conversation_messages": _archive_conversation_messages,
+    "restore_conversation_messages": _restore_conversation_messages,
+}
+
+
+def serve_in_thread(app, host="127.0.0.1", port=0):
+    """Start an ASGI app under uvicorn on a background thread; returns (base_url, server)"""
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    bound_port = server.servers[0].sockets[0].getsockname()[1]
+    return f"http://{host}:{bound_port}", server
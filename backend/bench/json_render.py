@@ -0,0 +1,120 @@
+# bench/json_render.py
+"""
+CPU cost of rendering a large note list: the same `List[NoteOut]` endpoint
+returning ~1 MB of TipTap documents is served by FastAPI's default route
+(response_model validation, jsonable_encoder, json.dumps) and by
+FastJSONRoute (one TypeAdapter validation, orjson), and CPU time per response is
+compared.
+
+Run from backend/:
+    python -m bench.json_render [--size-kb 1024] [--requests 50] [--rounds 5]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import List
+
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+from api.notes.Schemas import NoteOut
+from core.routing import FastJSONResponse, FastJSONRoute
+
+
+def note_rows(size_kb, seed=7):
+    """Note rows as Supabase returns them, totalling roughly `size_kb` of JSON"""
+    rng = random.Random(seed)
+    words = ["lecture", "exam", "matrix", "vector", "theorem", "proof", "signal", "network", "memory", "kernel"]
+    rows, size, n = [], 0, 0
+    while size < size_kb * 1024:
+        content = {
+            "type": "doc",
+            "content": [
+                {
+                    "type": "paragraph",
+                    "content": [
+                        {"type": "text", "text": " ".join(rng.choices(words, k=12))},
+                        {"type": "text", "marks": [{"type": "bold"}], "text": rng.choice(words)},
+                    ],
+                }
+                for _ in range(40)
+            ],
+        }
+        row = {
+            "id": f"note-{n}", "user_id": "user-1", "course_id": "course-1", "title": f"Note {n}",
+            "content": content, "created_at": "2026-10-19T09:00:00+00:00", "updated_at": "2026-10-19T09:00:00+00:00",
+        }
+        rows.append(row)
+        size += len(json.dumps(row))
+        n += 1
+    return rows
+
+
+def build_app(rows, fast):
+    router = APIRouter(route_class=FastJSONRoute if fast else APIRoute)
+
+    @router.get("/notes", response_model=List[NoteOut])
+    async def get_notes():
+        return rows
+
+    app = FastAPI(default_response_class=FastJSONResponse if fast else JSONResponse)
+    app.include_router(router)
+    return app
+
+
+async def drive(app, requests):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/notes", "raw_path": b"/notes", "query_string": b"",
+        "root_path": "", "headers": [], "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    body = bytearray()
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.extend(message.get("body", b""))
+
+    await app(dict(scope), receive, send)
+    response_bytes = len(body)
+    started = time.process_time()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.process_time() - started) / requests, response_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-kb", type=int, default=1024)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = note_rows(args.size_kb)
+    default_app, fast_app = build_app(rows, fast=False), build_app(rows, fast=True)
+
+    # Alternate the variants and keep each one's best round to cancel out scheduler noise
+    default = fast = float("inf")
+    for _ in range(args.rounds):
+        default_cpu, default_bytes = asyncio.run(drive(default_app, args.requests))
+        fast_cpu, fast_bytes = asyncio.run(drive(fast_app, args.requests))
+        default, fast = min(default, default_cpu), min(fast, fast_cpu)
+
+    print(json.dumps({
+        "notes": len(rows),
+        "requests": args.requests,
+        "default_response_bytes": default_bytes,
+        "fast_response_bytes": fast_bytes,
+        "default_cpu_ms": round(default * 1000, 2),
+        "fast_cpu_ms": round(fast * 1000, 2),
+        "speedup": round(default / fast, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# bench/llm_resilience.py
+"""
+Exercises core.llm against the fake Groq endpoint of bench.fake_supabase
+with injected errors and tail latency. The same workload runs twice, with a
+bare client (no retries, hedging or fallback) and with the configured
+resilience settings, reporting success rate, latency percentiles, the
+resilience events that fired and the calls each model received.
+
+Run from backend/:
+    python -m bench.llm_resilience [--requests 200] [--concurrency 10] [--latency-ms 200]
+                                   [--error-rate 0.1] [--slow-rate 0.05] [--slow-ms 3000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+# Settings are required at import time; nothing here talks to Supabase
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+for key in ("CLIENT_ID", "CLIENT_SECRET", "REDIRECT_URI"):
+    os.environ.setdefault(key, "bench")
+
+from prometheus_client import REGISTRY
+
+from bench.fake_supabase import FakeSupabase, serve_in_thread
+from core.config import settings
+from core.llm import PROVIDER, LLMClient, LLMError
+
+EVENTS = ("retry", "hedge", "fallback", "circuit_open", "degraded")
+BARE = {"LLM_MAX_RETRIES": 0, "LLM_HEDGING": False}
+
+
+def _events(models):
+    return {
+        event: sum(
+            REGISTRY.get_sample_value("llm_events_total", {"provider": PROVIDER, "model": m, "event": event}) or 0
+            for m in models
+        )
+        for event in EVENTS
+    }
+
+
+def _percentile(values, pct):
+    return round(values[min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))] * 1000, 1)
+
+
+async def run(client, args):
+    latencies, failures = [], 0
+    remaining = args.requests
+    messages = [{"role": "user", "content": "Explain the difference between TCP and UDP in detail. " * 4}]
+
+    async def worker():
+        nonlocal remaining, failures
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                await client.complete(messages)
+            except LLMError:
+                failures += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    await client.aclose()
+    latencies.sort()
+    return {
+        "success_rate": round(len(latencies) / args.requests, 3),
+        "p50_ms": _percentile(latencies, 50) if latencies else None,
+        "p95_ms": _percentile(latencies, 95) if latencies else None,
+        "p99_ms": _percentile(latencies, 99) if latencies else None,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else None,
+        "seconds": round(elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--primary-latency-ms", type=float, help="base latency of the primary model only")
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-ms", type=float, default=3000.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    primary, fallback = settings.LLM_PRIMARY_MODEL, settings.LLM_FALLBACK_MODEL
+    report = {"config": vars(args), "runs": {}}
+    for name, overrides in (("bare", BARE), ("resilient", {})):
+        model_latency = {primary: args.primary_latency_ms} if args.primary_latency_ms is not None else None
+        fake = FakeSupabase(llm_latency_ms=args.latency_ms, llm_error_rate=args.error_rate, seed=args.seed,
+                            llm_slow_rate=args.slow_rate, llm_slow_ms=args.slow_ms, llm_model_latency_ms=model_latency)
+        url, server = serve_in_thread(fake.app)
+
+        saved = {key: getattr(settings, key) for key in overrides}
+        for key, value in overrides.items():
+            setattr(settings, key, value)
+        client = LLMClient(url, "bench", primary, fallback if name == "resilient" else None)
+        before = _events((primary, fallback))
+        try:
+            result = asyncio.run(run(client, args))
+        finally:
+            for key, value in saved.items():
+                setattr(settings, key, value)
+            server.should_exit = True
+        after = _events((primary, fallback))
+        result["events"] = {event: int(after[event] - before[event]) for event in EVENTS}
+        result["provider_calls"] = fake.llm_calls
+        report["runs"][name] = result
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
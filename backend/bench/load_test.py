@@ -0,0 +1,322 @@
+# bench/load_test.py
+"""
+Load test of the real FastAPI app against bench.fake_supabase.
+The app is served by uvicorn, seeded with synthetic users, courses, notes,
+announcements and files, and driven by scripted scenarios at a fixed
+concurrency. Reports p50/p95/p99 latency and throughput per scenario as
+JSON; compare two runs with bench.compare.
+
+Run from backend/:
+    python -m bench.load_test [--scenario note_autosave ...] [--requests 300] [--concurrency 20]
+                              [--db-latency-ms 15] [--jitter-ms 5] [--llm-latency-ms 400]
+                              [--output bench-results.json]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from bench.fake_supabase import FakeSupabase, issue_token, serve_in_thread
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+def tiptap_document(paragraphs, rng):
+    """Note content shaped like the editor's output"""
+    words = ["lecture", "exam", "matrix", "vector", "theorem", "proof", "signal", "network", "memory", "kernel"]
+    return {
+        "type": "doc",
+        "content": [
+            {"type": "paragraph", "content": [{"type": "text", "text": " ".join(rng.choices(words, k=40))}]}
+            for _ in range(paragraphs)
+        ],
+    }
+
+
+def seed(fake, args):
+    """Populate the fake with `args.users` users, each owning courses, notes, tasks and announcements"""
+    rng = random.Random(args.seed)
+    users = []
+    lecture = ("Gradient descent minimises a loss by following its negative gradient. " * args.lecture_repeats).encode()
+    lecture_hash = hashlib.sha256(lecture).hexdigest()
+    lecture_path = f"blobs/sha256/{lecture_hash[:2]}/{lecture_hash}"
+    fake.put_object(lecture_path, lecture, "text/plain")
+    fake.insert("file_blobs", {
+        "content_hash": lecture_hash, "storage_path": lecture_path, "size": len(lecture),
+        "content_type": "text/plain", "ref_count": 0, "extracted_text": None, "thumbnail_path": None,
+        "uploaded": True,
+    })
+
+    for u in range(args.users):
+        user = fake.add_user(f"student{u}@bench.local")
+        fake.insert("profiles", {
+            "id": user["id"], "full_name": f"Student {u}", "image_url": None,
+            "specialization": "Computer Science",
+        })
+        courses = []
+        for c in range(args.courses_per_user):
+            course = fake.insert("courses", {
+                "user_id": user["id"], "title": f"Course {c}", "description": "Synthetic course",
+                "category": rng.choice(["Math", "Physics", "Computer Science"]),
+            })
+            courses.append(course)
+            file_name = f"lecture_{u}_{c}.txt"
+            fake.insert("files", {
+                "course_id": course["id"], "file_name": file_name, "file_path": lecture_path,
+                "file_type": "text/plain", "file_size": len(lecture), "content_hash": lecture_hash,
+            })
+            fake.table("file_blobs")[0]["ref_count"] += 1
+        notes = [
+            fake.insert("notes", {
+                "user_id": user["id"], "title": f"Note {n}", "course_id": rng.choice(courses)["id"],
+                "content": tiptap_document(args.note_paragraphs, rng),
+            })
+            for n in range(args.notes_per_user)
+        ]
+        tasks = [
+            fake.insert("tasks", {
+                "user_id": user["id"], "title": f"Task {t}", "description": None, "category": "General",
+                "due_date": (datetime.now(timezone.utc) + timedelta(days=t)).replace(microsecond=0).isoformat(),
+                "completed": t % 3 == 0,
+            })
+            for t in range(10)
+        ]
+        for a in range(args.announcements_per_user):
+            fake.insert("help_announcements", {
+                "user_id": user["id"], "title": f"Help with topic {a}", "description": "Looking for a study partner",
+                "contact_method": "email", "contact_value": user["email"], "status": "open",
+                "categorie": rng.choice(["Math", "Physics", "Computer Science"]),
+            })
+        users.append({
+            "user": user,
+            "token": issue_token(user, ttl=24 * 3600),
+            "courses": courses,
+            "notes": notes,
+            "tasks": tasks,
+            "files": [f"lecture_{u}_{c}.txt" for c in range(args.courses_per_user)],
+        })
+    return users
+
+
+def _check(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path}: "
+                           f"{response.status_code} {response.text[:200]}")
+    return response
+
+
+@scenario("login")
+async def login(client, ctx, rng):
+    user = rng.choice(ctx["users"])["user"]
+    _check(await client.post("/auth/login", json={"email": user["email"], "password": user["password"]}))
+
+
+@scenario("note_autosave")
+async def note_autosave(client, ctx, rng):
+    """Editor autosave: repeated PUTs of the full document for one note"""
+    owner = rng.choice(ctx["users"])
+    note = rng.choice(owner["notes"])
+    content = tiptap_document(ctx["args"].note_paragraphs, rng)
+    _check(await client.put(
+        f"/notes/edit_note/{note['id']}",
+        json={"title": note["title"], "content": content},
+        cookies={"access_token": owner["token"]},
+    ))
+
+
+@scenario("course_page")
+async def course_page(client, ctx, rng):
+    """Everything the course page fetches on open, requested concurrently like the frontend does"""
+    owner = rng.choice(ctx["users"])
+    course_id = rng.choice(owner["courses"])["id"]
+    cookies = {"access_token": owner["token"]}
+    responses = await asyncio.gather(
+        client.get(f"/courses/get_course/{course_id}", cookies=cookies),
+        client.get(f"/files/get_files/{course_id}", cookies=cookies),
+        client.get(f"/notes/get_notes_by_course/{course_id}", cookies=cookies),
+    )
+    for response in responses:
+        _check(response)
+
+
+@scenario("dashboard")
+async def dashboard(client, ctx, rng):
+    owner = rng.choice(ctx["users"])
+    _check(await client.get("/dashboard", cookies={"access_token": owner["token"]}))
+
+
+@scenario("announcements_feed")
+async def announcements_feed(client, ctx, rng):
+    owner = rng.choice(ctx["users"])
+    _check(await client.get("/announcements/announcements", cookies={"access_token": owner["token"]}))
+
+
+@scenario("tasks_bulk")
+async def tasks_bulk(client, ctx, rng):
+    """Toggle a batch of the user's tasks in one call, as "mark all done" does"""
+    owner = rng.choice(ctx["users"])
+    task_ids = [t["task_id"] for t in rng.sample(owner["tasks"], 5)]
+    _check(await client.put(
+        "/tasks/bulk_complete",
+        json={"task_ids": task_ids, "completed": rng.random() < 0.5},
+        cookies={"access_token": owner["token"]},
+    ))
+
+
+@scenario("file_explain")
+async def file_explain(client, ctx, rng):
+    owner = rng.choice(ctx["users"])
+    _check(await client.post(
+        "/ai/explain_file",
+        params={"file_name": rng.choice(owner["files"])},
+        cookies={"access_token": owner["token"]},
+    ))
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(name, base_url, ctx, args):
+    func = SCENARIOS[name]
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency * 4, max_keepalive_connections=args.concurrency * 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        for _ in range(min(args.warmup, args.requests)):
+            try:
+                await func(client, ctx, rng)
+            except Exception:
+                pass
+
+        latencies, errors = [], []
+        remaining = args.requests
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    await func(client, ctx, rng)
+                except Exception as e:
+                    errors.append(str(e))
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "operations": args.requests,
+        "errors": len(errors),
+        "sample_errors": sorted(set(errors))[:3],
+        "p50_ms": round(percentile(latencies, 50), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 2) if latencies else None,
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else None,
+        "max_ms": round(latencies[-1], 2) if latencies else None,
+        "throughput_ops": round(len(latencies) / elapsed, 1),
+        "seconds": round(elapsed, 2),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (repeatable; default: all)")
+    parser.add_argument("--requests", type=int, default=300, help="operations per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--db-latency-ms", type=float, default=15.0, help="latency added to every Supabase call")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=400.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-slow-rate", type=float, default=0.0, help="share of LLM calls hitting the slow tail")
+    parser.add_argument("--llm-slow-ms", type=float, default=5000.0)
+    parser.add_argument("--llm-context-tokens", type=int, default=0, help="reject larger prompts like the provider (0: off)")
+    parser.add_argument("--lecture-repeats", type=int, default=40, help="size of the explained lecture, in sentences")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--courses-per-user", type=int, default=3)
+    parser.add_argument("--notes-per-user", type=int, default=20)
+    parser.add_argument("--note-paragraphs", type=int, default=30)
+    parser.add_argument("--announcements-per-user", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report to this file as well as stdout")
+    args = parser.parse_args()
+
+    fake = FakeSupabase(args.db_latency_ms, args.jitter_ms, args.llm_latency_ms, args.llm_error_rate, args.seed,
+                        llm_slow_rate=args.llm_slow_rate, llm_slow_ms=args.llm_slow_ms,
+                        llm_context_tokens=args.llm_context_tokens)
+    fake_url, _ = serve_in_thread(fake.app)
+
+    # The app reads its settings and creates its clients at import time
+    os.environ.update({
+        "SUPABASE_URL": fake_url,
+        "SUPABASE_KEY": "bench.bench.bench",
+        "GROQ_API_KEY": "bench",
+        "GROQ_BASE_URL": fake_url,
+    })
+    for key in ("CLIENT_ID", "CLIENT_SECRET", "REDIRECT_URI"):
+        os.environ.setdefault(key, "bench")
+    # Housekeeping runs are not part of any scenario
+    os.environ.setdefault("MAINTENANCE_ENABLED", "false")
+    from main import app
+
+    app_url, _ = serve_in_thread(app)
+    ctx = {"users": seed(fake, args), "args": args}
+
+    results = {}
+    for name in args.scenario or sorted(SCENARIOS):
+        fake_calls, llm_rejected = fake.requests, fake.llm_rejected
+        results[name] = asyncio.run(run_scenario(name, app_url, ctx, args))
+        results[name]["fake_requests"] = fake.requests - fake_calls
+        results[name]["llm_rejected"] = fake.llm_rejected - llm_rejected
+        print(f"{name}: {results[name]}", file=sys.stderr)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "scenario")},
+        "scenarios": results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
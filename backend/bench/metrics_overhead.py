@@ -0,0 +1,127 @@
+# bench/metrics_overhead.py
+"""
+Measures what MetricsMiddleware and the Supabase call instrumentation add to
+a request. The same handler (three queries with simulated network latency)
+is served with and without instrumentation and the mean cost is compared.
+The default 2 ms per query is optimistic for a hosted Supabase project, so
+real-world overhead is lower than reported.
+
+Run from backend/:
+    python -m bench.metrics_overhead [--requests 1000] [--rounds 7] [--db-latency-ms 2] [--budget-pct 3]
+Exits non-zero when the overhead exceeds the budget.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+# Settings are required at import time; nothing here talks to Supabase
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+for key in ("CLIENT_ID", "CLIENT_SECRET", "REDIRECT_URI"):
+    os.environ.setdefault(key, "bench")
+
+from fastapi import FastAPI
+from core.database import InstrumentedClient
+from core.metrics import MetricsMiddleware
+
+
+class _Response:
+    data = [{"id": "1", "title": "note"}]
+
+
+class _FakeBuilder:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def eq(self, *args, **kwargs):
+        return self
+
+    def execute(self):
+        if self.latency:
+            time.sleep(self.latency)
+        return _Response()
+
+
+class _FakeClient:
+    auth = None
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def table(self, name):
+        return _FakeBuilder(self.latency)
+
+
+def build_app(client, instrumented):
+    app = FastAPI()
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: str):
+        for _ in range(3):
+            result = client.table("notes").select("*").eq("id", item_id).execute()
+        return result.data
+
+    return app
+
+
+async def drive(app, requests):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/items/42", "raw_path": b"/items/42", "query_string": b"",
+        "root_path": "", "headers": [], "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(50):
+        await app(dict(scope), receive, send)
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--db-latency-ms", type=float, default=2.0)
+    parser.add_argument("--budget-pct", type=float, default=3.0)
+    args = parser.parse_args()
+
+    latency = args.db_latency_ms / 1000
+    baseline_app = build_app(_FakeClient(latency), instrumented=False)
+    instrumented_app = build_app(InstrumentedClient(_FakeClient(latency)), instrumented=True)
+
+    # Alternate the variants and keep each one's best round to cancel out scheduler noise
+    baseline = instrumented = float("inf")
+    for _ in range(args.rounds):
+        baseline = min(baseline, asyncio.run(drive(baseline_app, args.requests)))
+        instrumented = min(instrumented, asyncio.run(drive(instrumented_app, args.requests)))
+    overhead = max(instrumented - baseline, 0.0)
+    report = {
+        "requests": args.requests,
+        "rounds": args.rounds,
+        "baseline_us": round(baseline * 1e6, 1),
+        "instrumented_us": round(instrumented * 1e6, 1),
+        "overhead_us": round(overhead * 1e6, 1),
+        "overhead_pct": round(overhead / baseline * 100, 2),
+        "budget_pct": args.budget_pct,
+    }
+    print(json.dumps(report, indent=2))
+    raise SystemExit(0 if report["overhead_pct"] <= args.budget_pct else 1)
+
+
+if __name__ == "__main__":
+    main()
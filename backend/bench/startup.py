@@ -0,0 +1,100 @@
+# bench/startup.py
+"""
+Startup-time guard: imports `main` in fresh interpreters under
+`python -X importtime`, reports the median import time and the slowest
+top-level imports, and fails when the budget is exceeded or a library that
+must load lazily (document parsers, PDF generation, groq) is imported at
+startup.
+
+Run from backend/:
+    python -m bench.startup [--runs 5] [--budget-ms 2000] [--top 15]
+Most of `import main` is fastapi and the supabase client (about 70% of a
+1.0-1.5 s median on development machines); the default budget leaves room
+for slower hosts while still catching a parser or SDK imported eagerly.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Only needed by specific endpoints; importing them at startup slows every worker boot
+LAZY_MODULES = ("fitz", "pymupdf", "pptx", "docx", "groq", "reportlab", "fpdf", "tiktoken")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+PROBE = "import json, sys, main; print(json.dumps(sorted(sys.modules)))"
+
+
+def _environment():
+    env = dict(os.environ)
+    # Settings are required at import time; nothing here talks to Supabase
+    env.setdefault("SUPABASE_URL", "http://localhost")
+    env.setdefault("SUPABASE_KEY", "bench.bench.bench")
+    env.setdefault("GROQ_API_KEY", "bench")
+    for key in ("CLIENT_ID", "CLIENT_SECRET", "REDIRECT_URI"):
+        env.setdefault(key, "bench")
+    return env
+
+
+def measure(env):
+    """One cold import of main: (main_us, {direct child of main: cumulative_us}, loaded modules)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    children = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, depth, module = int(match.group(2)), len(match.group(3)) // 2, match.group(4)
+        # Children are reported before their parent, so collect depth-1 entries until `main` closes them
+        if depth == 1:
+            children[module] = cumulative
+        elif depth == 0:
+            if module == "main":
+                return cumulative, children, json.loads(result.stdout.splitlines()[-1])
+            children = {}
+    raise RuntimeError("`import main` missing from -X importtime output")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=2000.0)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    env = _environment()
+    totals, breakdowns, loaded = [], [], set()
+    for _ in range(args.runs):
+        total, top_level, modules = measure(env)
+        totals.append(total)
+        breakdowns.append(top_level)
+        loaded.update(modules)
+
+    modules = {name for breakdown in breakdowns for name in breakdown}
+    median_by_module = {
+        name: statistics.median(b.get(name, 0) for b in breakdowns) for name in modules
+    }
+    slowest = sorted(median_by_module.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    eager = sorted(m for m in LAZY_MODULES if m in loaded)
+    median_ms = statistics.median(totals) / 1000
+
+    report = {
+        "runs": args.runs,
+        "median_import_main_ms": round(median_ms, 1),
+        "min_import_main_ms": round(min(totals) / 1000, 1),
+        "budget_ms": args.budget_ms,
+        "slowest_imports_ms": {name: round(us / 1000, 1) for name, us in slowest},
+        "eagerly_loaded_lazy_modules": eager,
+    }
+    print(json.dumps(report, indent=2))
+    raise SystemExit(0 if median_ms <= args.budget_ms and not eager else 1)
+
+
+if __name__ == "__main__":
+    main()
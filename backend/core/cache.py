@@ -0,0 +1,63 @@
+# core/cache.py
+import asyncio
+import time
+from collections import OrderedDict
+from core.metrics import record_cache_lookup
+
+
+class TTLCache:
+    """
+    Per-process cache whose entries expire `ttl` seconds after they are
+    stored, evicting the least recently used entry beyond `max_entries`.
+    Lookups are counted in cache_requests_total under `name`.
+    """
+
+    def __init__(self, name, ttl, max_entries=10_000):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._loading = {}
+
+    def get(self, key):
+        """The cached value, or None when absent or expired"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            del self._entries[key]
+            entry = None
+        record_cache_lookup(self.name, entry is not None)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    async def get_or_load(self, key, loader, cacheable=lambda value: True):
+        """
+        The cached value, or the result of `await loader()`, stored when
+        `cacheable(value)`. Concurrent misses on one key share one load.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        pending = self._loading.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        pending = self._loading[key] = asyncio.ensure_future(loader())
+        try:
+            value = await asyncio.shield(pending)
+        finally:
+            if self._loading.get(key) is pending:
+                del self._loading[key]
+        if cacheable(value):
+            self.set(key, value)
+        return value
@@ -0,0 +1,206 @@
+# core/compression.py
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+# brotli and zstandard are optional; gzip is always available
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Server preference when the client accepts several encodings equally
+ENCODINGS = tuple(
+    name for name, available in (("zstd", zstandard), ("br", brotli), ("gzip", True)) if available
+)
+COMPRESSIBLE_TYPES = {"application/json", "application/javascript", "application/xml", "image/svg+xml"}
+
+# Levels for per-request compression: fast, still well below the cost of the bytes saved
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+
+def negotiate(accept_encoding, available=ENCODINGS):
+    """Pick the encoding to use for an Accept-Encoding header value, or None"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            weights[name] = q
+    best, best_q = None, 0.0
+    for name in available:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compress(encoding, data, level=None):
+    """One-shot compression of a complete body"""
+    if encoding == "gzip":
+        z = zlib.compressobj(GZIP_LEVEL if level is None else level, zlib.DEFLATED, 31)
+        return z.compress(data) + z.flush()
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY if level is None else level)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL if level is None else level).compress(data)
+    raise ValueError(f"unsupported encoding {encoding}")
+
+
+class _StreamCompressor:
+    """Incremental compressor; `flush=True` makes everything written so far decodable"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._z = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._z = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._z = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data, flush=False):
+        if self.encoding == "gzip":
+            out = self._z.compress(data)
+            return out + self._z.flush(zlib.Z_SYNC_FLUSH) if flush else out
+        if self.encoding == "br":
+            out = self._z.process(data)
+            return out + self._z.flush() if flush else out
+        out = self._z.compress(data)
+        return out + self._z.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK) if flush else out
+
+    def finish(self):
+        if self.encoding == "br":
+            return self._z.finish()
+        return self._z.flush()
+
+
+def _is_compressible(status, headers):
+    if status < 200 or status in (204, 304) or "content-encoding" in headers:
+        return False
+    if "no-transform" in headers.get("cache-control", ""):
+        return False
+    media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return media_type.startswith("text/") or media_type.endswith("+json") or media_type in COMPRESSIBLE_TYPES
+
+
+def _add_vary(headers):
+    vary = headers.get("vary")
+    if not vary:
+        headers["vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["vary"] = f"{vary}, Accept-Encoding"
+
+
+class CompressionMiddleware:
+    """
+    Compresses text and JSON responses with the best encoding the client
+    accepts (zstd, br, gzip). Complete bodies under `minimum_size` bytes are
+    sent as is. Streamed responses are compressed incrementally, and
+    Server-Sent Events are flushed after every chunk so events are not held
+    back. Responses that already carry Content-Encoding (see
+    PrecompressedPayload) pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size=1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+        compressor = None
+        flush_each_chunk = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough, compressor, flush_each_chunk
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                if start is not None:
+                    await send(start)
+                    start = None
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                if not _is_compressible(start["status"], headers) or (not more_body and len(body) < self.minimum_size):
+                    passthrough = True
+                elif not more_body:
+                    body = compress(encoding, body)
+                    headers["content-encoding"] = encoding
+                    headers["content-length"] = str(len(body))
+                    _add_vary(headers)
+                    message = {**message, "body": body}
+                else:
+                    compressor = _StreamCompressor(encoding)
+                    flush_each_chunk = headers.get("content-type", "").startswith("text/event-stream")
+                    if "content-length" in headers:
+                        del headers["content-length"]
+                    headers["content-encoding"] = encoding
+                    _add_vary(headers)
+                    message = {**message, "body": compressor.compress(body, flush=flush_each_chunk)}
+                await send(start)
+                start = None
+                await send(message)
+                return
+
+            if passthrough or compressor is None:
+                await send(message)
+                return
+            chunk = compressor.compress(body, flush=flush_each_chunk)
+            if not more_body:
+                chunk += compressor.finish()
+            await send({**message, "body": chunk})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class PrecompressedPayload:
+    """
+    A static response body compressed once, at the highest levels, in every
+    available encoding. `response(request)` serves the variant the client
+    accepts, so repeated requests cost no compression at all.
+    """
+
+    LEVELS = {"gzip": 9, "br": 11, "zstd": 19}
+
+    def __init__(self, content, media_type="application/json"):
+        self.content = content
+        self.media_type = media_type
+        self.variants = {encoding: compress(encoding, content, self.LEVELS[encoding]) for encoding in ENCODINGS}
+
+    def response(self, request, status_code=200):
+        encoding = negotiate(request.headers.get("accept-encoding", ""), tuple(self.variants))
+        headers = {"vary": "Accept-Encoding"}
+        if encoding is None:
+            return Response(self.content, status_code=status_code, media_type=self.media_type, headers=headers)
+        headers["content-encoding"] = encoding
+        return Response(self.variants[encoding], status_code=status_code, media_type=self.media_type, headers=headers)
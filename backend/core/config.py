@@ -12,6 +12,74 @@ class Settings(BaseSettings):
     SITE_URL: str = "http://localhost:3000"
     BACKEND_URL: str = "http://localhost:8000"  # Add this line
     REDIRECT_URI: str
+    # Requests above either threshold are logged with their Supabase spans
+    TRACE_SLOW_ROUND_TRIPS: int = 10
+    TRACE_SLOW_MS: float = 1000
+    # Complete responses smaller than this are sent uncompressed
+    COMPRESSION_MIN_BYTES: int = 1024
+    # Groq (OpenAI-compatible API); see core/llm.py
+    GROQ_API_KEY: Optional[str] = None
+    GROQ_BASE_URL: str = "https://api.groq.com"
+    LLM_PRIMARY_MODEL: str = "llama-3.3-70b-versatile"
+    LLM_FALLBACK_MODEL: str = "llama-3.1-8b-instant"
+    LLM_TIMEOUT: float = 30
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_MAX_RETRIES: int = 2
+    LLM_BACKOFF_BASE: float = 0.5
+    LLM_BACKOFF_MAX: float = 8
+    LLM_CIRCUIT_FAILURES: int = 5
+    LLM_CIRCUIT_RESET_SECONDS: float = 30
+    # Hedge after this many ms; unset uses the model's recent p95
+    LLM_HEDGING: bool = True
+    LLM_HEDGE_AFTER_MS: Optional[float] = None
+    # Switch to the fallback model while the primary's p95 is above this
+    LLM_FALLBACK_P95_MS: float = 8000
+    LLM_LATENCY_WINDOW_SECONDS: float = 300
+    # Turns this short go to the fallback model
+    LLM_SMALL_PROMPT_CHARS: int = 40
+    # Prompt budgeting before a call: local tokenizer, context window, input and completion caps
+    LLM_TOKENIZER_ENCODING: str = "cl100k_base"
+    LLM_CONTEXT_TOKENS: int = 131072
+    LLM_MAX_INPUT_TOKENS: int = 8000
+    LLM_MAX_OUTPUT_TOKENS: int = 1024
+    # Per-user LLM budgets and the global concurrency cap in front of Groq
+    LLM_REQUESTS_PER_MINUTE: int = 20
+    LLM_TOKENS_PER_MINUTE: int = 60000
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_QUEUE_TIMEOUT: float = 20
+    # Bearer token Prometheus sends to scrape /metrics; /metrics answers 404 while it is unset
+    METRICS_TOKEN: Optional[str] = None
+    # Shares rate-limit state and change events between workers when set
+    REDIS_URL: Optional[str] = None
+    # Change events (core/events.py): per-client backlog before a resync, events kept for reconnects
+    EVENTS_QUEUE_SIZE: int = 100
+    EVENTS_REPLAY_SIZE: int = 500
+    EVENTS_KEEPALIVE_SECONDS: float = 15
+    # The shared open-announcements snapshot is reloaded from the database at least this often.
+    # Unset: 300 s with REDIS_URL (every worker sees every write), 10 s without (only its own)
+    ANNOUNCEMENT_FEED_MAX_AGE_SECONDS: Optional[float] = None
+    # /dashboard: per-user response cache, per-section time limit and slice sizes
+    DASHBOARD_CACHE_SECONDS: float = 10
+    DASHBOARD_SECTION_TIMEOUT: float = 3
+    DASHBOARD_ITEMS: int = 5
+    DASHBOARD_TASK_HORIZON_DAYS: int = 7
+    # In-process maintenance scheduler (jobs/scheduler.py). Off by default: enable it on one designated
+    # instance, or run `python -m jobs.scheduler --serve` there, rather than in every web worker
+    MAINTENANCE_ENABLED: bool = False
+    MAINTENANCE_TICK_SECONDS: float = 60
+    EXAM_PURGE_INTERVAL_SECONDS: float = 3600
+    EXAM_PURGE_BATCH_SIZE: int = 1000
+    # Exams stay listed for the rest of their day; purge them this long after exam_date
+    EXAM_RETENTION_HOURS: float = 24
+    BLOB_RECONCILE_INTERVAL_SECONDS: float = 86400
+    ORPHAN_GC_INTERVAL_SECONDS: float = 86400
+    # /files/download_course: files fetched ahead of the one being sent, and 256 KiB chunks buffered per file
+    ZIP_READ_AHEAD_FILES: int = 4
+    ZIP_READ_AHEAD_CHUNKS: int = 8
+    # Conversations idle this long move to compressed archives in Storage (jobs/chat_archive.py)
+    CHAT_ARCHIVE_AFTER_DAYS: float = 30
+    CHAT_ARCHIVE_INTERVAL_SECONDS: float = 86400
+    CHAT_ARCHIVE_BATCH_SIZE: int = 200
     class Config:
         env_file = ".env"
         extra = "ignore"
@@ -1,5 +1,6 @@
 from supabase import create_client
 import os
+from time import perf_counter
 from core.config import settings  # Import settings from the configuration file
 
 class SupabaseClient:
@@ -8,9 +9,157 @@ class SupabaseClient:
             settings.SUPABASE_URL,
             settings.SUPABASE_KEY
         )
-    
+
     def get_client(self):
         return self.client
 
+
+# --- Round-trip instrumentation ---
+# Every PostgREST, Storage and Auth call made through `supabase` is reported to
+# the registered listeners as a dict:
+#   service    "postgrest" | "storage" | "auth"
+#   operation  select/insert/update/upsert/delete/rpc, or the Storage/Auth method
+#   target     table, RPC function or bucket name ("auth" for Auth calls)
+#   filters    tuple of (filter_method, args) applied to a PostgREST query
+#   duration   seconds spent in the call
+#   error      the exception raised, or None
+#   result     the call's return value (None on error)
+
+_call_listeners = []
+
+QUERY_OPERATIONS = {"select", "insert", "update", "upsert", "delete"}
+QUERY_FILTERS = {
+    "eq", "neq", "gt", "gte", "lt", "lte", "like", "ilike", "is_", "in_",
+    "contains", "contained_by", "text_search", "match", "filter", "or_", "not_",
+    "order", "limit", "range", "single", "maybe_single",
+}
+# Methods that never leave the process
+LOCAL_METHODS = {"get_public_url"}
+
+
+def add_call_listener(listener):
+    """Register `listener(call)` to be invoked after every Supabase round trip"""
+    _call_listeners.append(listener)
+
+
+def _report(service, operation, target, filters, started, error, result):
+    record = {
+        "service": service,
+        "operation": operation,
+        "target": target,
+        "filters": filters,
+        "duration": perf_counter() - started,
+        "error": error,
+        "result": result,
+    }
+    for listener in _call_listeners:
+        listener(record)
+
+
+def _timed(func, service, operation, target):
+    def call(*args, **kwargs):
+        started = perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            _report(service, operation, target, (), started, e, None)
+            raise
+        _report(service, operation, target, (), started, None, result)
+        return result
+    return call
+
+
+class _QueryProxy:
+    """Wraps a PostgREST request builder and reports its `execute()`"""
+    __slots__ = ("_builder", "_target", "_operation", "_filters")
+
+    def __init__(self, builder, target, operation=None, filters=()):
+        self._builder = builder
+        self._target = target
+        self._operation = operation
+        self._filters = filters
+
+    def execute(self, *args, **kwargs):
+        operation = self._operation or "select"
+        started = perf_counter()
+        try:
+            result = self._builder.execute(*args, **kwargs)
+        except Exception as e:
+            _report("postgrest", operation, self._target, self._filters, started, e, None)
+            raise
+        _report("postgrest", operation, self._target, self._filters, started, None, result)
+        return result
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            # Property-style modifiers such as `not_` return the builder itself
+            if hasattr(attr, "execute"):
+                return _QueryProxy(attr, self._target, self._operation, self._filters)
+            return attr
+
+        def chain(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if not hasattr(result, "execute"):
+                return result
+            operation = self._operation or (name if name in QUERY_OPERATIONS else None)
+            filters = self._filters + ((name, args),) if name in QUERY_FILTERS else self._filters
+            return _QueryProxy(result, self._target, operation, filters)
+        return chain
+
+
+class _TimedProxy:
+    """Reports every public method call on a Storage bucket or the Auth client"""
+    __slots__ = ("_wrapped", "_service", "_target")
+
+    def __init__(self, wrapped, service, target):
+        self._wrapped = wrapped
+        self._service = service
+        self._target = target
+
+    def __getattr__(self, name):
+        attr = getattr(self._wrapped, name)
+        if name.startswith("_") or name in LOCAL_METHODS or not callable(attr):
+            return attr
+        return _timed(attr, self._service, name, self._target)
+
+
+class _StorageProxy:
+    __slots__ = ("_storage",)
+
+    def __init__(self, storage):
+        self._storage = storage
+
+    def from_(self, bucket):
+        return _TimedProxy(self._storage.from_(bucket), "storage", bucket)
+
+    def __getattr__(self, name):
+        return getattr(self._storage, name)
+
+
+class InstrumentedClient:
+    """Drop-in wrapper around the Supabase client that reports every round trip"""
+
+    def __init__(self, client):
+        self._client = client
+        self.auth = _TimedProxy(client.auth, "auth", "auth")
+
+    @property
+    def storage(self):
+        # The client rebuilds its Storage client on auth events, so never cache it
+        return _StorageProxy(self._client.storage)
+
+    def table(self, table_name):
+        return _QueryProxy(self._client.table(table_name), table_name)
+
+    from_ = table
+
+    def rpc(self, fn, params=None, *args, **kwargs):
+        return _QueryProxy(self._client.rpc(fn, params or {}, *args, **kwargs), fn, "rpc")
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
 # Singleton instance
-supabase = SupabaseClient().get_client()
+supabase = InstrumentedClient(SupabaseClient().get_client())
@@ -0,0 +1,111 @@
+# core/etag.py
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Response
+from core.database import supabase
+from core.utils import run_query
+
+# Bump when response shapes change so clients do not keep stale bodies across deploys
+REPRESENTATION_VERSION = "1"
+# Clients may store responses but must revalidate them before reuse
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts):
+    """Weak ETag: the compression middleware changes bytes, not meaning"""
+    digest = hashlib.sha1(":".join(str(p) for p in (REPRESENTATION_VERSION, *parts)).encode()).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def _parse_timestamp(value):
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        stamp = value
+    else:
+        try:
+            stamp = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    return stamp if stamp.tzinfo else stamp.replace(tzinfo=timezone.utc)
+
+
+def _etag_matches(header, etag):
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def not_modified(request, etag, last_modified=None):
+    """A 304 response when the request's validators still match, else None"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        matched = _etag_matches(if_none_match, etag)
+    else:
+        modified = _parse_timestamp(last_modified)
+        since = request.headers.get("if-modified-since")
+        if not (modified and since):
+            return None
+        try:
+            matched = modified.replace(microsecond=0) <= parsedate_to_datetime(since)
+        except (TypeError, ValueError):
+            return None
+    if not matched:
+        return None
+    response = Response(status_code=304)
+    set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    modified = _parse_timestamp(last_modified)
+    if modified:
+        response.headers["Last-Modified"] = format_datetime(modified.astimezone(timezone.utc), usegmt=True)
+
+
+def row_etag(table, key, updated_at):
+    return make_etag(table, key, updated_at)
+
+
+async def row_not_modified(request, table, key, owner_id=None, key_column="id"):
+    """
+    Answer a conditional GET for one row from its `updated_at` alone, so the
+    full row (e.g. a TipTap document) is not fetched when the client's copy
+    is current. Returns a 304 response or None.
+    """
+    if "if-none-match" not in request.headers and "if-modified-since" not in request.headers:
+        return None
+
+    def probe():
+        query = supabase.table(table).select("updated_at").eq(key_column, key)
+        if owner_id is not None:
+            query = query.eq("user_id", owner_id)
+        return query.execute()
+
+    result = await run_query(probe)
+    if not result.data:
+        return None
+    updated_at = result.data[0].get("updated_at")
+    return not_modified(request, row_etag(table, key, updated_at), updated_at)
+
+
+async def collection_version(user_id, collection, *parts):
+    """
+    (etag, last_modified) of a user's collection, from the counter bumped by
+    triggers on every write; `parts` (e.g. the query string) tell apart
+    differently filtered views of it.
+    """
+    result = await run_query(
+        lambda: supabase.table("collection_versions")
+        .select("version, updated_at")
+        .eq("user_id", user_id)
+        .eq("collection", collection)
+        .execute()
+    )
+    row = result.data[0] if result.data else {"version": 0, "updated_at": None}
+    return make_etag(collection, user_id, row["version"], *parts), row["updated_at"]
@@ -0,0 +1,228 @@
+# core/events.py
+"""
+Change events pushed to connected clients.
+
+`publish(channel, event)` fans an event out to every subscriber of the
+channel in this worker. With REDIS_URL set, events travel through Redis
+pub/sub instead, so subscribers on every worker see every write; each
+worker relays the Redis channel to its own subscribers.
+
+Events carry a sortable id and the last EVENTS_REPLAY_SIZE of each channel
+are kept, so a client that reconnects with the last id it saw gets what it
+missed. A subscriber that falls EVENTS_QUEUE_SIZE events behind, or asks
+for an id that is no longer kept, receives a single `resync` event and
+should reload instead.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import time
+from collections import deque
+from core.config import settings
+from core.metrics import EVENTS_DROPPED, EVENTS_PUBLISHED, EVENT_SUBSCRIBERS
+
+logger = logging.getLogger("emsi.events")
+
+REDIS_PREFIX = "events:"
+
+
+class Subscription:
+    """
+    A queue of one client's events. Iterate with `async for`; `timeout`
+    makes `next()` return None when nothing arrived, for keepalives.
+    """
+
+    def __init__(self, bus, channel, maxsize, accept):
+        self.bus = bus
+        self.channel = channel
+        self.accept = accept
+        self._queue = asyncio.Queue(maxsize)
+        self._resync = False
+
+    def _offer(self, event):
+        if self._resync or (event["type"] != "resync" and not self.accept(event)):
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop the backlog and tell the client to reload
+            self._resync = True
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(resync_event())
+            EVENTS_DROPPED.labels(self.channel).inc()
+
+    async def next(self, timeout=None):
+        try:
+            event = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if event["type"] == "resync":
+            self._resync = False
+        return event
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.next()
+
+    def close(self):
+        self.bus._unsubscribe(self)
+
+
+def resync_event():
+    return {"id": None, "type": "resync"}
+
+
+class EventBus:
+    def __init__(self, queue_size, replay_size):
+        self.queue_size = queue_size
+        self.replay_size = replay_size
+        self._subscribers = {}
+        self._listeners = {}
+        self._recent = {}
+        self._seq = itertools.count()
+
+    def _next_id(self):
+        # Milliseconds then a per-worker sequence: ordered within a worker, unique enough across them
+        return f"{int(time.time() * 1000)}-{next(self._seq)}"
+
+    def subscribe(self, channel, last_event_id=None, accept=lambda event: True):
+        """
+        Subscribe to `channel`, receiving only events for which `accept(event)`
+        is true. With `last_event_id`, events published after it are queued
+        first, or a resync when it is too old to replay.
+        """
+        subscription = Subscription(self, channel, self.queue_size, accept)
+        if last_event_id:
+            recent = self._recent.get(channel, ())
+            ids = [event["id"] for event in recent]
+            if last_event_id in ids:
+                for event in list(recent)[ids.index(last_event_id) + 1:]:
+                    subscription._offer(event)
+            else:
+                subscription._offer(resync_event())
+        self._subscribers.setdefault(channel, set()).add(subscription)
+        EVENT_SUBSCRIBERS.labels(channel).inc()
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        subscribers = self._subscribers.get(subscription.channel)
+        if subscribers and subscription in subscribers:
+            subscribers.discard(subscription)
+            EVENT_SUBSCRIBERS.labels(subscription.channel).dec()
+
+    def add_listener(self, channel, callback):
+        """
+        Call `callback(event)` for every event delivered on `channel` in this
+        worker, including `resync` when events may have been lost. For
+        in-process state kept in step with writes; it must not block.
+        """
+        self._listeners.setdefault(channel, []).append(callback)
+
+    def _notify(self, channel, event):
+        for callback in self._listeners.get(channel, ()):
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("Event listener failed on %s", channel)
+
+    def subscriber_count(self, channel):
+        return len(self._subscribers.get(channel, ()))
+
+    def deliver(self, channel, event):
+        """Queue `event` for this worker's subscribers of `channel`"""
+        recent = self._recent.get(channel)
+        if recent is None:
+            recent = self._recent[channel] = deque(maxlen=self.replay_size)
+        recent.append(event)
+        self._notify(channel, event)
+        for subscription in list(self._subscribers.get(channel, ())):
+            subscription._offer(event)
+
+    async def publish(self, channel, event):
+        event = {"id": self._next_id(), **event}
+        EVENTS_PUBLISHED.labels(channel).inc()
+        self.deliver(channel, event)
+        return event
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class RedisEventBus(EventBus):
+    """
+    EventBus whose events go through Redis pub/sub, so every worker's
+    subscribers see them. Each worker delivers from its relay only, so its
+    own events arrive in the same order as everyone else's.
+    """
+
+    def __init__(self, url, queue_size, replay_size):
+        super().__init__(queue_size, replay_size)
+        import redis.asyncio as redis
+        self._redis = redis.from_url(url)
+        self._task = None
+
+    async def publish(self, channel, event):
+        event = {"id": self._next_id(), **event}
+        EVENTS_PUBLISHED.labels(channel).inc()
+        try:
+            await self._redis.publish(REDIS_PREFIX + channel, json.dumps(event, default=str))
+        except Exception:
+            # Better to reach this worker's clients than nobody
+            logger.warning("Could not publish %s event to Redis", channel, exc_info=True)
+            self.deliver(channel, event)
+        return event
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._relay())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._redis.aclose()
+
+    async def _relay(self):
+        while True:
+            try:
+                async with self._redis.pubsub() as pubsub:
+                    await pubsub.psubscribe(REDIS_PREFIX + "*")
+                    async for message in pubsub.listen():
+                        if message["type"] != "pmessage":
+                            continue
+                        channel = message["channel"].decode()[len(REDIS_PREFIX):]
+                        self.deliver(channel, json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Events published while disconnected are lost; tell clients to reload
+                logger.warning("Event relay lost its Redis connection; reconnecting", exc_info=True)
+                for channel in set(self._subscribers) | set(self._listeners):
+                    self._recent.pop(channel, None)
+                    self._notify(channel, resync_event())
+                    for subscription in list(self._subscribers.get(channel, ())):
+                        subscription._offer(resync_event())
+                await asyncio.sleep(1)
+
+
+def _build_event_bus():
+    if settings.REDIS_URL:
+        try:
+            return RedisEventBus(settings.REDIS_URL, settings.EVENTS_QUEUE_SIZE, settings.EVENTS_REPLAY_SIZE)
+        except ImportError as e:
+            raise RuntimeError("REDIS_URL is set but the `redis` package is not installed") from e
+    return EventBus(settings.EVENTS_QUEUE_SIZE, settings.EVENTS_REPLAY_SIZE)
+
+
+events = _build_event_bus()
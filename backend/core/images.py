@@ -0,0 +1,102 @@
+# core/images.py
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from PIL import Image, ImageOps, UnidentifiedImageError
+from core.database import supabase
+from core.storage import BUCKET
+from core.utils import run_query
+
+# Longest side in pixels for each variant (None keeps the original dimensions)
+NOTE_IMAGE_VARIANTS = {"thumbnail": 320, "display": 1600, "original": None}
+AVATAR_VARIANTS = {"thumbnail": 128, "display": 512, "original": None}
+
+WEBP_QUALITY = {"thumbnail": 70, "display": 80, "original": 90}
+
+# Refuse images that would decode to more than ~50 megapixels
+Image.MAX_IMAGE_PIXELS = 50_000_000
+
+# Pillow releases the GIL while decoding, resampling and encoding, so threads run in parallel
+_executor = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="images")
+
+
+class ImageProcessingError(ValueError):
+    pass
+
+
+def _decode(content: bytes) -> Image.Image:
+    try:
+        with Image.open(BytesIO(content)) as image:
+            # Apply the EXIF orientation now, because EXIF is not carried into the variants
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ImageProcessingError(f"Unsupported or corrupt image: {e}")
+
+    if image.mode not in ("RGB", "RGBA"):
+        has_alpha = "A" in image.getbands() or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+    return image
+
+
+def _encode(image: Image.Image, name: str, max_side) -> dict:
+    variant = image.copy()
+    if max_side:
+        variant.thumbnail((max_side, max_side), Image.LANCZOS)
+    buffer = BytesIO()
+    # No exif/icc arguments: the re-encoded file carries no metadata
+    variant.save(buffer, "WEBP", quality=WEBP_QUALITY.get(name, 80), method=4)
+    return {"content": buffer.getvalue(), "width": variant.width, "height": variant.height}
+
+
+async def process_image(content: bytes, variants=NOTE_IMAGE_VARIANTS) -> dict:
+    """
+    Decode an uploaded image and render every variant as WebP in the worker pool
+    Returns:
+        {variant_name: {"content": bytes, "width": int, "height": int}}
+    Raises:
+        ImageProcessingError: If the bytes are not a decodable image
+    """
+    loop = asyncio.get_running_loop()
+    image = await loop.run_in_executor(_executor, _decode, content)
+    rendered = await asyncio.gather(*(
+        loop.run_in_executor(_executor, _encode, image, name, max_side)
+        for name, max_side in variants.items()
+    ))
+    return dict(zip(variants, rendered))
+
+
+async def store_image_variants(base_path: str, content: bytes, variants=NOTE_IMAGE_VARIANTS) -> dict:
+    """
+    Process an image and upload every variant under `base_path/<variant>.webp`
+    Returns:
+        Variant metadata suitable for a jsonb column:
+        {variant_name: {"path", "url", "width", "height", "bytes"}}
+    """
+    rendered = await process_image(content, variants)
+    bucket = supabase.storage.from_(BUCKET)
+
+    paths = {name: f"{base_path}/{name}.webp" for name in rendered}
+    await asyncio.gather(*(
+        run_query(lambda name=name: bucket.upload(
+            paths[name], rendered[name]["content"], {"content-type": "image/webp"}
+        ))
+        for name in rendered
+    ))
+
+    return {
+        name: {
+            "path": paths[name],
+            "url": bucket.get_public_url(paths[name]),
+            "width": variant["width"],
+            "height": variant["height"],
+            "bytes": len(variant["content"]),
+        }
+        for name, variant in rendered.items()
+    }
+
+
+def variant_paths(variants) -> list:
+    """All Storage paths recorded in a variants jsonb value"""
+    return [v["path"] for v in (variants or {}).values() if isinstance(v, dict) and v.get("path")]
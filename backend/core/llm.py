@@ -0,0 +1,287 @@
+# core/llm.py
+import asyncio
+import random
+import time
+from collections import deque
+import httpx
+from core.config import settings
+from core.metrics import LLM_EVENTS, observe_llm_call
+
+PROVIDER = "groq"
+# Status codes worth retrying: rate limited or a transient provider failure
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# p95 needs this many recent samples before it drives hedging or fallback
+MIN_LATENCY_SAMPLES = 20
+
+
+class LLMError(Exception):
+    """The provider rejected the request; retrying will not help"""
+
+
+class LLMUnavailable(LLMError):
+    """Every attempt on every eligible model failed, or their circuits are open"""
+
+
+class _RetryableError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Completion:
+    __slots__ = ("content", "model", "usage", "seconds")
+
+    def __init__(self, content, model, usage, seconds):
+        self.content = content
+        self.model = model
+        self.usage = usage
+        self.seconds = seconds
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds; then lets one trial call through (half-open),
+    closing again on success. The caller that got the trial must call
+    `end_trial()` however its call ends, so a trial that is cancelled or
+    rejected outright does not keep the circuit open for good.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_in_flight:
+            return False
+        self._trial_in_flight = True
+        return True
+
+    @property
+    def half_open(self):
+        return self.opened_at is not None
+
+    def end_trial(self):
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class LatencyWindow:
+    """Successful call latencies from the last `window` seconds"""
+
+    def __init__(self, window):
+        self.window = window
+        self._samples = deque()
+
+    def add(self, seconds):
+        self._samples.append((time.monotonic(), seconds))
+
+    def p95(self):
+        """p95 in seconds, or None without enough recent samples"""
+        cutoff = time.monotonic() - self.window
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        if len(self._samples) < MIN_LATENCY_SAMPLES:
+            return None
+        values = sorted(s for _, s in self._samples)
+        return values[int(len(values) * 0.95) - 1]
+
+
+class LLMClient:
+    """
+    Chat completions over Groq's OpenAI-compatible API with a pooled async
+    transport. Each model call is retried with jittered exponential backoff
+    behind a per-model circuit breaker, and hedged with a second request
+    once it runs longer than the model's recent p95. Calls move to the
+    fallback model when the primary's circuit is open, its p95 exceeds
+    LLM_FALLBACK_P95_MS, or it keeps failing; trivially short turns go to
+    the fallback model directly.
+    """
+
+    def __init__(self, base_url, api_key, primary_model, fallback_model):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.primary_model = primary_model
+        self.fallback_model = fallback_model
+        self._client = None
+        self._breakers = {}
+        self._latencies = {}
+
+    def _http(self):
+        # Created on first use so it binds to the serving event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=httpx.Timeout(settings.LLM_TIMEOUT, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+                ),
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def breaker(self, model):
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(
+                settings.LLM_CIRCUIT_FAILURES, settings.LLM_CIRCUIT_RESET_SECONDS
+            )
+        return breaker
+
+    def latencies(self, model):
+        window = self._latencies.get(model)
+        if window is None:
+            window = self._latencies[model] = LatencyWindow(settings.LLM_LATENCY_WINDOW_SECONDS)
+        return window
+
+    def models_for(self, messages):
+        """Models to try, in order"""
+        primary, fallback = self.primary_model, self.fallback_model
+        if not fallback or fallback == primary:
+            return [primary]
+        if sum(len(m.get("content") or "") for m in messages) <= settings.LLM_SMALL_PROMPT_CHARS:
+            return [fallback, primary]
+        p95 = self.latencies(primary).p95()
+        if p95 is not None and p95 * 1000 > settings.LLM_FALLBACK_P95_MS:
+            LLM_EVENTS.labels(PROVIDER, primary, "degraded").inc()
+            return [fallback, primary]
+        return [primary, fallback]
+
+    async def complete(self, messages, **options):
+        """Chat completion for OpenAI-style `messages`; raises LLMError or LLMUnavailable"""
+        last_error = None
+        for index, model in enumerate(self.models_for(messages)):
+            if index:
+                LLM_EVENTS.labels(PROVIDER, model, "fallback").inc()
+            try:
+                return await self._call_model(model, {"model": model, "messages": messages, **options})
+            except LLMUnavailable as e:
+                last_error = e
+        raise last_error
+
+    async def _call_model(self, model, body):
+        breaker = self.breaker(model)
+        last_error = None
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            if not breaker.allow():
+                LLM_EVENTS.labels(PROVIDER, model, "circuit_open").inc()
+                raise LLMUnavailable(f"{model}: circuit open") from last_error
+            # Allowed while open means this call is the half-open trial
+            trial = breaker.half_open
+            try:
+                completion = await self._hedged(model, body)
+            except _RetryableError as e:
+                breaker.record_failure()
+                last_error = e
+            else:
+                breaker.record_success()
+                return completion
+            finally:
+                # Also on LLMError and cancellation, which record no outcome
+                if trial:
+                    breaker.end_trial()
+            if attempt == settings.LLM_MAX_RETRIES:
+                break
+            LLM_EVENTS.labels(PROVIDER, model, "retry").inc()
+            await asyncio.sleep(self._backoff(attempt, last_error.retry_after))
+        raise LLMUnavailable(f"{model}: {last_error}") from last_error
+
+    @staticmethod
+    def _backoff(attempt, retry_after=None):
+        """Full-jitter exponential backoff, stretched to honour Retry-After"""
+        delay = random.uniform(0, min(settings.LLM_BACKOFF_MAX, settings.LLM_BACKOFF_BASE * 2 ** attempt))
+        if retry_after:
+            delay = max(delay, min(retry_after, settings.LLM_BACKOFF_MAX))
+        return delay
+
+    def _hedge_after(self, model):
+        if not settings.LLM_HEDGING:
+            return None
+        if settings.LLM_HEDGE_AFTER_MS:
+            return settings.LLM_HEDGE_AFTER_MS / 1000
+        return self.latencies(model).p95()
+
+    async def _hedged(self, model, body):
+        """One attempt, plus a duplicate request if the first is slower than the hedge delay"""
+        first = asyncio.create_task(self._request(model, body))
+        tasks = {first}
+        try:
+            delay = self._hedge_after(model)
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                LLM_EVENTS.labels(PROVIDER, model, "hedge").inc()
+                tasks.add(asyncio.create_task(self._request(model, body)))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                    # A request the provider rejects outright fails the same way twice
+                    if not isinstance(error, _RetryableError):
+                        raise error
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _request(self, model, body):
+        started = time.perf_counter()
+        try:
+            response = await self._http().post("/openai/v1/chat/completions", json=body)
+        except asyncio.CancelledError:
+            observe_llm_call(PROVIDER, model, time.perf_counter() - started, outcome="cancelled")
+            raise
+        except httpx.TimeoutException as e:
+            observe_llm_call(PROVIDER, model, time.perf_counter() - started, outcome="timeout")
+            raise _RetryableError(f"timeout: {e!r}") from e
+        except httpx.TransportError as e:
+            observe_llm_call(PROVIDER, model, time.perf_counter() - started, outcome="error")
+            raise _RetryableError(f"transport error: {e!r}") from e
+
+        seconds = time.perf_counter() - started
+        if response.status_code != 200:
+            observe_llm_call(PROVIDER, model, seconds, outcome="error")
+            message = f"{model} returned {response.status_code}: {response.text[:200]}"
+            if response.status_code in RETRYABLE_STATUS:
+                retry_after = response.headers.get("retry-after")
+                try:
+                    retry_after = float(retry_after) if retry_after else None
+                except ValueError:
+                    retry_after = None
+                raise _RetryableError(message, retry_after)
+            raise LLMError(message)
+
+        data = response.json()
+        usage = data.get("usage") or {}
+        observe_llm_call(PROVIDER, model, seconds, usage)
+        self.latencies(model).add(seconds)
+        return Completion(data["choices"][0]["message"]["content"], data.get("model", model), usage, seconds)
+
+
+llm = LLMClient(
+    settings.GROQ_BASE_URL,
+    settings.GROQ_API_KEY,
+    settings.LLM_PRIMARY_MODEL,
+    settings.LLM_FALLBACK_MODEL,
+)
@@ -0,0 +1,198 @@
+# core/metrics.py
+import hmac
+import os
+from time import perf_counter
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+from fastapi import HTTPException, Response
+from core.config import settings
+from core.database import add_call_listener
+
+# Buckets tuned for API latencies: 5ms .. 30s
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+    multiprocess_mode="livesum",
+)
+SUPABASE_CALL_DURATION = Histogram(
+    "supabase_call_duration_seconds",
+    "Latency of Supabase PostgREST, Storage and Auth calls",
+    ["service", "operation", "target", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_REQUEST_DURATION = Histogram(
+    "llm_request_duration_seconds",
+    "Latency of LLM provider calls",
+    ["provider", "model", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens reported by the LLM provider",
+    ["provider", "model", "kind"],
+)
+LLM_EVENTS = Counter(
+    "llm_events_total",
+    "LLM client resilience events: retry, hedge, fallback, circuit_open, degraded",
+    ["provider", "model", "event"],
+)
+LLM_RATE_LIMITED = Counter(
+    "llm_rate_limited_total",
+    "LLM requests rejected with 429, by exhausted budget (requests, tokens, capacity)",
+    ["reason"],
+)
+LLM_QUEUE_DEPTH = Gauge(
+    "llm_queue_depth",
+    "LLM requests waiting for a concurrency slot",
+    multiprocess_mode="livesum",
+)
+MAINTENANCE_RUNS = Counter(
+    "maintenance_runs_total",
+    "Maintenance job runs by outcome (ok, error, skipped when another worker holds the lease)",
+    ["job", "outcome"],
+)
+MAINTENANCE_DURATION = Histogram(
+    "maintenance_run_duration_seconds",
+    "Duration of maintenance job runs",
+    ["job"],
+    buckets=(0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600),
+)
+MAINTENANCE_ROWS = Counter(
+    "maintenance_rows_total",
+    "Rows or objects removed or repaired by maintenance jobs",
+    ["job"],
+)
+MAINTENANCE_LAST_SUCCESS = Gauge(
+    "maintenance_last_success_timestamp_seconds",
+    "Unix time of the last successful run of each maintenance job",
+    ["job"],
+    multiprocess_mode="max",
+)
+EVENT_SUBSCRIBERS = Gauge(
+    "event_subscribers",
+    "Clients subscribed to change events, by channel",
+    ["channel"],
+    multiprocess_mode="livesum",
+)
+EVENTS_PUBLISHED = Counter(
+    "events_published_total",
+    "Change events published, by channel",
+    ["channel"],
+)
+EVENTS_DROPPED = Counter(
+    "events_dropped_total",
+    "Subscribers that fell behind and were told to resync, by channel",
+    ["channel"],
+)
+CHAT_ARCHIVE_BYTES = Counter(
+    "chat_archive_bytes_total",
+    "Chat history moved to the cold tier: raw JSON bytes and compressed archive bytes",
+    ["kind"],
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by cache layer and result (hit ratio = hit / total)",
+    ["cache", "result"],
+)
+
+
+def _observe_supabase_call(call):
+    SUPABASE_CALL_DURATION.labels(
+        call["service"],
+        call["operation"],
+        call["target"],
+        "error" if call["error"] else "ok",
+    ).observe(call["duration"])
+
+
+add_call_listener(_observe_supabase_call)
+
+
+def observe_llm_call(provider, model, seconds, usage=None, outcome="ok"):
+    """Record one LLM completion and, when known, its prompt/completion token usage"""
+    LLM_REQUEST_DURATION.labels(provider, model, outcome).observe(seconds)
+    if usage:
+        LLM_TOKENS.labels(provider, model, "prompt").inc(usage.get("prompt_tokens") or 0)
+        LLM_TOKENS.labels(provider, model, "completion").inc(usage.get("completion_tokens") or 0)
+
+
+def observe_maintenance_run(job, seconds, rows=0, outcome="ok"):
+    MAINTENANCE_RUNS.labels(job, outcome).inc()
+    if outcome == "skipped":
+        return
+    MAINTENANCE_DURATION.labels(job).observe(seconds)
+    if outcome == "ok":
+        MAINTENANCE_ROWS.labels(job).inc(rows)
+        MAINTENANCE_LAST_SUCCESS.labels(job).set_to_current_time()
+
+
+def record_cache_lookup(cache, hit):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware timing every HTTP request.
+    Routes are labelled by their path template (e.g. /notes/get_note/{note_id})
+    so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status),
+            ).observe(perf_counter() - started)
+
+
+def check_metrics_token(authorization):
+    """
+    Only a scraper presenting `Authorization: Bearer <METRICS_TOKEN>` may read
+    the metrics: route names, latencies and error counts are not public.
+    Raises 404 while no token is configured, 401 for a missing or wrong one.
+    """
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+
+
+def metrics_response():
+    """Prometheus exposition, aggregated across workers when PROMETHEUS_MULTIPROC_DIR is set"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
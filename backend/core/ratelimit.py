@@ -0,0 +1,241 @@
+# core/ratelimit.py
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+from core.config import settings
+from core.metrics import LLM_QUEUE_DEPTH, LLM_RATE_LIMITED
+
+
+class RateLimited(HTTPException):
+    """429 carrying the number of seconds after which a retry can succeed"""
+
+    def __init__(self, retry_after, detail):
+        retry_after = max(1, math.ceil(retry_after))
+        super().__init__(status_code=429, detail=detail, headers={"Retry-After": str(retry_after)})
+        self.retry_after = retry_after
+
+
+# --- Token buckets ---
+# consume(key, amount, capacity, rate) takes `amount` tokens from the bucket
+# `key` (holding at most `capacity`, refilled at `rate` tokens per second) and
+# returns 0, or the seconds to wait when the bucket is short. With
+# force=True the tokens are taken regardless, possibly leaving a debt;
+# a negative amount refunds.
+
+class InMemoryBuckets:
+    """Per-process buckets; each worker enforces the limits on its own"""
+
+    MAX_KEYS = 10_000
+
+    def __init__(self):
+        self._buckets = {}
+
+    async def consume(self, key, amount, capacity, rate, force=False):
+        now = time.monotonic()
+        tokens, stamp = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - stamp) * rate)
+        if force or tokens >= amount:
+            self._buckets[key] = (min(capacity, tokens - amount), now)
+            if len(self._buckets) > self.MAX_KEYS:
+                self._prune(now)
+            return 0.0
+        self._buckets[key] = (tokens, now)
+        return (amount - tokens) / rate
+
+    def _prune(self, now):
+        # Buckets idle long enough to be full again carry no state worth keeping
+        for key, (tokens, stamp) in list(self._buckets.items()):
+            if now - stamp > 60:
+                del self._buckets[key]
+
+
+_REDIS_CONSUME = """
+local now = redis.call("TIME")
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local amount, capacity, rate = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call("HMGET", KEYS[1], "tokens", "stamp")
+local tokens = tonumber(state[1]) or capacity
+local stamp = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - stamp) * rate)
+local wait = 0
+if ARGV[4] == "1" or tokens >= amount then
+    tokens = math.min(capacity, tokens - amount)
+else
+    wait = (amount - tokens) / rate
+end
+redis.call("HSET", KEYS[1], "tokens", tokens, "stamp", now)
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 60)
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    """Buckets shared by every worker through Redis, updated atomically by a Lua script"""
+
+    def __init__(self, url):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(_REDIS_CONSUME)
+
+    async def consume(self, key, amount, capacity, rate, force=False):
+        wait = await self._script(keys=[f"ratelimit:{key}"], args=[amount, capacity, rate, "1" if force else "0"])
+        return float(wait)
+
+
+# --- Fair bulkhead ---
+
+class FairBulkhead:
+    """
+    Caps concurrent calls. Waiters queue per user and slots are handed out
+    round-robin across users, so one user's burst cannot starve the others.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self._queues = {}
+        self._order = deque()
+        self._avg_hold = 1.0
+
+    @property
+    def waiting(self):
+        return sum(len(q) for q in self._queues.values())
+
+    def estimated_wait(self):
+        return self._avg_hold * (self.waiting / self.limit + 1)
+
+    async def acquire(self, key, timeout):
+        """Wait for a slot; raises asyncio.TimeoutError after `timeout` seconds in the queue"""
+        if self.active < self.limit and not self._order:
+            self.active += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+            self._order.append(key)
+        queue.append(waiter)
+        LLM_QUEUE_DEPTH.inc()
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up
+                self._release()
+            else:
+                self._discard(key, waiter)
+            raise
+        finally:
+            LLM_QUEUE_DEPTH.dec()
+
+    def _discard(self, key, waiter):
+        queue = self._queues.get(key)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del self._queues[key]
+            self._order.remove(key)
+
+    def release(self, held_for=None):
+        if held_for is not None:
+            self._avg_hold = 0.9 * self._avg_hold + 0.1 * held_for
+        self._release()
+
+    def _release(self):
+        while self._order:
+            key = self._order.popleft()
+            queue = self._queues[key]
+            waiter = queue.popleft()
+            if queue:
+                self._order.append(key)
+            else:
+                del self._queues[key]
+            if not waiter.done():
+                # The slot passes straight to the next user in turn
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+# --- LLM limiter ---
+
+class _Permit:
+    __slots__ = ("tokens",)
+
+    def __init__(self):
+        self.tokens = None
+
+    def settle(self, tokens):
+        """Record the tokens the provider actually billed"""
+        self.tokens = tokens
+
+
+class LLMLimiter:
+    """
+    Per-user request and token budgets (token buckets refilled per minute)
+    in front of a fair, global concurrency bulkhead. Token usage is reserved
+    from an estimate and settled with the provider's count afterwards.
+    """
+
+    def __init__(self, buckets, requests_per_minute, tokens_per_minute, max_concurrency, queue_timeout):
+        self.buckets = buckets
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.bulkhead = FairBulkhead(max_concurrency)
+        self.queue_timeout = queue_timeout
+
+    @asynccontextmanager
+    async def acquire(self, user_id, estimated_tokens):
+        rpm, tpm = self.requests_per_minute, self.tokens_per_minute
+        # A request larger than the whole budget must still be admissible once the bucket is full
+        reserved = min(estimated_tokens, tpm)
+
+        wait = await self.buckets.consume(f"llm:req:{user_id}", 1, rpm, rpm / 60)
+        if wait:
+            LLM_RATE_LIMITED.labels("requests").inc()
+            raise RateLimited(wait, "Too many AI requests, please retry later")
+        wait = await self.buckets.consume(f"llm:tok:{user_id}", reserved, tpm, tpm / 60)
+        if wait:
+            await self.buckets.consume(f"llm:req:{user_id}", -1, rpm, rpm / 60, force=True)
+            LLM_RATE_LIMITED.labels("tokens").inc()
+            raise RateLimited(wait, "AI token budget exhausted, please retry later")
+
+        try:
+            await self.bulkhead.acquire(user_id, self.queue_timeout)
+        except asyncio.TimeoutError:
+            await self.buckets.consume(f"llm:tok:{user_id}", -reserved, tpm, tpm / 60, force=True)
+            LLM_RATE_LIMITED.labels("capacity").inc()
+            raise RateLimited(self.bulkhead.estimated_wait(), "AI service is busy, please retry later")
+
+        permit = _Permit()
+        started = time.monotonic()
+        try:
+            yield permit
+        finally:
+            self.bulkhead.release(time.monotonic() - started)
+            if permit.tokens is not None and permit.tokens != reserved:
+                await self.buckets.consume(f"llm:tok:{user_id}", permit.tokens - reserved, tpm, tpm / 60, force=True)
+
+
+def _build_llm_limiter():
+    if settings.REDIS_URL:
+        try:
+            buckets = RedisBuckets(settings.REDIS_URL)
+        except ImportError as e:
+            raise RuntimeError("REDIS_URL is set but the `redis` package is not installed") from e
+    else:
+        buckets = InMemoryBuckets()
+    return LLMLimiter(
+        buckets,
+        settings.LLM_REQUESTS_PER_MINUTE,
+        settings.LLM_TOKENS_PER_MINUTE,
+        settings.LLM_MAX_CONCURRENCY,
+        settings.LLM_QUEUE_TIMEOUT,
+    )
+
+
+llm_limiter = _build_llm_limiter()
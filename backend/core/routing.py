@@ -0,0 +1,123 @@
+# core/routing.py
+import functools
+import inspect
+import orjson
+from fastapi import Response
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.dependencies.utils import get_typed_signature
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import ResponseValidationError
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+# Name of the Response parameter injected into endpoints that do not declare one
+_RESPONSE_PARAM = "_fast_json_response"
+
+
+def _default(obj):
+    """Fallback for values orjson does not serialize natively"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json", by_alias=True)
+    return jsonable_encoder(obj)
+
+
+class FastJSONResponse(ORJSONResponse):
+    """orjson rendering that still accepts pydantic models, Decimals, sets, ..."""
+
+    def render(self, content):
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def strict_response(endpoint):
+    """
+    Opt an endpoint out of FastJSONRoute's fast path: its return value is
+    validated and encoded by FastAPI as usual. Apply below the router decorator.
+    """
+    endpoint.__strict_response__ = True
+    return endpoint
+
+
+@functools.lru_cache(maxsize=None)
+def _type_adapter(response_model):
+    return TypeAdapter(response_model)
+
+
+def _validator(response_model):
+    """
+    Validate a result against `response_model` once and return the JSON-ready
+    Python value FastAPI would have emitted: fields by alias, defaults filled
+    in, nested models and types checked and coerced. Returns None when there
+    is no model to validate against.
+    """
+    if response_model is None:
+        return None
+    adapter = _type_adapter(response_model)
+
+    def validate(result):
+        try:
+            value = adapter.validate_python(result, from_attributes=True)
+        except ValidationError as e:
+            raise ResponseValidationError(errors=e.errors(include_url=False), body=result) from e
+        return adapter.dump_python(value, mode="json", by_alias=True)
+    return validate
+
+
+def _fast_endpoint(endpoint, response_model, status_code):
+    """Wrap `endpoint` so dict/list results are returned as FastJSONResponse"""
+    validate = _validator(response_model)
+    signature = get_typed_signature(endpoint)
+    params = list(signature.parameters.values())
+
+    # Reuse a declared Response parameter so its headers and cookies are kept
+    response_param = next(
+        (p.name for p in params if inspect.isclass(p.annotation) and issubclass(p.annotation, Response)),
+        None,
+    )
+    injected = response_param is None
+    if injected:
+        response_param = _RESPONSE_PARAM
+        extra = inspect.Parameter(_RESPONSE_PARAM, inspect.Parameter.KEYWORD_ONLY, annotation=Response)
+        position = next((i for i, p in enumerate(params) if p.kind is inspect.Parameter.VAR_KEYWORD), len(params))
+        params.insert(position, extra)
+
+    def render(result, sub_response):
+        if not isinstance(result, (dict, list)):
+            return result
+        response = FastJSONResponse(
+            validate(result) if validate else result,
+            status_code=sub_response.status_code or status_code or 200,
+        )
+        response.headers.raw.extend(sub_response.headers.raw)
+        return response
+
+    if inspect.iscoroutinefunction(endpoint):
+        async def wrapper(**kwargs):
+            sub_response = kwargs.pop(response_param) if injected else kwargs[response_param]
+            return render(await endpoint(**kwargs), sub_response)
+    else:
+        # Stays synchronous so FastAPI keeps running it in the threadpool
+        def wrapper(**kwargs):
+            sub_response = kwargs.pop(response_param) if injected else kwargs[response_param]
+            return render(endpoint(**kwargs), sub_response)
+
+    functools.update_wrapper(wrapper, endpoint)
+    wrapper.__signature__ = signature.replace(parameters=params)
+    return wrapper
+
+
+class FastJSONRoute(APIRoute):
+    """
+    APIRoute whose dict/list results are validated against `response_model`
+    once, with a TypeAdapter built per model, and rendered with orjson,
+    skipping FastAPI's serialize, `jsonable_encoder` and `json.dumps` passes.
+    Use @strict_response to keep FastAPI's own response handling.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        response_model = kwargs.get("response_model")
+        if isinstance(response_model, DefaultPlaceholder):
+            response_model = None
+        if not getattr(endpoint, "__strict_response__", False):
+            endpoint = _fast_endpoint(endpoint, response_model, kwargs.get("status_code"))
+        super().__init__(path, endpoint, **kwargs)
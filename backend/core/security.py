@@ -2,6 +2,7 @@
 from fastapi import Depends, HTTPException, status, Request
 from core.database import supabase
 from core.config import settings
+from core.utils import run_query
 
 async def get_current_user(request: Request):
     access_token = request.cookies.get("access_token")
@@ -23,4 +24,22 @@ async def get_profile_status(user_id: str):
         response = supabase.table("profiles").select("*").eq("id", user_id).execute()
         return bool(response.data)
     except Exception:
-        return False
\ No newline at end of file
+        return False
+
+async def get_authenticated_user(request: Request):
+    """
+    Lighter get_current_user for endpoints that load the profile themselves:
+    validates the session with one Auth call and skips the profile lookup.
+    """
+    return await authenticate_token(request.cookies.get("access_token"))
+
+async def authenticate_token(access_token):
+    """The user owning `access_token`, for callers without a Request (WebSockets)"""
+    if not access_token:
+        raise HTTPException(401, detail="Access token missing")
+
+    try:
+        user = await run_query(lambda: supabase.auth.get_user(access_token))
+        return {"id": user.user.id, "email": user.user.email}
+    except Exception as e:
+        raise HTTPException(401, detail=f"Authentication failed: {str(e)}")
@@ -0,0 +1,92 @@
+# core/storage.py
+import asyncio
+from urllib.parse import quote, urlparse
+import httpx
+from core.config import settings
+from core.database import supabase
+from core.utils import chunked, run_query
+
+BUCKET = "filesb"
+
+# Paths per Storage `remove` call; the API rejects very large prefix lists
+REMOVE_BATCH_SIZE = 100
+# Bytes per chunk when streaming an object
+STREAM_CHUNK_SIZE = 256 * 1024
+
+_http = None
+
+
+def _storage_http():
+    # The Supabase client only downloads whole objects into memory; streams and ranges go over httpx
+    global _http
+    if _http is None:
+        _http = httpx.AsyncClient(
+            base_url=f"{settings.SUPABASE_URL.rstrip('/')}/storage/v1",
+            headers={"apikey": settings.SUPABASE_KEY, "Authorization": f"Bearer {settings.SUPABASE_KEY}"},
+            timeout=httpx.Timeout(30, read=120),
+        )
+    return _http
+
+
+async def stream_object(path, offset=0, length=None):
+    """
+    Yield the bytes of the object at `path`, from `offset` for `length`
+    bytes (to the end when None), as they arrive from Storage.
+    """
+    headers = {}
+    if offset or length is not None:
+        headers["Range"] = f"bytes={offset}-{'' if length is None else offset + length - 1}"
+    async with _storage_http().stream("GET", f"/object/authenticated/{BUCKET}/{quote(path)}", headers=headers) as response:
+        if response.status_code not in (200, 206):
+            await response.aread()
+            raise Exception(f"Storage returned {response.status_code} for {path}: {response.text[:200]}")
+        # A server that ignored the Range header sends the whole object
+        skip = offset if response.status_code == 200 else 0
+        async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+            if skip:
+                dropped = min(skip, len(chunk))
+                chunk, skip = chunk[dropped:], skip - dropped
+            if chunk:
+                yield chunk
+
+
+async def close_storage_http():
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+
+async def remove_paths(paths):
+    """
+    Removes objects from the bucket with batched, concurrent `remove` calls
+    Args:
+        paths: Storage paths to delete (duplicates and empty values are ignored)
+    Returns:
+        The number of objects Storage reported as removed
+    """
+    unique_paths = [p for p in dict.fromkeys(paths) if p]
+    if not unique_paths:
+        return 0
+
+    results = await asyncio.gather(*(
+        run_query(lambda batch=batch: supabase.storage.from_(BUCKET).remove(batch))
+        for batch in chunked(unique_paths, REMOVE_BATCH_SIZE)
+    ))
+
+    removed = 0
+    for result in results:
+        if isinstance(result, dict) and result.get("error"):
+            raise Exception(result["error"])
+        removed += len(result) if isinstance(result, list) else 0
+    return removed
+
+
+def path_from_public_url(url):
+    """Extract the object path from a public/signed `filesb` URL, or None if it is not one"""
+    if not url:
+        return None
+    path_parts = urlparse(url).path.split(f"/{BUCKET}/")
+    if len(path_parts) < 2:
+        return None
+    return path_parts[1].lstrip("/") or None
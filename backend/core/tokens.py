@@ -0,0 +1,150 @@
+# core/tokens.py
+import logging
+import math
+import threading
+from core.config import settings
+
+logger = logging.getLogger("emsi.tokens")
+
+# OpenAI-style chat framing: tokens per message, plus the reply primer
+MESSAGE_OVERHEAD = 4
+REPLY_PRIMER = 3
+# Heuristic tokenizer: Llama 3's BPE averages ~4 characters per token on
+# English prose; 3.5 errs on the side of over-counting
+CHARS_PER_TOKEN = 3.5
+TRUNCATION_MARKER = "\n\n[... truncated to fit the model's context ...]\n\n"
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """
+    The tiktoken encoding named by LLM_TOKENIZER_ENCODING, loaded on first use,
+    or None when tiktoken is not installed or its BPE file cannot be fetched
+    (set TIKTOKEN_CACHE_DIR on hosts without internet access).
+    """
+    global _encoding, _encoding_loaded
+    if _encoding_loaded:
+        return _encoding
+    with _encoding_lock:
+        if not _encoding_loaded:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(settings.LLM_TOKENIZER_ENCODING)
+            except ImportError:
+                logger.info("tiktoken is not installed; estimating token counts from text length")
+            except Exception as e:
+                logger.warning("Could not load the %s encoding (%s); estimating token counts from text length",
+                               settings.LLM_TOKENIZER_ENCODING, e)
+            _encoding_loaded = True
+    return _encoding
+
+
+def count_text(text):
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def count_messages(messages):
+    """Prompt tokens of OpenAI-style `messages`, including the chat framing"""
+    return REPLY_PRIMER + sum(MESSAGE_OVERHEAD + count_text(m.get("content") or "") for m in messages)
+
+
+def truncate_text(text, max_tokens):
+    """
+    `text` cut to at most `max_tokens`, keeping its beginning and end (a
+    document's introduction and conclusion) around a marker.
+    """
+    if count_text(text) <= max_tokens:
+        return text
+    # Re-encoding across the cut can merge differently; leave a few tokens of slack
+    keep = max(0, max_tokens - count_text(TRUNCATION_MARKER) - 4)
+    head, tail = keep * 3 // 4, keep // 4
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return encoding.decode(tokens[:head]) + TRUNCATION_MARKER + (encoding.decode(tokens[-tail:]) if tail else "")
+    head_chars, tail_chars = int(head * CHARS_PER_TOKEN), int(tail * CHARS_PER_TOKEN)
+    return text[:head_chars] + TRUNCATION_MARKER + (text[-tail_chars:] if tail_chars else "")
+
+
+class PromptTooLarge(Exception):
+    def __init__(self, prompt_tokens, budget):
+        super().__init__(f"Prompt needs {prompt_tokens} tokens; the budget is {budget}")
+        self.prompt_tokens = prompt_tokens
+        self.budget = budget
+
+
+class PromptBudget:
+    """A prompt fitted to the input budget, with the counts behind it"""
+    __slots__ = ("messages", "prompt_tokens", "original_tokens", "max_output_tokens",
+                 "dropped_messages", "truncated")
+
+    def __init__(self, messages, prompt_tokens, original_tokens, max_output_tokens, dropped_messages, truncated):
+        self.messages = messages
+        self.prompt_tokens = prompt_tokens
+        self.original_tokens = original_tokens
+        self.max_output_tokens = max_output_tokens
+        self.dropped_messages = dropped_messages
+        self.truncated = truncated
+
+    @property
+    def reserved_tokens(self):
+        """Upper bound of what the call can be billed: the prompt plus the full completion"""
+        return self.prompt_tokens + self.max_output_tokens
+
+    def as_dict(self):
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "original_prompt_tokens": self.original_tokens,
+            "max_output_tokens": self.max_output_tokens,
+            "dropped_messages": self.dropped_messages,
+            "truncated": self.truncated,
+        }
+
+
+def input_budget():
+    """Prompt tokens allowed: the context window minus the completion, capped by LLM_MAX_INPUT_TOKENS"""
+    return min(settings.LLM_MAX_INPUT_TOKENS, settings.LLM_CONTEXT_TOKENS - settings.LLM_MAX_OUTPUT_TOKENS)
+
+
+def fit_messages(messages, budget=None):
+    """
+    Fit a chat to the input budget without calling the model. System
+    messages and the latest message are always kept; older turns are dropped
+    oldest first, and if the latest message alone is still too large its
+    content is truncated. Raises PromptTooLarge when even that cannot fit.
+    """
+    budget = input_budget() if budget is None else budget
+    counts = [MESSAGE_OVERHEAD + count_text(m.get("content") or "") for m in messages]
+    original = total = REPLY_PRIMER + sum(counts)
+    kept = list(range(len(messages)))
+    truncated = False
+
+    # Oldest non-system turns go first; the latest message is never dropped
+    droppable = [i for i in kept[:-1] if messages[i].get("role") != "system"]
+    for i in droppable:
+        if total <= budget:
+            break
+        kept.remove(i)
+        total -= counts[i]
+
+    fitted = [messages[i] for i in kept]
+    if total > budget and fitted:
+        last = fitted[-1]
+        room = budget - (total - counts[kept[-1]]) - MESSAGE_OVERHEAD
+        if room <= count_text(TRUNCATION_MARKER):
+            raise PromptTooLarge(total, budget)
+        content = truncate_text(last.get("content") or "", room)
+        fitted[-1] = {**last, "content": content}
+        total = total - counts[kept[-1]] + MESSAGE_OVERHEAD + count_text(content)
+        truncated = True
+
+    return PromptBudget(fitted, total, original, settings.LLM_MAX_OUTPUT_TOKENS,
+                        len(messages) - len(kept), truncated)
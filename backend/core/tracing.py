@@ -0,0 +1,142 @@
+# core/tracing.py
+import json
+import logging
+from contextvars import ContextVar
+from time import perf_counter
+from core.config import settings
+from core.database import add_call_listener
+
+logger = logging.getLogger("emsi.slow_requests")
+
+# Trace of the request being served; asyncio.to_thread copies the context,
+# so calls made from worker threads land in the same trace
+_current_trace = ContextVar("request_trace", default=None)
+
+
+class RequestTrace:
+    """Supabase round trips made while serving one request"""
+    __slots__ = ("calls", "started")
+
+    def __init__(self):
+        self.calls = []
+        self.started = perf_counter()
+
+    def totals(self):
+        """{service: (calls, total_ms)}"""
+        totals = {}
+        for call in self.calls:
+            count, ms = totals.get(call["service"], (0, 0.0))
+            totals[call["service"]] = (count + 1, ms + call["duration"] * 1000)
+        return totals
+
+    def spans(self):
+        """Readable spans; payload sizes are only computed here, when a request is logged"""
+        return [
+            {
+                "service": call["service"],
+                "operation": call["operation"],
+                "target": call["target"],
+                "filters": [f"{name}{list(args)}" for name, args in call["filters"]],
+                "ms": round(call["duration"] * 1000, 2),
+                "bytes": _payload_bytes(call["result"]),
+                "error": repr(call["error"]) if call["error"] else None,
+            }
+            for call in self.calls
+        ]
+
+
+def _payload_bytes(result):
+    """Approximate response size of a Supabase call"""
+    if result is None:
+        return 0
+    if isinstance(result, (bytes, bytearray)):
+        return len(result)
+    data = getattr(result, "data", result)
+    try:
+        return len(json.dumps(data, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def _record_span(call):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.calls.append(call)
+
+
+add_call_listener(_record_span)
+
+
+def server_timing(trace, total_ms):
+    """Server-Timing header value: one entry per Supabase service plus the total"""
+    entries = [
+        f'{service};dur={ms:.1f};desc="{calls} calls"'
+        for service, (calls, ms) in trace.totals().items()
+    ]
+    entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+
+class TracingMiddleware:
+    """
+    Collects a span for every Supabase round trip made by a request, adds a
+    `Server-Timing` header and logs requests exceeding TRACE_SLOW_ROUND_TRIPS
+    round trips or TRACE_SLOW_MS milliseconds, with their spans.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        token = _current_trace.set(trace)
+        # Also reachable from handlers as request.state.trace
+        scope.setdefault("state", {})["trace"] = trace
+
+        event_stream = False
+
+        async def send_wrapper(message):
+            nonlocal event_stream
+            if message["type"] == "http.response.start":
+                total_ms = (perf_counter() - trace.started) * 1000
+                headers = list(message.get("headers", []))
+                event_stream = any(
+                    name.lower() == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in headers
+                )
+                headers.append((b"server-timing", server_timing(trace, total_ms).encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            # Event streams stay open by design; their duration is not latency
+            if not event_stream:
+                self._log_if_slow(scope, trace)
+
+    @staticmethod
+    def _log_if_slow(scope, trace):
+        total_ms = (perf_counter() - trace.started) * 1000
+        round_trips = len(trace.calls)
+        if round_trips <= settings.TRACE_SLOW_ROUND_TRIPS and total_ms <= settings.TRACE_SLOW_MS:
+            return
+        route = getattr(scope.get("route"), "path", scope["path"])
+        logger.warning(
+            "slow request %s %s: %.1f ms, %d round trips, %.1f ms in Supabase\n%s",
+            scope["method"],
+            route,
+            total_ms,
+            round_trips,
+            sum(call["duration"] for call in trace.calls) * 1000,
+            json.dumps(trace.spans(), indent=2, default=str),
+        )
@@ -1,4 +1,5 @@
 # core/utils.py
+import asyncio
 from fastapi import HTTPException, status
 from fastapi.responses import RedirectResponse
 from core.config import settings
@@ -64,4 +65,45 @@ async def handle_db_operation(operation, error_message="Database operation faile
         raise HTTPException(
             status_code=500,
             detail=f"{error_message}: {str(e)}"
-        )    
\ No newline at end of file
+        )    
+
+def chunked(items, size):
+    """Split a list into consecutive chunks of at most `size` items"""
+    items = list(items)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+# Keeps `in.(...)` filters well under PostgREST's URL length limits
+IN_FILTER_BATCH_SIZE = 200
+
+
+async def run_query(operation):
+    """
+    Runs a blocking Supabase call in a worker thread so several calls
+    can be awaited concurrently with asyncio.gather
+    Args:
+        operation: A lambda function containing the DB or Storage call
+    Returns:
+        Whatever the operation returns
+    """
+    return await asyncio.to_thread(operation)
+
+
+async def select_in(table, column, values, columns="*"):
+    """Select rows whose `column` is in `values`, batching the filter concurrently"""
+    batches = chunked(dict.fromkeys(values), IN_FILTER_BATCH_SIZE)
+    results = await asyncio.gather(*(
+        run_query(lambda batch=batch: supabase.table(table).select(columns).in_(column, batch).execute())
+        for batch in batches
+    ))
+    return [row for result in results for row in (result.data or [])]
+
+
+async def delete_in(table, column, values):
+    """Delete rows whose `column` is in `values` and return the number of rows removed"""
+    batches = chunked(dict.fromkeys(values), IN_FILTER_BATCH_SIZE)
+    results = await asyncio.gather(*(
+        run_query(lambda batch=batch: supabase.table(table).delete().in_(column, batch).execute())
+        for batch in batches
+    ))
+    return sum(len(result.data or []) for result in results)
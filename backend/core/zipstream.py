@@ -0,0 +1,204 @@
+# core/zipstream.py
+"""
+ZIP archives streamed from stored objects without building them in memory.
+
+Entries are stored uncompressed (course files are mostly PDFs, slides and
+images that do not shrink), and every CRC-32 and size is known up front,
+so the byte layout of the archive is fixed before the first byte is sent:
+the length can be announced, and any byte range can be served by writing
+the headers it covers and fetching only the slices of the objects it needs.
+Classic ZIP only: at most 65535 entries and 4 GiB in total.
+"""
+import asyncio
+import hashlib
+import struct
+from collections import deque
+from contextlib import aclosing
+from datetime import datetime
+
+ZIP_MAX_ENTRIES = 0xFFFF
+ZIP_MAX_SIZE = 0xFFFFFFFF
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_OF_CENTRAL_DIRECTORY = struct.Struct("<IHHHHIIH")
+_VERSION = 20
+_UTF8_NAMES = 0x0800
+_STORED = 0
+
+
+class ZipTooLarge(Exception):
+    """The archive would need ZIP64"""
+
+
+class ZipEntry:
+    """One file in the archive: its name, size, CRC-32 and modification time, plus `source` for the opener"""
+    __slots__ = ("name", "size", "crc32", "modified", "source")
+
+    def __init__(self, name, size, crc32, modified, source):
+        self.name = name
+        self.size = size
+        self.crc32 = crc32
+        self.modified = modified
+        self.source = source
+
+
+def _dos_timestamp(moment: datetime):
+    year = min(max(moment.year, 1980), 2107)
+    return (
+        (moment.hour << 11) | (moment.minute << 5) | (moment.second // 2),
+        ((year - 1980) << 9) | (moment.month << 5) | moment.day,
+    )
+
+
+def unique_names(names):
+    """`names` with duplicates renamed "name (2).ext", "name (3).ext", ..."""
+    seen, result = set(), []
+    for name in names:
+        candidate, counter = name, 1
+        while candidate in seen:
+            counter += 1
+            stem, dot, ext = name.rpartition(".")
+            candidate = f"{stem} ({counter}).{ext}" if dot and stem else f"{name} ({counter})"
+        seen.add(candidate)
+        result.append(candidate)
+    return result
+
+
+class ZipPlan:
+    """
+    The byte layout of a stored ZIP of `entries`: a list of segments, each
+    either literal header bytes or a slice of one entry's data.
+    """
+
+    def __init__(self, entries):
+        if len(entries) > ZIP_MAX_ENTRIES:
+            raise ZipTooLarge(f"{len(entries)} files; at most {ZIP_MAX_ENTRIES} fit in a ZIP")
+        self.entries = entries
+        self.segments = []
+        central = []
+        offset = 0
+        for entry in entries:
+            name = entry.name.encode("utf-8")
+            time, date = _dos_timestamp(entry.modified)
+            header = _LOCAL_HEADER.pack(
+                0x04034B50, _VERSION, _UTF8_NAMES, _STORED, time, date,
+                entry.crc32, entry.size, entry.size, len(name), 0,
+            ) + name
+            central.append(_CENTRAL_HEADER.pack(
+                0x02014B50, _VERSION, _VERSION, _UTF8_NAMES, _STORED, time, date,
+                entry.crc32, entry.size, entry.size, len(name), 0, 0, 0, 0, 0, offset,
+            ) + name)
+            self.segments.append((offset, header))
+            offset += len(header)
+            self.segments.append((offset, entry))
+            offset += entry.size
+            if offset > ZIP_MAX_SIZE:
+                raise ZipTooLarge("the archive would exceed 4 GiB")
+
+        directory = b"".join(central)
+        end = _END_OF_CENTRAL_DIRECTORY.pack(
+            0x06054B50, 0, 0, len(entries), len(entries), len(directory), offset, 0,
+        )
+        self.segments.append((offset, directory + end))
+        self.size = offset + len(directory) + len(end)
+        if self.size > ZIP_MAX_SIZE:
+            raise ZipTooLarge("the archive would exceed 4 GiB")
+
+    @property
+    def etag(self):
+        """Strong validator: the same entries always produce the same bytes"""
+        digest = hashlib.sha256()
+        for _, segment in self.segments:
+            digest.update(segment if isinstance(segment, bytes) else b"\0%d" % segment.size)
+        return f'"{digest.hexdigest()[:32]}"'
+
+    def _pieces(self, start, end):
+        """(segment, offset within it, length) for every segment overlapping [start, end]"""
+        for segment_start, segment in self.segments:
+            length = len(segment) if isinstance(segment, bytes) else segment.size
+            segment_end = segment_start + length - 1
+            if segment_end < start or segment_start > end or not length:
+                continue
+            first = max(start, segment_start) - segment_start
+            last = min(end, segment_end) - segment_start
+            yield segment, first, last - first + 1
+
+    async def stream(self, open_data, start=0, end=None, read_ahead_files=4, read_ahead_chunks=8):
+        """
+        Yield bytes `start`..`end` (inclusive) of the archive.
+        `open_data(entry, offset, length)` is an async iterator over that
+        slice of an entry's data. Up to `read_ahead_files` slices are fetched
+        concurrently, each buffering at most `read_ahead_chunks` chunks.
+        """
+        end = self.size - 1 if end is None else end
+        pieces = list(self._pieces(start, end))
+        fetches = deque()
+        current = None
+        upcoming = iter(
+            (segment, offset, length) for segment, offset, length in pieces if not isinstance(segment, bytes)
+        )
+
+        def start_fetches():
+            while len(fetches) < read_ahead_files:
+                piece = next(upcoming, None)
+                if piece is None:
+                    return
+                fetches.append(_Fetch(open_data, *piece, read_ahead_chunks))
+
+        try:
+            for segment, offset, length in pieces:
+                if isinstance(segment, bytes):
+                    yield segment[offset:offset + length]
+                    continue
+                start_fetches()
+                current = fetches.popleft()
+                async for chunk in current:
+                    yield chunk
+                start_fetches()
+        finally:
+            # A client that disconnects stops every fetch still running
+            for fetch in (current, *fetches):
+                if fetch is not None:
+                    fetch.cancel()
+
+
+class _Fetch:
+    """Reads one slice of an entry into a bounded queue in the background"""
+
+    def __init__(self, open_data, entry, offset, length, queue_size):
+        self.entry = entry
+        self.length = length
+        self._queue = asyncio.Queue(queue_size)
+        self._task = asyncio.create_task(self._run(open_data(entry, offset, length)))
+
+    async def _run(self, chunks):
+        try:
+            received = 0
+            async with aclosing(chunks):
+                async for chunk in chunks:
+                    chunk = chunk[:self.length - received]
+                    received += len(chunk)
+                    if chunk:
+                        await self._queue.put(chunk)
+                    if received >= self.length:
+                        break
+            if received < self.length:
+                raise IOError(f"{self.entry.name}: got {received} of {self.length} bytes")
+            await self._queue.put(None)
+        except Exception as e:
+            await self._queue.put(e)
+
+    def cancel(self):
+        self._task.cancel()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        item = await self._queue.get()
+        if item is None:
+            raise StopAsyncIteration
+        if isinstance(item, Exception):
+            raise item
+        return item
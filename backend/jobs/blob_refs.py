@@ -0,0 +1,54 @@
+# jobs/blob_refs.py
+"""
+Repairs `file_blobs.ref_count` drift and removes blobs nobody references.
+
+A request that crashes between the `files` write and the reference update
+leaves a count that is off by one. `reconcile_file_blob_refs` recounts the
+references from `files` in one statement and tombstones blobs that have been
+unreferenced for longer than `min_age`; their Storage objects are removed
+here before the rows are deleted, and tombstones left by releases that
+crashed before finishing are retried. Blobs acquired within `grace` are skipped, since the `files` row of
+an upload in flight is inserted after its reference is taken. Scheduled by jobs.scheduler; run by hand with:
+    python -m jobs.blob_refs [--min-age-hours 24]
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import timedelta
+from api.files.service import remove_released_blobs
+from core.database import supabase
+from core.utils import run_query
+
+DEFAULT_MIN_AGE = timedelta(hours=24)
+# Longer than any upload takes between acquiring a blob and inserting its `files` row
+DEFAULT_GRACE = timedelta(hours=1)
+
+
+async def reconcile_blob_refs(min_age=DEFAULT_MIN_AGE, grace=DEFAULT_GRACE):
+    started = time.perf_counter()
+    result = await run_query(lambda: supabase.rpc("reconcile_file_blob_refs", {
+        "p_min_age": f"{int(min_age.total_seconds())} seconds",
+        "p_grace": f"{int(grace.total_seconds())} seconds",
+    }).execute())
+    released = result.data or []
+    removed = await remove_released_blobs(released)
+    return {
+        "released_blobs": len(released),
+        "removed_objects": removed,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recount file blob references and drop unreferenced blobs")
+    parser.add_argument("--min-age-hours", type=float, default=DEFAULT_MIN_AGE.total_seconds() / 3600,
+                        help="only drop blobs created longer ago than this")
+    args = parser.parse_args()
+
+    report = asyncio.run(reconcile_blob_refs(timedelta(hours=args.min_age_hours)))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
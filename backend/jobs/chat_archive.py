@@ -0,0 +1,102 @@
+# jobs/chat_archive.py
+"""
+Moves idle conversations to the cold tier (api/AIChat/archive.py).
+
+Conversations not updated for CHAT_ARCHIVE_AFTER_DAYS are read oldest first
+in pages of CHAT_ARCHIVE_BATCH_SIZE from the partial index on hot rows.
+Each one's messages become one zstd object under `archives/` and leave the
+`messages` table, so the hot table only holds recent history. The report
+gives the bytes moved and the bytes saved by compression. Scheduled by
+jobs.scheduler; run by hand with:
+    python -m jobs.chat_archive [--idle-days 30] [--batch-size 200]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from core.config import settings
+from core.database import supabase
+from core.metrics import CHAT_ARCHIVE_BYTES
+from core.utils import run_query
+from api.AIChat.archive import ArchiveConflict, archive_conversation
+
+logger = logging.getLogger("emsi.maintenance")
+
+# Conversations archived at once; each is a read, an upload and an RPC
+MAX_CONCURRENCY = 4
+
+
+async def archive_idle_conversations(idle=None, batch_size=None):
+    """Archive every conversation idle for longer than `idle`; returns a report"""
+    idle = idle if idle is not None else timedelta(days=settings.CHAT_ARCHIVE_AFTER_DAYS)
+    batch_size = batch_size or settings.CHAT_ARCHIVE_BATCH_SIZE
+    before = (datetime.now(timezone.utc) - idle).isoformat()
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    report = {"before": before, "archived": 0, "messages": 0, "conflicts": 0, "failed": 0,
+              "raw_bytes": 0, "compressed_bytes": 0}
+
+    skipped = []
+
+    async def archive(conversation):
+        async with semaphore:
+            try:
+                raw, compressed, messages = await archive_conversation(conversation)
+            except ArchiveConflict:
+                report["conflicts"] += 1
+                skipped.append(conversation["id"])
+                return False
+            except Exception:
+                logger.warning("Could not archive conversation %s", conversation["id"], exc_info=True)
+                report["failed"] += 1
+                skipped.append(conversation["id"])
+                return False
+        report["archived"] += 1
+        report["messages"] += messages
+        report["raw_bytes"] += raw
+        report["compressed_bytes"] += compressed
+        return True
+
+    # Archived rows leave the candidate set, so each page starts over, minus the ones skipped
+    while True:
+        def page():
+            query = (
+                supabase.table("conversations")
+                .select("id, user_id")
+                .is_("archived_at", "null")
+                .lt("updated_at", before)
+                .gt("message_count", 0)
+            )
+            if skipped:
+                query = query.not_.in_("id", skipped)
+            return query.order("updated_at").limit(batch_size).execute()
+
+        rows = (await run_query(page)).data or []
+        archived = await asyncio.gather(*(archive(row) for row in rows))
+        # A page that archived nothing means Storage or the database is failing; try next run
+        if len(rows) < batch_size or not any(archived):
+            break
+
+    CHAT_ARCHIVE_BYTES.labels("raw").inc(report["raw_bytes"])
+    CHAT_ARCHIVE_BYTES.labels("compressed").inc(report["compressed_bytes"])
+    report["saved_bytes"] = report["raw_bytes"] - report["compressed_bytes"]
+    report["ratio"] = round(report["raw_bytes"] / report["compressed_bytes"], 2) if report["compressed_bytes"] else None
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive idle chat conversations to compressed Storage objects")
+    parser.add_argument("--idle-days", type=float, default=settings.CHAT_ARCHIVE_AFTER_DAYS,
+                        help="archive conversations not updated for this long")
+    parser.add_argument("--batch-size", type=int, default=settings.CHAT_ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    report = asyncio.run(archive_idle_conversations(timedelta(days=args.idle_days), args.batch_size))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# jobs/expired_exams.py
+"""
+Purges exams whose `exam_date` is past the retention window.
+
+Deletes go through the `purge_expired_exams` RPC in batches of a bounded
+size, each an indexed range delete on `exam_date`, so a large backlog never
+turns into one long-running statement. Scheduled by jobs.scheduler; run by
+hand with:
+    python -m jobs.expired_exams [--retention-hours 24] [--batch-size 1000]
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from core.config import settings
+from core.database import supabase
+from core.utils import run_query
+
+
+async def purge_expired_exams(retention=None, batch_size=None):
+    """Delete exams older than `retention`, batch by batch; returns a report"""
+    retention = retention if retention is not None else timedelta(hours=settings.EXAM_RETENTION_HOURS)
+    batch_size = batch_size or settings.EXAM_PURGE_BATCH_SIZE
+    before = (datetime.now(timezone.utc) - retention).isoformat()
+    started = time.perf_counter()
+
+    deleted = batches = 0
+    while True:
+        result = await run_query(
+            lambda: supabase.rpc("purge_expired_exams", {"p_before": before, "p_batch_size": batch_size}).execute()
+        )
+        count = result.data or 0
+        deleted += count
+        batches += 1
+        if count < batch_size:
+            break
+
+    return {
+        "before": before,
+        "deleted": deleted,
+        "batches": batches,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete exams whose date has passed")
+    parser.add_argument("--retention-hours", type=float, default=settings.EXAM_RETENTION_HOURS,
+                        help="keep exams for this long after exam_date")
+    parser.add_argument("--batch-size", type=int, default=settings.EXAM_PURGE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    report = asyncio.run(purge_expired_exams(timedelta(hours=args.retention_hours), args.batch_size))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+# jobs/orphan_gc.py
+"""
+Orphaned-blob garbage collector for the `filesb` bucket.
+
+Objects end up unreferenced when an upload succeeds but the metadata insert
+fails, or when older delete paths skipped some blobs. The job pages through
+the Storage listing of each managed prefix, diffs it in memory against the
+paths referenced by `files`, `file_blobs`, `notes_files`, `profiles` and
+archived `conversations`, and removes the orphans in bulk. Tables are read
+with keyset pagination, so rows written during the scan cannot shift pages,
+and every candidate is checked against the tables once more just before it
+is removed.
+
+Run nightly with:
+    python -m jobs.orphan_gc            # delete orphans
+    python -m jobs.orphan_gc --dry-run  # only report them
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from core.database import supabase
+from core.images import variant_paths
+from core.storage import BUCKET, path_from_public_url, remove_paths
+from core.utils import run_query, select_in
+
+MANAGED_PREFIXES = ("archives", "blobs", "courses", "notes", "profiles")
+
+LIST_PAGE_SIZE = 1000
+TABLE_PAGE_SIZE = 1000
+# Concurrent Storage list / table page requests
+MAX_CONCURRENCY = 8
+# Objects younger than this may belong to an upload whose metadata insert is still in flight
+DEFAULT_MIN_AGE = timedelta(hours=24)
+
+
+async def _paged_rows(table, columns, key, semaphore, not_null=None):
+    """
+    Read `columns` of every row in `table` (where `not_null` is set), in pages
+    following the unique column `key`. Each page starts after the last key
+    seen, so inserts and deletes during the scan never skip a row.
+    """
+    if key not in [column.strip() for column in columns.split(",")]:
+        columns = f"{key}, {columns}"
+    rows, last = [], None
+    while True:
+        def page():
+            query = supabase.table(table).select(columns)
+            if not_null:
+                query = query.not_.is_(not_null, "null")
+            if last is not None:
+                query = query.gt(key, last)
+            return query.order(key).limit(TABLE_PAGE_SIZE).execute()
+
+        async with semaphore:
+            result = await run_query(page)
+        batch = result.data or []
+        rows.extend(batch)
+        if len(batch) < TABLE_PAGE_SIZE:
+            return rows
+        last = batch[-1][key]
+
+
+async def load_referenced_paths(semaphore):
+    """Collect every Storage path the database still points at, image variants included"""
+    files, blobs, images, profiles, archives = await asyncio.gather(
+        _paged_rows("files", "file_path", "id", semaphore),
+        _paged_rows("file_blobs", "storage_path, thumbnail_path", "content_hash", semaphore),
+        _paged_rows("notes_files", "file_path, variants", "file_path", semaphore),
+        _paged_rows("profiles", "image_url, image_variants", "id", semaphore),
+        _paged_rows("conversations", "archive_path", "id", semaphore, not_null="archive_path"),
+    )
+    referenced = {row["file_path"] for row in files if row.get("file_path")}
+    for row in blobs:
+        referenced.update((row["storage_path"], row.get("thumbnail_path")))
+    for row in images:
+        referenced.add(row["file_path"])
+        referenced.update(variant_paths(row.get("variants")))
+    for row in profiles:
+        referenced.add(path_from_public_url(row.get("image_url")))
+        referenced.update(variant_paths(row.get("image_variants")))
+    referenced.update(row["archive_path"] for row in archives)
+    referenced.discard(None)
+    return referenced
+
+
+async def still_referenced(paths):
+    """
+    The subset of `paths` the database points at right now. Run on the
+    orphan candidates just before removal, so a reference written after the
+    full scan read its table still saves the object.
+    """
+    paths = list(paths)
+    # Note images and avatars are found through the note or user id in their path
+    note_ids = {path.split("/")[1] for path in paths if path.startswith("notes/") and path.count("/") >= 2}
+    user_ids = {path.split("/")[1] for path in paths if path.startswith("profiles/") and path.count("/") >= 2}
+    files, blob_paths, blob_thumbnails, images, profiles, archives = await asyncio.gather(
+        select_in("files", "file_path", paths, "file_path"),
+        select_in("file_blobs", "storage_path", paths, "storage_path"),
+        select_in("file_blobs", "thumbnail_path", paths, "thumbnail_path"),
+        select_in("notes_files", "note_id", note_ids, "file_path, variants"),
+        select_in("profiles", "id", user_ids, "image_url, image_variants"),
+        select_in("conversations", "archive_path", paths, "archive_path"),
+    )
+    live = {row["file_path"] for row in files}
+    live.update(row["storage_path"] for row in blob_paths)
+    live.update(row["thumbnail_path"] for row in blob_thumbnails)
+    live.update(row["archive_path"] for row in archives)
+    for row in images:
+        live.add(row["file_path"])
+        live.update(variant_paths(row.get("variants")))
+    for row in profiles:
+        live.add(path_from_public_url(row.get("image_url")))
+        live.update(variant_paths(row.get("image_variants")))
+    return live.intersection(paths)
+
+
+def _is_recent(entry, cutoff):
+    stamp = entry.get("updated_at") or entry.get("created_at")
+    if not stamp:
+        return False
+    try:
+        return datetime.fromisoformat(stamp.replace("Z", "+00:00")) > cutoff
+    except ValueError:
+        return False
+
+
+async def _list_folder(folder, semaphore):
+    """List one folder level completely, page by page"""
+    entries = []
+    offset = 0
+    while True:
+        async with semaphore:
+            page = await run_query(lambda: supabase.storage.from_(BUCKET).list(
+                folder, {"limit": LIST_PAGE_SIZE, "offset": offset, "sortBy": {"column": "name", "order": "asc"}}
+            ))
+        entries.extend(page or [])
+        if not page or len(page) < LIST_PAGE_SIZE:
+            return entries
+        offset += LIST_PAGE_SIZE
+
+
+async def walk_prefix(prefix, semaphore):
+    """
+    Yield pages of `(path, entry)` tuples for every object under `prefix`.
+    Sub-folders are listed concurrently; Storage reports folders with a null id.
+    """
+    pending = {asyncio.create_task(_list_folder(prefix, semaphore)): prefix}
+    while pending:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            folder = pending.pop(task)
+            objects = []
+            for entry in task.result():
+                path = f"{folder}/{entry['name']}"
+                if entry.get("id") is None:
+                    pending[asyncio.create_task(_list_folder(path, semaphore))] = path
+                else:
+                    objects.append((path, entry))
+            if objects:
+                yield objects
+
+
+async def collect_orphans(dry_run=False, prefixes=MANAGED_PREFIXES, min_age=DEFAULT_MIN_AGE):
+    """
+    Reconcile the bucket against the database and delete unreferenced objects.
+    Returns a report with scan throughput and what was (or would be) removed.
+    """
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    cutoff = datetime.now(timezone.utc) - min_age
+
+    referenced = await load_referenced_paths(semaphore)
+    references_loaded = time.perf_counter()
+
+    report = {
+        "dry_run": dry_run,
+        "referenced": len(referenced),
+        "scanned": 0,
+        "skipped_recent": 0,
+        "skipped_referenced": 0,
+        "orphans": 0,
+        "orphan_bytes": 0,
+        "deleted": 0,
+        "by_prefix": {},
+    }
+
+    for prefix in prefixes:
+        prefix_orphans = 0
+        async for page in walk_prefix(prefix, semaphore):
+            report["scanned"] += len(page)
+            entries = dict(page)
+            orphans = entries.keys() - referenced
+            recent = {path for path in orphans if _is_recent(entries[path], cutoff)}
+            orphans -= recent
+            report["skipped_recent"] += len(recent)
+            if orphans:
+                live = await still_referenced(orphans)
+                orphans -= live
+                report["skipped_referenced"] += len(live)
+            if not orphans:
+                continue
+
+            prefix_orphans += len(orphans)
+            report["orphan_bytes"] += sum((entries[path].get("metadata") or {}).get("size", 0) for path in orphans)
+            if not dry_run:
+                # Removed page by page under the semaphore, so deletes stay bounded however large the bucket
+                async with semaphore:
+                    report["deleted"] += await remove_paths(sorted(orphans))
+        report["by_prefix"][prefix] = prefix_orphans
+        report["orphans"] += prefix_orphans
+
+    finished = time.perf_counter()
+    elapsed = finished - started
+    report["seconds"] = {
+        "load_references": round(references_loaded - started, 3),
+        "total": round(elapsed, 3),
+    }
+    report["objects_per_second"] = round(report["scanned"] / elapsed, 1) if elapsed else None
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Remove unreferenced objects from the {BUCKET} bucket")
+    parser.add_argument("--dry-run", action="store_true", help="report orphans without deleting them")
+    parser.add_argument("--prefix", action="append", choices=MANAGED_PREFIXES,
+                        help="limit the scan to a prefix (repeatable)")
+    parser.add_argument("--min-age-hours", type=float, default=DEFAULT_MIN_AGE.total_seconds() / 3600,
+                        help="ignore objects modified more recently than this")
+    args = parser.parse_args()
+
+    report = asyncio.run(collect_orphans(
+        dry_run=args.dry_run,
+        prefixes=tuple(args.prefix or MANAGED_PREFIXES),
+        min_age=timedelta(hours=args.min_age_hours),
+    ))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
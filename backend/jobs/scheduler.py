@@ -0,0 +1,181 @@
+# jobs/scheduler.py
+"""
+In-process maintenance scheduler.
+
+The jobs delete rows and Storage objects, so they run on one designated
+runner, not in every web worker: either a dedicated process,
+    python -m jobs.scheduler --serve
+or a single app instance started with MAINTENANCE_ENABLED=true (the default
+is off). Should several runners be started anyway, a job still only runs
+where its lease is won: `try_acquire_lease` grants the named lease for the
+job's interval to one holder at a time, and the job moves to another runner
+when its holder dies. Runs are reported through the maintenance_* metrics.
+
+Run jobs by hand with:
+    python -m jobs.scheduler --run purge_expired_exams [--run orphan_gc] [--force]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from uuid import uuid4
+from core.config import settings
+from core.database import supabase
+from core.metrics import observe_maintenance_run
+from core.utils import run_query
+
+logger = logging.getLogger("emsi.maintenance")
+
+
+class Job:
+    """
+    A maintenance task run every `interval` seconds. `run` is an async
+    callable returning a report; `rows_key` names the report entry counted
+    in maintenance_rows_total.
+    """
+    __slots__ = ("name", "interval", "run", "rows_key")
+
+    def __init__(self, name, interval, run, rows_key):
+        self.name = name
+        self.interval = interval
+        self.run = run
+        self.rows_key = rows_key
+
+
+async def _purge_expired_exams():
+    from jobs.expired_exams import purge_expired_exams
+    return await purge_expired_exams()
+
+
+async def _reconcile_blob_refs():
+    from jobs.blob_refs import reconcile_blob_refs
+    return await reconcile_blob_refs()
+
+
+async def _archive_conversations():
+    from jobs.chat_archive import archive_idle_conversations
+    return await archive_idle_conversations()
+
+
+async def _collect_orphans():
+    # Imported on first run: the collector pulls in the image helpers
+    from jobs.orphan_gc import collect_orphans
+    return await collect_orphans()
+
+
+def default_jobs():
+    return [
+        Job("purge_expired_exams", settings.EXAM_PURGE_INTERVAL_SECONDS, _purge_expired_exams, "deleted"),
+        Job("reconcile_blob_refs", settings.BLOB_RECONCILE_INTERVAL_SECONDS, _reconcile_blob_refs, "released_blobs"),
+        Job("archive_conversations", settings.CHAT_ARCHIVE_INTERVAL_SECONDS, _archive_conversations, "archived"),
+        Job("orphan_gc", settings.ORPHAN_GC_INTERVAL_SECONDS, _collect_orphans, "deleted"),
+    ]
+
+
+class MaintenanceScheduler:
+    def __init__(self, jobs, tick=60):
+        self.jobs = {job.name: job for job in jobs}
+        self.tick = tick
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._next_run = {}
+        self._task = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_forever(self):
+        """The scheduling loop in the foreground, for a dedicated runner process"""
+        await self._loop()
+
+    async def _loop(self):
+        # The first check waits a tick, so a restarting fleet does not hit the database at once
+        now = time.monotonic()
+        for name in self.jobs:
+            self._next_run.setdefault(name, now + self.tick)
+        while True:
+            await asyncio.sleep(self.tick)
+            for job in self.jobs.values():
+                if time.monotonic() >= self._next_run[job.name]:
+                    await self.run_job(job)
+
+    async def _acquire_lease(self, job):
+        result = await run_query(lambda: supabase.rpc("try_acquire_lease", {
+            "p_name": f"maintenance:{job.name}",
+            "p_holder": self.holder,
+            "p_ttl_seconds": int(job.interval),
+        }).execute())
+        return bool(result.data)
+
+    async def run_job(self, job, force=False):
+        """
+        Run `job` if this worker wins its lease (or `force`). Returns the
+        job's report, or None when it was skipped or failed.
+        """
+        try:
+            acquired = force or await self._acquire_lease(job)
+        except Exception:
+            logger.warning("Could not take the lease for %s", job.name, exc_info=True)
+            acquired = False
+        if not acquired:
+            # Another worker holds it; check again next tick in case that worker goes away
+            observe_maintenance_run(job.name, 0, outcome="skipped")
+            self._next_run[job.name] = time.monotonic() + self.tick
+            return None
+
+        self._next_run[job.name] = time.monotonic() + job.interval
+        started = time.perf_counter()
+        try:
+            report = await job.run()
+        except Exception:
+            observe_maintenance_run(job.name, time.perf_counter() - started, outcome="error")
+            logger.exception("Maintenance job %s failed", job.name)
+            return None
+
+        seconds = time.perf_counter() - started
+        observe_maintenance_run(job.name, seconds, report.get(job.rows_key) or 0)
+        logger.info("Maintenance job %s finished in %.2fs: %s", job.name, seconds, report)
+        return report
+
+
+scheduler = MaintenanceScheduler(default_jobs(), settings.MAINTENANCE_TICK_SECONDS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run maintenance jobs once, or keep running them on schedule")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--run", action="append", choices=sorted(scheduler.jobs),
+                      help="job to run (repeatable)")
+    mode.add_argument("--serve", action="store_true",
+                      help="run every job on its interval until interrupted (the designated runner)")
+    parser.add_argument("--force", action="store_true", help="run even if another worker holds the lease")
+    args = parser.parse_args()
+
+    if args.serve:
+        logging.basicConfig(level=logging.INFO)
+        try:
+            asyncio.run(scheduler.run_forever())
+        except KeyboardInterrupt:
+            pass
+        return
+
+    async def run():
+        return {name: await scheduler.run_job(scheduler.jobs[name], force=args.force) for name in args.run}
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
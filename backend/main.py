@@ -1,6 +1,14 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header
 from fastapi.middleware.cors import CORSMiddleware
 from core.config import settings
+from core.metrics import MetricsMiddleware, check_metrics_token, metrics_response
+from core.tracing import TracingMiddleware
+from core.routing import FastJSONResponse
+from core.compression import CompressionMiddleware
+from core.llm import llm
+from core.events import events
+from core.storage import close_storage_http
+from jobs.scheduler import scheduler
 from api.auth.routes import router as auth_router
 from api.profiles.routes import router as profile_router
 from api.courses.routes import router as course_router
@@ -10,7 +18,15 @@ from api.notes.routes import router as notes_router
 from api.AIChat.routes import router as Airouter
 from api.tasks.routes import router as tasks_router
 from api.announcements.routes import router as announcements_router
-app = FastAPI(title=settings.PROJECT_NAME)
+from api.dashboard.routes import router as dashboard_router
+app = FastAPI(title=settings.PROJECT_NAME, default_response_class=FastJSONResponse)
+app.add_event_handler("shutdown", llm.aclose)
+app.add_event_handler("startup", events.start)
+app.add_event_handler("shutdown", events.stop)
+app.add_event_handler("shutdown", close_storage_http)
+if settings.MAINTENANCE_ENABLED:
+    app.add_event_handler("startup", scheduler.start)
+    app.add_event_handler("shutdown", scheduler.stop)
 
 # CORS
 app.add_middleware(
@@ -20,7 +36,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_BYTES)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.include_router(announcements_router, prefix="/announcements", tags=["announcements"])
 app.include_router(tasks_router, prefix="/tasks", tags=["tasks"])
 app.include_router(notes_router, prefix="/notes", tags=["notes"])
@@ -30,6 +50,12 @@ app.include_router(profile_router, prefix="/profiles", tags=["profiles"])
 app.include_router(file_router, prefix="/files", tags=["files"])
 app.include_router(planing_router, prefix="/planing", tags=["planing"])
 app.include_router(Airouter, prefix="/ai", tags=["ai"])
+app.include_router(dashboard_router, prefix="/dashboard", tags=["dashboard"])
 @app.get("/")
 def root():
-    return {"message": "API is running"}
\ No newline at end of file
+    return {"message": "API is running"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(authorization: str = Header(None)):
+    check_metrics_token(authorization)
+    return metrics_response()
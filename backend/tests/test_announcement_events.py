@@ -0,0 +1,65 @@
+"""Announcement events carry only what the public board shows"""
+import pytest
+
+from api.announcements.feed import CHANNEL, FEED_COLUMNS, OWNER_CHANNEL
+from api.announcements.routes import _subscribe
+from core.events import events
+
+
+def capture(monkeypatch, channel):
+    captured = []
+    monkeypatch.setitem(events._listeners, channel, [*events._listeners.get(channel, []), captured.append])
+    return captured
+
+
+@pytest.fixture
+def published(monkeypatch):
+    return capture(monkeypatch, CHANNEL)
+
+
+@pytest.fixture
+def owned(monkeypatch):
+    return capture(monkeypatch, OWNER_CHANNEL)
+
+
+def test_open_announcement_event_matches_the_public_list(fake, seeded, client, published):
+    user, = seeded()
+    created = client(user).post("/announcements/create-announcements", json={
+        "title": "Need help with graphs", "categorie": "Math", "contact_method": "phone", "contact_value": "0600000000",
+    })
+    assert created.status_code == 201, created.text
+
+    event, = published
+    assert event["type"] == "created"
+    assert set(event["announcement"]) == set(FEED_COLUMNS) | {"full_name", "image_url"}
+
+
+def test_closing_publishes_only_the_id(fake, seeded, client, published):
+    user, = seeded(announcements_per_user=1)
+    announcement = fake.table("help_announcements")[0]
+
+    response = client(user).patch(f"/announcements/toggle_status/{announcement['id']}")
+    assert response.status_code == 200, response.text
+
+    event, = published
+    assert event["type"] == "closed"
+    assert event["announcement"] == {"id": announcement["id"], "user_id": user["user"]["id"]}
+
+
+def test_owner_feed_keeps_closed_announcements(fake, seeded, client, owned):
+    user, = seeded(announcements_per_user=1)
+    c = client(user)
+    announcement = fake.table("help_announcements")[0]
+    subscription = _subscribe(user["user"]["id"], "mine", None)
+    others = _subscribe("someone-else", "mine", None)
+
+    response = c.patch(f"/announcements/toggle_status/{announcement['id']}")
+    assert response.status_code == 200, response.text
+
+    event, = owned
+    listed, = c.get("/announcements/my_announcements").json()
+    assert event["type"] == "toggled"
+    assert event["announcement"] == listed and listed["status"] == "closed"
+    assert subscription._queue.qsize() == 1 and others._queue.qsize() == 0
+    subscription.close()
+    others.close()
@@ -0,0 +1,16 @@
+"""/tasks/bulk_update writes only what each item sets"""
+
+
+def test_bulk_update_clears_nullable_fields_only(fake, seeded, client):
+    user, = seeded()
+    c = client(user)
+    created = c.post("/tasks/bulk_create", json=[{"title": "Read", "description": "ch. 3", "category": "Math"}])
+    task_id = created.json()["results"][0]["task_id"]
+
+    response = c.put("/tasks/bulk_update", json=[
+        {"task_id": task_id, "title": None, "completed": None, "description": None, "category": None},
+    ])
+
+    assert response.status_code == 200, response.text
+    task = response.json()["results"][0]["task"]
+    assert (task["title"], task["completed"], task["description"], task["category"]) == ("Read", False, None, None)
@@ -0,0 +1,73 @@
+"""Course and note deletion leave no dependent rows or Storage objects behind"""
+from api.courses.service import delete_course_cascade
+from core.images import NOTE_IMAGE_VARIANTS
+
+
+def add_note_image(fake, note, stem):
+    """A notes_files row laid out as store_image_variants writes it, with its objects"""
+    variants = {name: {"path": f"notes/{note['id']}/{stem}/{name}.webp"} for name in NOTE_IMAGE_VARIANTS}
+    for variant in variants.values():
+        fake.put_object(variant["path"], b"variant")
+    return fake.insert("notes_files", {"note_id": note["id"], "file_path": variants["display"]["path"],
+                                       "variants": variants})
+
+
+def test_course_delete_removes_files_notes_and_images(fake, seeded, client):
+    user, = seeded(courses_per_user=2, notes_per_user=3)
+    course, other = user["courses"]
+    for note in fake.table("notes"):
+        note["course_id"] = course["id"]
+    image = add_note_image(fake, fake.table("notes")[0], "board")
+    lecture_path = fake.table("files")[0]["file_path"]
+
+    response = client(user).delete(f"/courses/{course['id']}")
+
+    assert response.status_code == 200, response.text
+    assert response.json()["deleted"]["courses"] == 1
+    assert not [c for c in fake.table("courses") if c["id"] == course["id"]]
+    assert not [f for f in fake.table("files") if f["course_id"] == course["id"]]
+    assert not fake.table("notes") and not fake.table("notes_files")
+    assert not [path for path in fake.objects if path.startswith("notes/")]
+    assert image["file_path"] not in fake.objects
+    # The other course still references the shared lecture blob
+    assert lecture_path in fake.objects
+    assert fake.table("file_blobs")[0]["ref_count"] == 1
+
+    assert client(user).delete(f"/courses/{other['id']}").status_code == 200
+    assert not fake.table("files") and not fake.table("file_blobs")
+    assert lecture_path not in fake.objects
+
+
+def test_course_delete_requires_owner(fake, seeded, client):
+    owner, intruder = seeded(users=2)
+    course = owner["courses"][0]
+
+    assert client(intruder).delete(f"/courses/{course['id']}").status_code in (400, 404)
+    assert [c for c in fake.table("courses") if c["id"] == course["id"]]
+    assert [f for f in fake.table("files") if f["course_id"] == course["id"]]
+
+
+def test_note_delete_removes_images_and_variants(fake, seeded, client):
+    user, = seeded(notes_per_user=2)
+    note, kept = user["notes"]
+    add_note_image(fake, note, "a")
+    add_note_image(fake, note, "b")
+    kept_image = add_note_image(fake, kept, "c")
+
+    response = client(user).delete(f"/notes/delete_note/{note['id']}")
+
+    assert response.status_code == 200, response.text
+    assert response.json()["deleted"] == {"notes": 1, "note_images": 2, "blobs": 6}
+    assert [n["id"] for n in fake.table("notes")] == [kept["id"]]
+    assert fake.table("notes_files") == [kept_image]
+    assert sorted(path for path in fake.objects if path.startswith("notes/")) == sorted(
+        v["path"] for v in kept_image["variants"].values()
+    )
+
+
+def test_course_delete_counts_only_what_it_deleted(fake, seeded, run):
+    seeded()
+
+    deleted = run(delete_course_cascade("00000000-0000-0000-0000-000000000000"))
+
+    assert deleted == {"courses": 0, "files": 0, "notes": 0, "note_images": 0, "blobs": 0}
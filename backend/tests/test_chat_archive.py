@@ -0,0 +1,74 @@
+"""Archived conversations come back intact, however many readers race"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api.AIChat.archive import rehydrate
+from core.storage import remove_paths
+from jobs.chat_archive import archive_idle_conversations
+
+
+@pytest.fixture
+def archived(fake, seeded, run):
+    user, = seeded()
+    old = (datetime.now(timezone.utc) - timedelta(days=60)).isoformat()
+    conversation = fake.insert("conversations", {"user_id": user["user"]["id"], "title": "Graphs",
+                                                 "message_count": 4, "updated_at": old})
+    for i in range(4):
+        fake.insert("messages", {"conversation_id": conversation["id"], "role": "user" if i % 2 == 0 else "assistant",
+                                 "content": f"message {i} " * 50,
+                                 "created_at": (datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=i)).isoformat()})
+    report = run(archive_idle_conversations())
+    assert report["archived"] == 1 and not fake.table("messages")
+    return user, conversation
+
+
+def test_get_messages_restores_the_archive(fake, client, archived):
+    user, conversation = archived
+    path = conversation["archive_path"]
+
+    response = client(user).get(f"/ai/get-messages/{conversation['id']}")
+
+    assert response.status_code == 200, response.text
+    assert [m["content"] for m in response.json()["messages"]] == [f"message {i} " * 50 for i in range(4)]
+    assert conversation["archive_path"] is None and path not in fake.objects
+    assert len(fake.table("messages")) == 4
+
+
+def test_rehydrate_after_another_reader_restored_it(fake, run, archived):
+    _, conversation = archived
+    path = conversation["archive_path"]
+    first = run(rehydrate(conversation["id"], path))
+
+    # The second reader saw the archive_path before the first one finished
+    second = run(rehydrate(conversation["id"], path))
+
+    assert [m["id"] for m in second] == [m["id"] for m in first]
+    assert len(fake.table("messages")) == 4
+
+
+def test_rehydrated_conversation_is_not_archived_again(fake, run, archived):
+    _, conversation = archived
+    path = conversation["archive_path"]
+    run(rehydrate(conversation["id"], path))
+
+    report = run(archive_idle_conversations())
+
+    assert report["archived"] == 0
+    assert conversation["archived_at"] is None and len(fake.table("messages")) == 4
+
+
+def test_late_remove_of_an_old_archive_spares_the_new_one(fake, client, run, archived):
+    user, conversation = archived
+    first = conversation["archive_path"]
+    run(rehydrate(conversation["id"], first))
+    conversation["updated_at"] = (datetime.now(timezone.utc) - timedelta(days=60)).isoformat()
+    assert run(archive_idle_conversations())["archived"] == 1
+
+    # The first rehydration's remove lands only now
+    run(remove_paths([first]))
+
+    assert conversation["archive_path"] not in (None, first)
+    response = client(user).get(f"/ai/get-messages/{conversation['id']}")
+    assert response.status_code == 200, response.text
+    assert len(response.json()["messages"]) == 4
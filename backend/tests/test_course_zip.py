@@ -0,0 +1,75 @@
+"""/files/download_course streams a valid ZIP and serves byte ranges of it"""
+import io
+import zipfile
+
+import pytest
+
+from api.files import service
+
+
+@pytest.fixture
+def course_with_files(fake, seeded, client):
+    user, = seeded()
+    course = user["courses"][0]
+    c = client(user)
+    for name, content in (("notes.pdf", b"%PDF" * 5000), ("slides.pdf", b"slide" * 3000), ("notes.pdf", b"again" * 10)):
+        assert c.post(f"/files/upload_file/{course['id']}", files={"file": (name, content, "application/pdf")}).status_code == 200
+    # Uploaded before deduplication: no blob row, its own object
+    fake.put_object("courses/legacy/old.txt", b"legacy bytes" * 100)
+    fake.insert("files", {"course_id": course["id"], "file_name": "old.txt", "file_path": "courses/legacy/old.txt",
+                          "file_size": 1200, "content_hash": None})
+    return c, course
+
+
+def test_full_download_is_a_valid_zip(course_with_files, fake):
+    c, course = course_with_files
+
+    response = c.get(f"/files/download_course/{course['id']}")
+
+    assert response.status_code == 200
+    assert int(response.headers["content-length"]) == len(response.content)
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.testzip() is None
+    assert archive.namelist() == ["lecture_0_0.txt", "notes.pdf", "slides.pdf", "notes (2).pdf", "old.txt"]
+    assert archive.read("old.txt") == b"legacy bytes" * 100
+
+
+def test_ranges_reassemble_the_archive(course_with_files):
+    c, course = course_with_files
+    full = c.get(f"/files/download_course/{course['id']}")
+    etag = full.headers["etag"]
+
+    parts = []
+    for start in range(0, len(full.content), 7000):
+        part = c.get(f"/files/download_course/{course['id']}",
+                     headers={"Range": f"bytes={start}-{start + 6999}", "If-Range": etag})
+        assert part.status_code == 206
+        parts.append(part.content)
+    assert b"".join(parts) == full.content
+
+    assert c.get(f"/files/download_course/{course['id']}", headers={"Range": "bytes=0-9", "If-Range": '"old"'}).status_code == 200
+    unsatisfiable = c.get(f"/files/download_course/{course['id']}", headers={"Range": f"bytes={len(full.content)}-"})
+    assert unsatisfiable.status_code == 416
+    # An invalid range is ignored, not refused
+    reversed_range = c.get(f"/files/download_course/{course['id']}", headers={"Range": "bytes=500-100"})
+    assert reversed_range.status_code == 200 and reversed_range.content == full.content
+
+
+def test_missing_crcs_are_computed_once(course_with_files, fake, monkeypatch):
+    c, course = course_with_files
+    reads = []
+    compute = service._object_crc32
+
+    async def counted(path):
+        reads.append(path)
+        return await compute(path)
+    monkeypatch.setattr(service, "_object_crc32", counted)
+
+    first = c.get(f"/files/download_course/{course['id']}")
+    second = c.head(f"/files/download_course/{course['id']}")
+
+    # The seeded lecture blob and the legacy file have no CRC-32 recorded yet
+    assert sorted(reads) == sorted(["courses/legacy/old.txt", fake.table("files")[0]["file_path"]])
+    assert second.headers["etag"] == first.headers["etag"]
+    legacy = next(f for f in fake.table("files") if f["file_path"] == "courses/legacy/old.txt")
+    assert legacy["crc32"] is not None and legacy["file_size"] == 1200
@@ -0,0 +1,14 @@
+"""/dashboard sections stay bounded however much the user has"""
+from core.config import settings
+
+
+def test_sections_are_capped(fake, seeded, client):
+    user, = seeded(courses_per_user=settings.DASHBOARD_ITEMS + 4, notes_per_user=settings.DASHBOARD_ITEMS + 4)
+
+    response = client(user).get("/dashboard", params={"refresh": "true"})
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert len(body["courses"]) == settings.DASHBOARD_ITEMS
+    assert len(body["recent_notes"]) == settings.DASHBOARD_ITEMS
+    assert body["counts"]["courses"] == settings.DASHBOARD_ITEMS + 4
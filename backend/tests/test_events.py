@@ -0,0 +1,52 @@
+"""EventBus replays what a reconnecting client missed and resyncs slow ones"""
+import asyncio
+
+from core.events import EventBus
+
+
+def test_replay_after_last_event_id():
+    async def scenario():
+        bus = EventBus(queue_size=10, replay_size=5)
+        published = [await bus.publish("board", {"type": "created", "n": n}) for n in range(4)]
+        subscription = bus.subscribe("board", last_event_id=published[1]["id"])
+        return [(await subscription.next(timeout=0.1))["n"] for _ in range(2)], await subscription.next(timeout=0.01)
+    replayed, then = asyncio.run(scenario())
+    assert replayed == [2, 3] and then is None
+
+
+def test_unknown_last_event_id_resyncs():
+    async def scenario():
+        bus = EventBus(queue_size=10, replay_size=2)
+        for n in range(5):
+            await bus.publish("board", {"type": "created", "n": n})
+        return (await bus.subscribe("board", last_event_id="0-0").next(timeout=0.1))["type"]
+    assert asyncio.run(scenario()) == "resync"
+
+
+def test_slow_subscriber_gets_one_resync_then_live_events():
+    async def scenario():
+        bus = EventBus(queue_size=3, replay_size=10)
+        subscription = bus.subscribe("board")
+        for n in range(10):
+            await bus.publish("board", {"type": "created", "n": n})
+        first = await subscription.next(timeout=0.1)
+        idle = await subscription.next(timeout=0.01)
+        await bus.publish("board", {"type": "created", "n": 10})
+        return first, idle, await subscription.next(timeout=0.1)
+    first, idle, live = asyncio.run(scenario())
+    assert first["type"] == "resync" and idle is None and live["n"] == 10
+
+
+def test_filters_and_listeners():
+    async def scenario():
+        bus = EventBus(queue_size=10, replay_size=10)
+        heard = []
+        bus.add_listener("board", heard.append)
+        mine = bus.subscribe("board", accept=lambda event: event["user_id"] == "me")
+        await bus.publish("board", {"type": "created", "user_id": "other"})
+        await bus.publish("board", {"type": "created", "user_id": "me"})
+        received = await mine.next(timeout=0.1)
+        mine.close()
+        return heard, received, bus.subscriber_count("board")
+    heard, received, count = asyncio.run(scenario())
+    assert len(heard) == 2 and received["user_id"] == "me" and count == 0
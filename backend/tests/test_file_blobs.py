@@ -0,0 +1,100 @@
+"""Deduplicated uploads share a blob only once its bytes are stored"""
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+from api.files.service import blob_path, release_blobs, remove_released_blobs
+from core.database import supabase
+from jobs.blob_refs import reconcile_blob_refs
+
+
+def upload(client, course, name, content):
+    response = client.post(f"/files/upload_file/{course['id']}", files={"file": (name, content, "text/plain")})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_duplicate_of_unfinished_upload_stores_the_bytes(fake, seeded, client, run):
+    user, = seeded()
+    content = b"lecture notes"
+    content_hash = hashlib.sha256(content).hexdigest()
+    # A first uploader took the reference but its upload has not finished (or failed)
+    fake.insert("file_blobs", {
+        "content_hash": content_hash, "storage_path": blob_path(content_hash), "size": len(content),
+        "content_type": "text/plain", "ref_count": 1, "thumbnail_path": None, "uploaded": False,
+    })
+
+    upload(client(user), user["courses"][0], "copy.txt", content)
+    run(release_blobs([content_hash]))
+
+    blob = next(b for b in fake.table("file_blobs") if b["content_hash"] == content_hash)
+    assert blob["uploaded"] and blob["ref_count"] == 1
+    assert fake.objects[blob_path(content_hash)]["content"] == content
+
+
+def test_duplicate_of_finished_upload_skips_storage(fake, seeded, client):
+    user, = seeded()
+    c = client(user)
+    upload(c, user["courses"][0], "a.txt", b"same bytes")
+    fake.objects.clear()
+
+    upload(c, user["courses"][0], "b.txt", b"same bytes")
+
+    assert not fake.objects
+    content_hash = hashlib.sha256(b"same bytes").hexdigest()
+    assert [(b["ref_count"], b["uploaded"]) for b in fake.table("file_blobs") if b["content_hash"] == content_hash] == [(2, True)]
+
+
+def test_reconcile_skips_blobs_acquired_during_an_upload(fake, seeded, run):
+    seeded()
+    old = (datetime.now(timezone.utc) - timedelta(days=3)).isoformat()
+    for name, acquired_at in (("in_flight", datetime.now(timezone.utc).isoformat()), ("abandoned", old)):
+        fake.insert("file_blobs", {
+            "content_hash": name, "storage_path": f"blobs/{name}", "size": 1, "content_type": "text/plain",
+            "ref_count": 1, "thumbnail_path": None, "uploaded": True, "created_at": old, "acquired_at": acquired_at,
+        })
+        fake.put_object(f"blobs/{name}", b"x")
+
+    report = run(reconcile_blob_refs())
+
+    assert report["released_blobs"] == 1
+    hashes = {b["content_hash"] for b in fake.table("file_blobs")}
+    assert "in_flight" in hashes and "abandoned" not in hashes
+    assert "blobs/in_flight" in fake.objects and "blobs/abandoned" not in fake.objects
+    assert next(b for b in fake.table("file_blobs") if b["content_hash"] == "in_flight")["ref_count"] == 1
+
+
+def test_upload_during_release_keeps_its_object(fake, seeded, client, run):
+    user, = seeded()
+    c = client(user)
+    content = b"released and uploaded again"
+    content_hash = hashlib.sha256(content).hexdigest()
+    upload(c, user["courses"][0], "a.txt", content)
+    fake.tables["files"] = [f for f in fake.table("files") if f.get("content_hash") != content_hash]
+
+    # The last reference is dropped, but the release has not removed the object yet
+    released = supabase.rpc("release_file_blobs", {"p_content_hashes": [content_hash]}).execute().data
+    again = upload(c, user["courses"][0], "b.txt", content)
+    run(remove_released_blobs(released))
+
+    blob, = [b for b in fake.table("file_blobs") if b["content_hash"] == content_hash]
+    assert blob["ref_count"] == 1 and blob["uploaded"] and not blob.get("released_at")
+    assert again["file_data"]["file_path"] == blob["storage_path"] != blob_path(content_hash)
+    assert fake.objects[blob["storage_path"]]["content"] == content
+    assert blob_path(content_hash) not in fake.objects
+
+
+def test_reconcile_retries_stale_tombstones(fake, seeded, run):
+    seeded()
+    old = (datetime.now(timezone.utc) - timedelta(days=3)).isoformat()
+    fake.insert("file_blobs", {
+        "content_hash": "crashed", "storage_path": "blobs/crashed", "size": 1, "content_type": "text/plain",
+        "ref_count": 0, "thumbnail_path": None, "uploaded": True, "created_at": old, "acquired_at": old,
+        "released_at": old,
+    })
+    fake.put_object("blobs/crashed", b"x")
+
+    report = run(reconcile_blob_refs())
+
+    assert report["released_blobs"] == 1
+    assert not any(b["content_hash"] == "crashed" for b in fake.table("file_blobs"))
+    assert "blobs/crashed" not in fake.objects
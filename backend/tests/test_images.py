@@ -0,0 +1,60 @@
+"""Note images are stored as oriented, metadata-free WebP variants of bounded size"""
+import os
+from io import BytesIO
+
+from PIL import Image
+
+from core.images import NOTE_IMAGE_VARIANTS
+from core.storage import path_from_public_url
+
+# EXIF tags: Orientation (6 = rotate 90° clockwise to display) and camera Make
+ORIENTATION, MAKE = 0x0112, 0x010F
+
+
+def photo(width=2400, height=1200):
+    """A noisy JPEG, stored sideways with an EXIF orientation as phones do"""
+    image = Image.frombytes("RGB", (width, height), os.urandom(width * height * 3))
+    exif = Image.Exif()
+    exif[ORIENTATION] = 6
+    exif[MAKE] = "PhoneCam"
+    buffer = BytesIO()
+    image.save(buffer, "JPEG", quality=95, exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+def test_upload_stores_every_variant_as_bounded_webp(fake, seeded, client):
+    user, = seeded()
+    note = fake.table("notes")[0]
+    upload = photo()
+
+    response = client(user).post(f"/notes/upload_image/{note['id']}",
+                                 files={"file": ("board.jpg", upload, "image/jpeg")})
+
+    assert response.status_code == 200, response.text
+    row, = fake.table("notes_files")
+    assert set(row["variants"]) == set(NOTE_IMAGE_VARIANTS)
+    assert row["file_path"] == row["variants"]["display"]["path"]
+    for name, max_side in NOTE_IMAGE_VARIANTS.items():
+        recorded = row["variants"][name]
+        content = fake.objects[recorded["path"]]["content"]
+        stored = Image.open(BytesIO(content))
+        assert stored.format == "WEBP"
+        assert "exif" not in stored.info and not stored.getexif()
+        # Turned upright: the sideways 2400x1200 upload is displayed 1200 wide, 2400 high
+        assert stored.height == 2 * stored.width
+        assert max(stored.size) == (max_side or 2400)
+        assert (recorded["width"], recorded["height"], recorded["bytes"]) == (stored.width, stored.height, len(content))
+        assert path_from_public_url(recorded["url"]) == recorded["path"]
+    assert row["variants"]["thumbnail"]["bytes"] * 20 < len(upload)
+    assert row["variants"]["display"]["bytes"] < len(upload)
+
+
+def test_undecodable_upload_is_rejected(fake, seeded, client):
+    user, = seeded()
+    note = fake.table("notes")[0]
+
+    response = client(user).post(f"/notes/upload_image/{note['id']}",
+                                 files={"file": ("board.jpg", b"not an image", "image/jpeg")})
+
+    assert response.status_code == 400
+    assert not fake.table("notes_files") and not [p for p in fake.objects if p.startswith("notes/")]
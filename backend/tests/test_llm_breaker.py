@@ -0,0 +1,105 @@
+"""A failing provider trips its circuit, and a half-open circuit always gets its trial slot back"""
+import asyncio
+
+import httpx
+import pytest
+
+from core.config import settings
+from core.llm import LLMClient, LLMError, LLMUnavailable, _RetryableError, llm
+from core.ratelimit import InMemoryBuckets, llm_limiter
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 0)
+    monkeypatch.setattr(settings, "LLM_CIRCUIT_FAILURES", 1)
+    client = LLMClient("http://llm.invalid", "key", "primary", None)
+    breaker = client.breaker("primary")
+    # Open, with the reset timeout already elapsed: the next call is the trial
+    breaker.record_failure()
+    breaker.opened_at -= settings.LLM_CIRCUIT_RESET_SECONDS + 1
+    return client
+
+
+def answer_with(client, monkeypatch, outcome):
+    async def hedged(model, body):
+        if isinstance(outcome, BaseException):
+            raise outcome
+        if outcome == "hang":
+            await asyncio.Event().wait()
+        return outcome
+    monkeypatch.setattr(client, "_hedged", hedged)
+
+
+def call(client):
+    return client._call_model("primary", {"model": "primary", "messages": []})
+
+
+def test_rejected_trial_frees_the_slot(client, monkeypatch):
+    answer_with(client, monkeypatch, LLMError("400 bad request"))
+    with pytest.raises(LLMError):
+        asyncio.run(call(client))
+
+    answer_with(client, monkeypatch, "ok")
+    assert asyncio.run(call(client)) == "ok"
+    assert not client.breaker("primary").half_open
+
+
+def test_cancelled_trial_frees_the_slot(client, monkeypatch):
+    answer_with(client, monkeypatch, "hang")
+
+    async def cancel_trial():
+        task = asyncio.create_task(call(client))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(cancel_trial())
+
+    answer_with(client, monkeypatch, "ok")
+    assert asyncio.run(call(client)) == "ok"
+
+
+def test_only_one_trial_at_a_time(client, monkeypatch):
+    answer_with(client, monkeypatch, "hang")
+
+    async def concurrent():
+        trial = asyncio.create_task(call(client))
+        await asyncio.sleep(0.01)
+        with pytest.raises(LLMUnavailable):
+            await call(client)
+        trial.cancel()
+    asyncio.run(concurrent())
+
+
+def test_failed_trial_reopens(client, monkeypatch):
+    answer_with(client, monkeypatch, _RetryableError("503"))
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(call(client))
+
+    breaker = client.breaker("primary")
+    assert breaker.half_open and not breaker.allow()
+
+
+def test_ai_chat_answers_503_and_stops_calling_a_failing_provider(fake, seeded, app_url, monkeypatch):
+
+    user, = seeded()
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 0)
+    monkeypatch.setattr(settings, "LLM_CIRCUIT_FAILURES", 1)
+    monkeypatch.setattr(settings, "LLM_HEDGING", False)
+    monkeypatch.setattr(llm, "_breakers", {})
+    monkeypatch.setattr(llm_limiter, "buckets", InMemoryBuckets())
+    monkeypatch.setattr(fake, "llm_error_rate", 1.0)
+    c = httpx.Client(base_url=app_url, cookies={"access_token": user["token"]}, timeout=30)
+    question = [{"role": "user", "content": "Explain breadth-first search on a weighted graph, step by step"}]
+
+    first = c.post("/ai/ai-chat", json=question)
+    calls = sum(fake.llm_calls.values())
+    second = c.post("/ai/ai-chat", json=question)
+    c.close()
+
+    assert first.status_code == second.status_code == 503
+    assert "circuit open" in second.json()["detail"]
+    # Both models were tried once, then both circuits stayed open
+    assert sum(fake.llm_calls.values()) == calls
+    assert all(llm.breaker(model).opened_at is not None for model in (llm.primary_model, llm.fallback_model))
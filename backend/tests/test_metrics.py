@@ -0,0 +1,18 @@
+"""/metrics is only readable with the scrape token"""
+import httpx
+
+from core.config import settings
+
+
+def test_metrics_require_the_token(app_url, monkeypatch):
+    with httpx.Client(base_url=app_url) as c:
+        assert c.get("/metrics").status_code == 404
+
+        monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+        missing = c.get("/metrics")
+        wrong = c.get("/metrics", headers={"Authorization": "Bearer guess"})
+        scraped = c.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+
+    assert missing.status_code == wrong.status_code == 401
+    assert missing.headers["WWW-Authenticate"] == "Bearer"
+    assert scraped.status_code == 200 and "http_request_duration_seconds" in scraped.text
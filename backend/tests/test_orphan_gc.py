@@ -0,0 +1,82 @@
+"""The orphan GC removes only objects nothing points at"""
+import asyncio
+from datetime import timedelta
+
+from core import database
+from jobs import orphan_gc
+from jobs.orphan_gc import collect_orphans
+
+
+def test_removes_only_unreferenced_objects(fake, seeded, run, monkeypatch):
+    monkeypatch.setattr(orphan_gc, "TABLE_PAGE_SIZE", 2)
+    seeded(users=3, courses_per_user=2)
+    for i in range(5):
+        fake.insert("files", {"course_id": "c", "file_name": f"f{i}", "file_path": f"courses/c/f{i}.pdf"})
+        fake.put_object(f"courses/c/f{i}.pdf", b"kept")
+    fake.put_object("courses/c/stray.pdf", b"orphan")
+    fake.put_object("notes/gone/image.webp", b"orphan")
+
+    report = run(collect_orphans(min_age=timedelta(0)))
+
+    assert report["deleted"] == 2
+    assert "courses/c/stray.pdf" not in fake.objects and "notes/gone/image.webp" not in fake.objects
+    assert all(f"courses/c/f{i}.pdf" in fake.objects for i in range(5))
+    assert all(blob["storage_path"] in fake.objects for blob in fake.table("file_blobs"))
+
+
+def test_reference_written_during_the_scan_keeps_its_object(fake, seeded, run, monkeypatch):
+    seeded()
+    fake.put_object("courses/c/late.pdf", b"uploaded")
+    load = orphan_gc.load_referenced_paths
+
+    async def load_then_reference(semaphore):
+        referenced = await load(semaphore)
+        # The metadata insert lands after the tables were read
+        fake.insert("files", {"course_id": "c", "file_name": "late", "file_path": "courses/c/late.pdf"})
+        return referenced
+    monkeypatch.setattr(orphan_gc, "load_referenced_paths", load_then_reference)
+
+    report = run(collect_orphans(min_age=timedelta(0)))
+
+    assert "courses/c/late.pdf" in fake.objects
+    assert report["skipped_referenced"] == 1 and report["deleted"] == 0
+
+
+def test_paging_survives_deletes_between_pages(fake, run, monkeypatch):
+    monkeypatch.setattr(orphan_gc, "TABLE_PAGE_SIZE", 2)
+    for i in range(7):
+        fake.insert("files", {"id": f"id{i}", "file_path": f"courses/c/f{i}.pdf"})
+
+    def delete_after_first_page(call):
+        # Offset paging would now skip a row
+        if call["target"] == "files" and fake.table("files")[0]["id"] == "id0":
+            fake.table("files").pop(0)
+    monkeypatch.setattr(database, "_call_listeners", [delete_after_first_page])
+
+    rows = run(orphan_gc._paged_rows("files", "file_path", "id", asyncio.Semaphore(1)))
+
+    assert [row["id"] for row in rows] == [f"id{i}" for i in range(7)]
+
+
+def test_removals_stay_bounded(fake, run, monkeypatch):
+    monkeypatch.setattr(orphan_gc, "MAX_CONCURRENCY", 2)
+    for folder in range(12):
+        fake.put_object(f"courses/c{folder}/stray.pdf", b"orphan")
+    in_flight, peak = 0, 0
+    remove = orphan_gc.remove_paths
+
+    async def counting_remove(paths):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            return await remove(paths)
+        finally:
+            in_flight -= 1
+    monkeypatch.setattr(orphan_gc, "remove_paths", counting_remove)
+
+    report = run(collect_orphans(min_age=timedelta(0)))
+
+    assert report["deleted"] == 12 and not fake.objects
+    assert peak <= orphan_gc.MAX_CONCURRENCY
@@ -0,0 +1,93 @@
+"""Per-user LLM budgets answer 429 with Retry-After, and the bulkhead serves users in turn"""
+import asyncio
+
+import pytest
+
+from core.ratelimit import FairBulkhead, InMemoryBuckets, LLMLimiter, RateLimited, llm_limiter
+
+
+def limiter(requests_per_minute=60, tokens_per_minute=600, max_concurrency=1, queue_timeout=5):
+    return LLMLimiter(InMemoryBuckets(), requests_per_minute, tokens_per_minute, max_concurrency, queue_timeout)
+
+
+async def hold(limiter, user_id, tokens):
+    async with limiter.acquire(user_id, tokens):
+        pass
+
+
+def test_drained_request_bucket_gives_retry_after():
+    requests = limiter(requests_per_minute=2)
+
+    async def burst():
+        await hold(requests, "u", 1)
+        await hold(requests, "u", 1)
+        await hold(requests, "u", 1)
+
+    with pytest.raises(RateLimited) as raised:
+        asyncio.run(burst())
+    # One request comes back every 30 s
+    assert raised.value.status_code == 429
+    assert 1 <= int(raised.value.headers["Retry-After"]) <= 30
+    asyncio.run(hold(requests, "other", 1))
+
+
+def test_token_budget_is_settled_with_the_billed_count():
+    tokens = limiter(tokens_per_minute=600)
+
+    async def calls():
+        async with tokens.acquire("u", 500) as permit:
+            permit.settle(100)
+        # The 400 reserved but not billed are back in the bucket
+        await hold(tokens, "u", 450)
+        with pytest.raises(RateLimited):
+            await hold(tokens, "u", 100)
+
+    asyncio.run(calls())
+
+
+def test_queue_timeout_refunds_the_reservation():
+    busy = limiter(tokens_per_minute=600, queue_timeout=0.05)
+
+    async def calls():
+        async with busy.acquire("a", 10):
+            with pytest.raises(RateLimited) as raised:
+                await hold(busy, "b", 500)
+        assert raised.value.detail == "AI service is busy, please retry later"
+        await hold(busy, "b", 500)
+
+    asyncio.run(calls())
+
+
+def test_bulkhead_hands_slots_out_round_robin():
+    bulkhead = FairBulkhead(1)
+    served = []
+
+    async def call(user_id):
+        await bulkhead.acquire(user_id, 5)
+        served.append(user_id)
+        await asyncio.sleep(0)
+        bulkhead.release()
+
+    async def burst():
+        await bulkhead.acquire("holder", 5)
+        # One user queues three calls before another queues one
+        waiters = [asyncio.create_task(call(user_id)) for user_id in ("a", "a", "a", "b")]
+        await asyncio.sleep(0)
+        bulkhead.release()
+        await asyncio.gather(*waiters)
+
+    asyncio.run(burst())
+    assert served == ["a", "b", "a", "a"]
+    assert bulkhead.active == 0 and bulkhead.waiting == 0
+
+
+def test_ai_chat_answers_429_once_the_bucket_is_drained(fake, seeded, client, monkeypatch):
+    user, = seeded()
+    monkeypatch.setattr(llm_limiter, "buckets", InMemoryBuckets())
+    rpm = llm_limiter.requests_per_minute
+    asyncio.run(llm_limiter.buckets.consume(f"llm:req:{user['user']['id']}", rpm, rpm, rpm / 60))
+
+    response = client(user).post("/ai/ai-chat", json=[{"role": "user", "content": "What is a graph?"}])
+
+    assert response.status_code == 429, response.text
+    assert int(response.headers["Retry-After"]) >= 1
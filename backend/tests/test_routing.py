@@ -0,0 +1,89 @@
+"""FastJSONRoute validates dict/list results against response_model once"""
+from datetime import datetime
+from typing import List, Optional
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.exceptions import ResponseValidationError
+from fastapi.testclient import TestClient
+from pydantic import BaseModel, Field
+
+from core.routing import FastJSONRoute
+
+
+class Author(BaseModel):
+    id: int
+    name: str
+
+
+class Post(BaseModel):
+    title: str
+    author: Author
+    published_at: datetime
+    tags: List[str] = []
+    summary: Optional[str] = Field(None, alias="abstract")
+
+
+def make_client(result):
+    router = APIRouter(route_class=FastJSONRoute)
+
+    @router.get("/posts", response_model=List[Post])
+    async def posts():
+        return result
+
+    @router.get("/raw")
+    def raw():
+        return result
+
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_nested_values_are_validated_coerced_and_trimmed():
+    client = make_client([{
+        "title": "Graphs", "author": {"id": "7", "name": "Ada", "email": "hidden@example.com"},
+        "published_at": "2026-10-19T08:30:00+00:00", "internal": True,
+    }])
+
+    assert client.get("/posts").json() == [{
+        "title": "Graphs", "author": {"id": 7, "name": "Ada"},
+        "published_at": "2026-10-19T08:30:00Z", "tags": [], "abstract": None,
+    }]
+
+
+def test_invalid_result_is_a_server_error():
+    client = make_client([{"title": "Graphs", "author": {"id": "not a number", "name": "Ada"},
+                           "published_at": "2026-10-19"}])
+
+    assert client.get("/posts").status_code == 500
+    with pytest.raises(ResponseValidationError):
+        TestClient(client.app).get("/posts")
+
+
+def test_routes_without_response_model_render_as_returned():
+    client = make_client({"anything": [1, {"nested": None}]})
+
+    assert client.get("/raw").json() == {"anything": [1, {"nested": None}]}
+
+
+def test_app_endpoints_match_fastapi_output(fake, seeded, client):
+    from fastapi.encoders import jsonable_encoder
+    from api.planing.schemas import ExamOut
+    from api.tasks.shemas import BulkTaskResponse
+
+    user, = seeded()
+    c = client(user)
+    fake.insert("exams", {"user_id": user["user"]["id"], "title": "Algebra", "priority": 2,
+                          "exam_date": "2026-11-02T09:00:00+00:00"})
+    created = c.post("/tasks/bulk_create", json=[{"title": " Revise ", "due_date": "2026-11-01T00:00:00Z"}, {}])
+    exams = c.get("/planing/get_exams")
+
+    assert created.status_code == exams.status_code == 200
+    rows = [r for r in fake.table("exams") if r["user_id"] == user["user"]["id"]]
+    assert exams.json() == jsonable_encoder([ExamOut.model_validate(r) for r in rows])
+    # Nested task rows come back by alias with only the Task fields
+    expected = BulkTaskResponse.model_validate(created.json())
+    assert created.json() == jsonable_encoder(expected, by_alias=True)
+    task = created.json()["results"][0]["task"]
+    assert "user_id" not in task and task["task_id"] and task["title"] == "Revise"
@@ -0,0 +1,30 @@
+"""/tasks/get_tasks pages cover every task exactly once"""
+import pytest
+
+from core import database
+
+
+@pytest.mark.parametrize("sort", [None, "due_date", "-title"])
+def test_pages_are_disjoint_and_complete(fake, seeded, client, sort, monkeypatch):
+    user, = seeded()
+    # Ties on every sortable column
+    for task in fake.table("tasks"):
+        task.update(title="Same", due_date="2026-10-20T00:00:00+00:00", created_at="2026-10-19T00:00:00+00:00")
+    queries = []
+    monkeypatch.setattr(database, "_call_listeners", [
+        lambda call: call["target"] == "tasks" and queries.append(call["filters"])
+    ])
+    c = client(user)
+
+    seen = []
+    for offset in range(0, 10, 3):
+        params = {"limit": 3, "offset": offset, **({"sort": sort} if sort else {})}
+        response = c.get("/tasks/get_tasks", params=params)
+        assert response.status_code == 200, response.text
+        assert response.headers["X-Total-Count"] == "10"
+        seen += [task["task_id"] for task in response.json()]
+
+    assert sorted(seen) == sorted(task["task_id"] for task in fake.table("tasks"))
+    # Postgres gives no order to ties, so the unique key must close every ordering
+    orders = [[args[0] for name, args in filters if name == "order"] for filters in queries]
+    assert orders and all(order[-1] == "task_id" and len(order) == 2 for order in orders)
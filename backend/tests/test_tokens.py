@@ -0,0 +1,81 @@
+"""Prompts are fitted to the input budget locally, before the model is called"""
+import pytest
+
+from core.config import settings
+from core.ratelimit import InMemoryBuckets, llm_limiter
+from core.tokens import PromptTooLarge, count_messages, fit_messages
+
+
+def turn(role, words):
+    return {"role": role, "content": "graph " * words}
+
+
+def test_oldest_turns_are_dropped_first():
+    messages = [turn("system", 10), turn("user", 300), turn("assistant", 300), turn("user", 20)]
+    budget = count_messages([messages[0], messages[2], messages[3]])
+
+    fitted = fit_messages(messages, budget)
+
+    assert fitted.messages == [messages[0], messages[2], messages[3]]
+    assert fitted.dropped_messages == 1 and not fitted.truncated
+    assert fitted.prompt_tokens == budget < fitted.original_tokens
+
+
+def test_latest_message_is_truncated_when_it_alone_is_too_large():
+    messages = [turn("system", 10), turn("user", 5000)]
+
+    fitted = fit_messages(messages, 500)
+
+    assert fitted.truncated and fitted.dropped_messages == 0
+    assert fitted.prompt_tokens <= 500
+    assert count_messages(fitted.messages) == fitted.prompt_tokens
+    assert fitted.messages[-1]["content"].startswith("graph ")
+
+
+def test_prompt_too_large_when_system_messages_fill_the_budget():
+    with pytest.raises(PromptTooLarge) as raised:
+        fit_messages([turn("system", 2000), turn("user", 5)], 100)
+    assert raised.value.budget == 100 and raised.value.prompt_tokens > 100
+
+
+@pytest.fixture
+def fresh_budgets(monkeypatch):
+    monkeypatch.setattr(llm_limiter, "buckets", InMemoryBuckets())
+
+
+def test_ai_chat_reports_its_token_counts(fake, seeded, client, fresh_budgets):
+    user, = seeded()
+
+    response = client(user).post("/ai/ai-chat", json=[{"role": "user", "content": "What is a graph?"}])
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["reply"]
+    assert body["tokens"]["prompt_tokens"] > 0 and not body["tokens"]["truncated"]
+    assert body["tokens"]["max_output_tokens"] == settings.LLM_MAX_OUTPUT_TOKENS
+    assert body["tokens"]["usage"]["total_tokens"] > 0
+
+
+def test_ai_chat_answers_413_for_a_prompt_that_cannot_fit(fake, seeded, client, fresh_budgets):
+    user, = seeded()
+    calls = sum(fake.llm_calls.values())
+
+    response = client(user).post("/ai/ai-chat", json=[turn("system", 20000), turn("user", 5)])
+
+    assert response.status_code == 413, response.text
+    assert sum(fake.llm_calls.values()) == calls
+
+
+def test_explain_file_fits_the_document_and_reports_tokens(fake, seeded, client, fresh_budgets, monkeypatch):
+    user, = seeded()
+    monkeypatch.setattr(settings, "LLM_MAX_INPUT_TOKENS", 400)
+    c = client(user)
+    uploaded = c.post(f"/files/upload_file/{user['courses'][0]['id']}",
+                      files={"file": ("chapter.txt", b"A graph is a set of vertices. " * 500, "text/plain")})
+    assert uploaded.status_code == 200, uploaded.text
+
+    response = c.post("/ai/explain_file", params={"file_name": "chapter.txt"})
+
+    assert response.status_code == 200, response.text
+    tokens = response.json()["tokens"]
+    assert tokens["truncated"] and tokens["prompt_tokens"] <= 400 < tokens["original_prompt_tokens"]
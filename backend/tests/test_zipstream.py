@@ -0,0 +1,72 @@
+"""ZipPlan streams any byte range with bounded, cancellable read-ahead"""
+import asyncio
+import io
+import zipfile
+import zlib
+from datetime import datetime, timezone
+
+import pytest
+
+from core.zipstream import ZipEntry, ZipPlan, ZipTooLarge, ZIP_MAX_ENTRIES
+
+
+def make_plan(count=6, size=10_000):
+    data = {f"file{i}.bin": bytes([i]) * (size + i) for i in range(count)}
+    entries = [ZipEntry(name, len(content), zlib.crc32(content), datetime(2026, 10, 19, tzinfo=timezone.utc), name)
+               for name, content in data.items()]
+    return ZipPlan(entries), data
+
+
+def opener(data, started=None, chunk=1000):
+    async def open_data(entry, offset, length):
+        if started is not None:
+            started.append(entry.name)
+        content = data[entry.source][offset:offset + length]
+        for position in range(0, len(content), chunk):
+            await asyncio.sleep(0)
+            yield content[position:position + chunk]
+    return open_data
+
+
+async def collect(stream):
+    return b"".join([chunk async for chunk in stream])
+
+
+def test_whole_archive_and_every_range_match():
+    plan, data = make_plan()
+    body = asyncio.run(collect(plan.stream(opener(data))))
+
+    assert len(body) == plan.size
+    archive = zipfile.ZipFile(io.BytesIO(body))
+    assert archive.testzip() is None and {name: archive.read(name) for name in archive.namelist()} == data
+    for start, end in ((0, 0), (5, 29), (10_000, 30_123), (plan.size - 22, plan.size - 1)):
+        assert asyncio.run(collect(plan.stream(opener(data), start, end))) == body[start:end + 1]
+
+
+def test_read_ahead_is_bounded_and_cancelled_on_disconnect():
+    plan, data = make_plan(count=8)
+    started = []
+
+    async def read_first_chunk_then_disconnect():
+        stream = plan.stream(opener(data, started), read_ahead_files=2, read_ahead_chunks=1)
+        await stream.__anext__()
+        await asyncio.sleep(0.01)
+        assert len(started) <= 2
+        await stream.aclose()
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        await asyncio.sleep(0)
+        assert all(task.done() for task in pending)
+    asyncio.run(read_first_chunk_then_disconnect())
+
+
+def test_short_object_is_an_error():
+    plan, data = make_plan(count=1)
+    data["file0.bin"] = data["file0.bin"][:-1]
+    with pytest.raises(IOError):
+        asyncio.run(collect(plan.stream(opener(data))))
+
+
+def test_too_many_entries():
+    entry = ZipEntry("a", 0, 0, datetime(2026, 1, 1), "a")
+    with pytest.raises(ZipTooLarge):
+        ZipPlan([entry] * (ZIP_MAX_ENTRIES + 1))
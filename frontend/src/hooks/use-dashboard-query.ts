@@ -110,8 +110,9 @@ export function useDashboardData() {
 
   const loading = coursesLoading || examsLoading || tasksLoading || notesLoading || announcementsLoading;
 
-  const tasksDueToday = tasks.filter(t => t.due_date === today && !t.completed);
-  const overdueTasks = tasks.filter(t => t.due_date && t.due_date < today && !t.completed);
+  // due_date is a UTC timestamp (midnight for dates picked in the form); compare its UTC day
+  const tasksDueToday = tasks.filter(t => t.due_date?.slice(0, 10) === today && !t.completed);
+  const overdueTasks = tasks.filter(t => t.due_date && t.due_date.slice(0, 10) < today && !t.completed);
   const nextExam = exams.sort((a, b) => new Date(a.exam_date).getTime() - new Date(b.exam_date).getTime())[0] || null;
 
   // Calculate total files from localStorage cache (if available)
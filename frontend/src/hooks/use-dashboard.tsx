@@ -92,8 +92,9 @@ export function useDashboardData() {
     fetchData();
   }, []);
 
-  const tasksDueToday = tasks.filter(t => t.due_date === today && !t.completed);
-  const overdueTasks = tasks.filter(t => t.due_date && t.due_date < today && !t.completed);
+  // due_date is a UTC timestamp (midnight for dates picked in the form); compare its UTC day
+  const tasksDueToday = tasks.filter(t => t.due_date?.slice(0, 10) === today && !t.completed);
+  const overdueTasks = tasks.filter(t => t.due_date && t.due_date.slice(0, 10) < today && !t.completed);
   const nextExam = exams.sort((a, b) => new Date(a.exam_date).getTime() - new Date(b.exam_date).getTime())[0] || null;
 
   const stats: DashboardStats = {
@@ -4,7 +4,7 @@ export interface Task {
   title: string; // Task title
   description?: string; // Task description (optional)
   category: string; // Task category
-  due_date?: string; // Due date (optional)
+  due_date?: string; // Due date (optional), an ISO timestamp in UTC
   completed: boolean; // Task completion status
 }
 
@@ -0,0 +1,5 @@
+-- Resized WebP variants for note images and avatars.
+-- Each value maps a variant name (thumbnail, display, original) to
+-- {"path", "url", "width", "height", "bytes"}.
+alter table public.notes_files add column if not exists variants jsonb;
+alter table public.profiles add column if not exists image_variants jsonb;
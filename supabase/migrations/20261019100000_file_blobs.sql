@@ -0,0 +1,80 @@
+-- Content-addressed storage for course files.
+-- Identical uploads share one object under blobs/sha256/<xx>/<hash>; every
+-- `files` row holding the hash is one reference.
+create table if not exists public.file_blobs (
+    content_hash   text primary key,
+    storage_path   text not null,
+    size           bigint not null,
+    content_type   text,
+    ref_count      integer not null default 0,
+    extracted_text text,
+    thumbnail_path text,
+    created_at     timestamptz not null default now()
+);
+
+alter table public.files add column if not exists content_hash text;
+create index if not exists files_content_hash_idx on public.files (content_hash);
+
+-- Take one reference, creating the blob row on first use.
+-- `created` tells the caller whether it must upload the bytes.
+create or replace function public.acquire_file_blob(
+    p_content_hash text,
+    p_storage_path text,
+    p_size bigint,
+    p_content_type text
+)
+returns table (storage_path text, thumbnail_path text, ref_count integer, created boolean)
+language sql
+as $$
+    insert into public.file_blobs as b (content_hash, storage_path, size, content_type, ref_count)
+    values (p_content_hash, p_storage_path, p_size, p_content_type, 1)
+    on conflict (content_hash) do update set ref_count = b.ref_count + 1
+    returning b.storage_path, b.thumbnail_path, b.ref_count, (xmax = 0) as created;
+$$;
+
+-- Drop one reference per array element and delete blobs nobody references.
+-- Returns the Storage objects the caller must remove.
+create or replace function public.release_file_blobs(p_content_hashes text[])
+returns table (storage_path text, thumbnail_path text)
+language plpgsql
+as $$
+begin
+    update public.file_blobs b
+       set ref_count = b.ref_count - r.n
+      from (select h, count(*)::int as n from unnest(p_content_hashes) as h group by h) r
+     where b.content_hash = r.h;
+
+    return query
+    delete from public.file_blobs b
+     where b.content_hash = any (p_content_hashes)
+       and b.ref_count <= 0
+    returning b.storage_path, b.thumbnail_path;
+end;
+$$;
+
+-- Recount references from `files`, repairing drift left by crashed requests,
+-- and delete blobs that stayed unreferenced for longer than p_min_age.
+-- Returns the Storage objects the caller must remove.
+create or replace function public.reconcile_file_blob_refs(p_min_age interval default interval '1 day')
+returns table (storage_path text, thumbnail_path text)
+language plpgsql
+as $$
+begin
+    update public.file_blobs b
+       set ref_count = c.n
+      from (
+        select fb.content_hash, count(f.content_hash)::int as n
+          from public.file_blobs fb
+          left join public.files f on f.content_hash = fb.content_hash
+         group by fb.content_hash
+      ) c
+     where b.content_hash = c.content_hash
+       and b.ref_count <> c.n;
+
+    return query
+    delete from public.file_blobs b
+     where b.ref_count <= 0
+       and b.created_at < now() - p_min_age
+    returning b.storage_path, b.thumbnail_path;
+end;
+$$;
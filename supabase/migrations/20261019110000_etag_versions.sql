@@ -0,0 +1,57 @@
+-- Validators for conditional GETs.
+-- Single rows (notes, courses, profiles) are versioned by updated_at, kept
+-- current by a trigger; per-user collections (tasks, exams) by a counter in
+-- collection_versions bumped on every write.
+create or replace function public.set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at = now();
+    return new;
+end;
+$$;
+
+alter table public.notes add column if not exists updated_at timestamptz not null default now();
+alter table public.courses add column if not exists updated_at timestamptz not null default now();
+alter table public.profiles add column if not exists updated_at timestamptz not null default now();
+
+drop trigger if exists notes_set_updated_at on public.notes;
+create trigger notes_set_updated_at before update on public.notes
+    for each row execute function public.set_updated_at();
+drop trigger if exists courses_set_updated_at on public.courses;
+create trigger courses_set_updated_at before update on public.courses
+    for each row execute function public.set_updated_at();
+drop trigger if exists profiles_set_updated_at on public.profiles;
+create trigger profiles_set_updated_at before update on public.profiles
+    for each row execute function public.set_updated_at();
+
+create table if not exists public.collection_versions (
+    user_id    uuid not null,
+    collection text not null,
+    version    bigint not null default 0,
+    updated_at timestamptz not null default now(),
+    primary key (user_id, collection)
+);
+
+create or replace function public.bump_collection_version()
+returns trigger
+language plpgsql
+as $$
+declare
+    owner uuid := case when tg_op = 'DELETE' then old.user_id else new.user_id end;
+begin
+    insert into public.collection_versions as v (user_id, collection, version, updated_at)
+    values (owner, tg_table_name, 1, now())
+    on conflict (user_id, collection)
+    do update set version = v.version + 1, updated_at = now();
+    return null;
+end;
+$$;
+
+drop trigger if exists tasks_bump_collection_version on public.tasks;
+create trigger tasks_bump_collection_version after insert or update or delete on public.tasks
+    for each row execute function public.bump_collection_version();
+drop trigger if exists exams_bump_collection_version on public.exams;
+create trigger exams_bump_collection_version after insert or update or delete on public.exams
+    for each row execute function public.bump_collection_version();
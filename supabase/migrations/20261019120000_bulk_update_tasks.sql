@@ -0,0 +1,23 @@
+-- Per-task partial updates for /tasks/bulk_update in one statement.
+-- p_items is a JSON array of objects carrying task_id and the fields to
+-- change; keys that are absent keep their current value. Only the caller's
+-- tasks are touched, and the updated rows are returned.
+create or replace function public.bulk_update_tasks(p_user_id uuid, p_items jsonb)
+returns setof public.tasks
+language sql
+as $$
+    update public.tasks t
+       set title       = case when i.item ? 'title'       then (i.r).title       else t.title end,
+           description = case when i.item ? 'description' then (i.r).description else t.description end,
+           category    = case when i.item ? 'category'    then (i.r).category    else t.category end,
+           due_date    = case when i.item ? 'due_date'    then (i.r).due_date    else t.due_date end,
+           completed   = case when i.item ? 'completed'   then (i.r).completed   else t.completed end
+      from (
+        -- Typing each item as a tasks row casts every field to its column type
+        select item, jsonb_populate_record(null::public.tasks, item) as r
+          from jsonb_array_elements(p_items) as item
+      ) i
+     where t.task_id = (i.r).task_id
+       and t.user_id = p_user_id
+    returning t.*;
+$$;
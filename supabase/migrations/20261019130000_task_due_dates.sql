@@ -0,0 +1,24 @@
+-- tasks.due_date becomes timestamptz so tasks can be filtered and sorted by
+-- date in the database. Existing free-form values are converted where they
+-- parse (date-only values become midnight in the session time zone, UTC on
+-- Supabase); anything else is cleared.
+create or replace function pg_temp.to_timestamptz(value text)
+returns timestamptz
+language plpgsql
+as $$
+begin
+    return nullif(btrim(value), '')::timestamptz;
+exception when others then
+    return null;
+end;
+$$;
+
+alter table public.tasks
+    alter column due_date type timestamptz using pg_temp.to_timestamptz(due_date::text);
+
+-- /tasks/get_tasks always filters by user_id, then by date range, category
+-- or completion, and sorts by due_date or created_at
+create index if not exists tasks_user_due_date_idx on public.tasks (user_id, due_date);
+create index if not exists tasks_user_category_due_date_idx on public.tasks (user_id, category, due_date);
+create index if not exists tasks_user_completed_due_date_idx on public.tasks (user_id, completed, due_date);
+create index if not exists tasks_user_created_at_idx on public.tasks (user_id, created_at);
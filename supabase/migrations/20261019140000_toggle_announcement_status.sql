@@ -0,0 +1,14 @@
+-- Flip a help announcement between open and closed in a single UPDATE.
+-- Concurrent toggles serialise on the row lock and each sees the previous
+-- result, so none is lost. Returns the updated row, or nothing when the
+-- announcement does not exist or belongs to someone else.
+create or replace function public.toggle_announcement_status(p_id uuid, p_user_id uuid)
+returns setof public.help_announcements
+language sql
+as $$
+    update public.help_announcements
+       set status = case when status = 'open' then 'closed' else 'open' end
+     where id = p_id
+       and user_id = p_user_id
+    returning *;
+$$;
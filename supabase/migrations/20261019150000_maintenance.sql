@@ -0,0 +1,48 @@
+-- Backend maintenance scheduler (backend/jobs/scheduler.py).
+
+-- Named leases elect one worker per job. A lease is granted when it is
+-- free, expired, or already held by the caller, and then lasts p_ttl_seconds.
+create table if not exists public.maintenance_leases (
+    name        text primary key,
+    holder      text not null,
+    acquired_at timestamptz not null default now(),
+    expires_at  timestamptz not null
+);
+
+create or replace function public.try_acquire_lease(p_name text, p_holder text, p_ttl_seconds integer)
+returns boolean
+language sql
+as $$
+    with granted as (
+        insert into public.maintenance_leases as l (name, holder, acquired_at, expires_at)
+        values (p_name, p_holder, now(), now() + make_interval(secs => p_ttl_seconds))
+        on conflict (name) do update
+           set holder = excluded.holder,
+               acquired_at = excluded.acquired_at,
+               expires_at = excluded.expires_at
+         where l.expires_at <= now() or l.holder = excluded.holder
+        returning 1
+    )
+    select exists (select 1 from granted);
+$$;
+
+-- Expired exams are deleted in batches, oldest first, through this index.
+-- (user_id, exam_date) serves the per-user upcoming-exams query.
+create index if not exists exams_exam_date_idx on public.exams (exam_date);
+create index if not exists exams_user_exam_date_idx on public.exams (user_id, exam_date);
+
+create or replace function public.purge_expired_exams(p_before timestamptz, p_batch_size integer default 1000)
+returns integer
+language sql
+as $$
+    with doomed as (
+        select id from public.exams
+         where exam_date < p_before
+         order by exam_date
+         limit p_batch_size
+           for update skip locked
+    ), deleted as (
+        delete from public.exams e using doomed where e.id = doomed.id returning 1
+    )
+    select count(*)::integer from deleted;
+$$;
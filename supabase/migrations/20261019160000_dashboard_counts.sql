@@ -0,0 +1,14 @@
+-- Counts shown on the /dashboard home screen, in one round trip.
+-- Each count is an index-only scan on the table's user_id index.
+create or replace function public.dashboard_counts(p_user_id uuid)
+returns json
+language sql
+stable
+as $$
+    select json_build_object(
+        'courses',       (select count(*) from public.courses where user_id = p_user_id),
+        'notes',         (select count(*) from public.notes where user_id = p_user_id),
+        'open_tasks',    (select count(*) from public.tasks where user_id = p_user_id and not completed),
+        'conversations', (select count(*) from public.conversations where user_id = p_user_id)
+    );
+$$;
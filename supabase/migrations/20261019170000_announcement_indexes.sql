@@ -0,0 +1,9 @@
+-- The board snapshot (api/announcements/feed.py) loads every open announcement;
+-- category, title search and suggestions are then answered from its in-memory indexes.
+create index if not exists help_announcements_open_idx
+    on public.help_announcements (created_at desc)
+    where status = 'open';
+
+-- /announcements/my_announcements and the owner-scoped writes
+create index if not exists help_announcements_user_created_idx
+    on public.help_announcements (user_id, created_at desc);
@@ -0,0 +1,71 @@
+-- Conversation list previews, kept on the conversation row so the chat
+-- sidebar renders from one query instead of loading every conversation's messages.
+alter table public.conversations
+    add column if not exists last_message text,
+    add column if not exists last_message_role text,
+    add column if not exists last_message_at timestamptz,
+    add column if not exists message_count integer not null default 0,
+    add column if not exists token_total bigint not null default 0;
+
+-- Backfill from existing messages. Token totals use the backend's fallback
+-- estimate (one token per 3.5 characters); new messages are counted exactly.
+update public.conversations c
+   set message_count = s.message_count,
+       token_total = s.token_total,
+       last_message = s.last_message,
+       last_message_role = s.last_message_role,
+       last_message_at = s.last_message_at
+  from (
+        select distinct on (m.conversation_id)
+               m.conversation_id,
+               count(*) over w as message_count,
+               sum(ceil(length(m.content) / 3.5)) over w as token_total,
+               left(regexp_replace(m.content, '\s+', ' ', 'g'), 120) as last_message,
+               m.role as last_message_role,
+               m.created_at as last_message_at
+          from public.messages m
+        window w as (partition by m.conversation_id)
+         order by m.conversation_id, m.created_at desc
+       ) s
+ where s.conversation_id = c.id;
+
+-- /ai/get-conversations: one user's conversations, most recently active first
+create index if not exists conversations_user_updated_idx
+    on public.conversations (user_id, updated_at desc);
+
+-- /ai/get-messages/{id}
+create index if not exists messages_conversation_created_idx
+    on public.messages (conversation_id, created_at);
+
+-- Store a message and fold it into its conversation's preview and counters
+-- in one statement. Concurrent appends serialise on the conversation row.
+-- Returns the updated preview, or null when the conversation does not exist.
+create or replace function public.append_message(
+    p_id uuid,
+    p_conversation_id uuid,
+    p_role text,
+    p_content text,
+    p_tokens integer,
+    p_preview text
+)
+returns json
+language sql
+as $$
+    with conversation as (
+        update public.conversations
+           set message_count = message_count + 1,
+               token_total = token_total + p_tokens,
+               last_message = p_preview,
+               last_message_role = p_role,
+               last_message_at = now(),
+               updated_at = now()
+         where id = p_conversation_id
+        returning id, updated_at, last_message, last_message_role, last_message_at, message_count, token_total
+    ), message as (
+        insert into public.messages (id, conversation_id, role, content, created_at)
+        select p_id, id, p_role, p_content, updated_at
+          from conversation
+        returning id
+    )
+    select row_to_json(conversation) from conversation, message;
+$$;
@@ -0,0 +1,74 @@
+-- Cold tier for chat history (backend/api/AIChat/archive.py, jobs/chat_archive.py).
+-- An archived conversation keeps its row as a stub; its messages live in one
+-- zstd-compressed object at archive_path in the filesb bucket.
+alter table public.conversations
+    add column if not exists archived_at timestamptz,
+    add column if not exists archive_path text,
+    add column if not exists archive_bytes bigint,
+    add column if not exists archive_raw_bytes bigint;
+
+-- Archive candidates: hot conversations idle the longest
+create index if not exists conversations_hot_updated_idx
+    on public.conversations (updated_at)
+    where archived_at is null;
+
+-- Delete a conversation's messages once their archive is uploaded, unless a
+-- message arrived since the archive was read. append_message updates the
+-- conversation row before inserting, so the row lock orders the two.
+create or replace function public.archive_conversation_messages(
+    p_conversation_id uuid,
+    p_path text,
+    p_bytes bigint,
+    p_raw_bytes bigint,
+    p_message_count integer
+)
+returns boolean
+language plpgsql
+as $$
+begin
+    perform 1 from public.conversations
+     where id = p_conversation_id and archived_at is null
+       for update;
+    if not found then
+        return false;
+    end if;
+    if (select count(*) from public.messages where conversation_id = p_conversation_id) <> p_message_count then
+        return false;
+    end if;
+
+    delete from public.messages where conversation_id = p_conversation_id;
+    update public.conversations
+       set archived_at = now(),
+           archive_path = p_path,
+           archive_bytes = p_bytes,
+           archive_raw_bytes = p_raw_bytes
+     where id = p_conversation_id;
+    return true;
+end;
+$$;
+
+-- Put archived messages back and clear the stub. Only the first of several
+-- concurrent calls restores anything; the others return false.
+create or replace function public.restore_conversation_messages(p_conversation_id uuid, p_messages jsonb)
+returns boolean
+language plpgsql
+as $$
+begin
+    update public.conversations
+       set archived_at = null,
+           archive_path = null,
+           archive_bytes = null,
+           archive_raw_bytes = null
+     where id = p_conversation_id
+       and archived_at is not null;
+    if not found then
+        return false;
+    end if;
+
+    insert into public.messages (id, conversation_id, role, content, created_at)
+    select id, conversation_id, role, content, created_at
+      from jsonb_populate_recordset(null::public.messages, p_messages)
+        on conflict (id) do nothing;
+    return true;
+end;
+$$;
@@ -0,0 +1,26 @@
+-- CRC-32 of each blob, recorded at upload, so course ZIP downloads can be
+-- laid out (and resumed) before any file is read. Older blobs get theirs
+-- the first time they are zipped.
+alter table public.file_blobs add column if not exists crc32 bigint;
+
+drop function if exists public.acquire_file_blob(text, text, bigint, text);
+
+-- Take one reference, creating the blob row on first use.
+-- `created` tells the caller whether it must upload the bytes.
+create or replace function public.acquire_file_blob(
+    p_content_hash text,
+    p_storage_path text,
+    p_size bigint,
+    p_content_type text,
+    p_crc32 bigint default null
+)
+returns table (storage_path text, thumbnail_path text, ref_count integer, created boolean)
+language sql
+as $$
+    insert into public.file_blobs as b (content_hash, storage_path, size, content_type, ref_count, crc32)
+    values (p_content_hash, p_storage_path, p_size, p_content_type, 1, p_crc32)
+    on conflict (content_hash) do update
+        set ref_count = b.ref_count + 1,
+            crc32 = coalesce(b.crc32, excluded.crc32)
+    returning b.storage_path, b.thumbnail_path, b.ref_count, (xmax = 0) as created;
+$$;
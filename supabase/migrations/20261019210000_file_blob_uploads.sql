@@ -0,0 +1,69 @@
+-- A blob row is shared only once its bytes are in Storage.
+-- `uploaded` is set after the upload succeeds; until then every uploader of
+-- the same content stores the bytes itself (an idempotent upsert), so a
+-- failed first upload can never leave later duplicates pointing at nothing.
+-- Existing rows start as not uploaded: the next identical upload re-stores
+-- their bytes, repairing blobs left without an object.
+alter table public.file_blobs
+    add column if not exists uploaded boolean not null default false,
+    add column if not exists acquired_at timestamptz not null default now();
+
+drop function if exists public.acquire_file_blob(text, text, bigint, text, bigint);
+
+-- Take one reference, creating the blob row on first use.
+-- `uploaded` false tells the caller it must store the bytes.
+create or replace function public.acquire_file_blob(
+    p_content_hash text,
+    p_storage_path text,
+    p_size bigint,
+    p_content_type text,
+    p_crc32 bigint default null
+)
+returns table (storage_path text, thumbnail_path text, ref_count integer, created boolean, uploaded boolean)
+language sql
+as $$
+    insert into public.file_blobs as b (content_hash, storage_path, size, content_type, ref_count, crc32)
+    values (p_content_hash, p_storage_path, p_size, p_content_type, 1, p_crc32)
+    on conflict (content_hash) do update
+        set ref_count = b.ref_count + 1,
+            crc32 = coalesce(b.crc32, excluded.crc32),
+            acquired_at = now()
+    returning b.storage_path, b.thumbnail_path, b.ref_count, (xmax = 0) as created, b.uploaded;
+$$;
+
+drop function if exists public.reconcile_file_blob_refs(interval);
+
+-- Recount references from `files`, repairing drift left by crashed requests,
+-- and delete blobs that stayed unreferenced for longer than p_min_age.
+-- A reference is taken before its `files` row is inserted, so blobs acquired
+-- within p_grace are left alone: their new row may not be visible yet.
+-- Returns the Storage objects the caller must remove.
+create or replace function public.reconcile_file_blob_refs(
+    p_min_age interval default interval '1 day',
+    p_grace interval default interval '1 hour'
+)
+returns table (storage_path text, thumbnail_path text)
+language plpgsql
+as $$
+begin
+    update public.file_blobs b
+       set ref_count = c.n
+      from (
+        select fb.content_hash, count(f.content_hash)::int as n
+          from public.file_blobs fb
+          left join public.files f on f.content_hash = fb.content_hash
+         where fb.acquired_at < now() - p_grace
+         group by fb.content_hash
+      ) c
+     where b.content_hash = c.content_hash
+       and b.ref_count <> c.n
+       and b.acquired_at < now() - p_grace;
+
+    return query
+    delete from public.file_blobs b
+     where b.ref_count <= 0
+       and b.created_at < now() - p_min_age
+       and b.acquired_at < now() - greatest(p_min_age, p_grace)
+    returning b.storage_path, b.thumbnail_path;
+end;
+$$;
@@ -0,0 +1,3 @@
+-- Files uploaded before deduplication have no `file_blobs` row, so their
+-- CRC-32 (computed on their first course ZIP download) is kept on the row.
+alter table public.files add column if not exists crc32 bigint;
@@ -0,0 +1,114 @@
+-- Release blobs in two steps so a concurrent upload of the same content can
+-- never lose its object to a late Storage remove.
+-- Dropping the last reference only tombstones the row (`released_at`); the
+-- row is deleted by `delete_released_file_blobs` once its objects are gone.
+-- An upload that finds a tombstone revives the row under a fresh storage
+-- path, so the remove still in flight cannot touch the new object.
+alter table public.file_blobs add column if not exists released_at timestamptz;
+
+-- Take one reference, creating the blob row on first use or reviving a
+-- tombstoned one under a new path. `uploaded` false tells the caller it must
+-- store the bytes at the returned storage_path.
+create or replace function public.acquire_file_blob(
+    p_content_hash text,
+    p_storage_path text,
+    p_size bigint,
+    p_content_type text,
+    p_crc32 bigint default null
+)
+returns table (storage_path text, thumbnail_path text, ref_count integer, created boolean, uploaded boolean)
+language sql
+as $$
+    insert into public.file_blobs as b (content_hash, storage_path, size, content_type, ref_count, crc32)
+    values (p_content_hash, p_storage_path, p_size, p_content_type, 1, p_crc32)
+    on conflict (content_hash) do update
+        set ref_count = case when b.released_at is null then b.ref_count + 1 else 1 end,
+            storage_path = case when b.released_at is null then b.storage_path
+                                else excluded.storage_path || '.' || substr(md5(random()::text), 1, 8) end,
+            thumbnail_path = case when b.released_at is null then b.thumbnail_path end,
+            uploaded = b.uploaded and b.released_at is null,
+            released_at = null,
+            crc32 = coalesce(b.crc32, excluded.crc32),
+            acquired_at = now()
+    returning b.storage_path, b.thumbnail_path, b.ref_count, (xmax = 0) as created, b.uploaded;
+$$;
+
+-- Drop one reference per array element and tombstone blobs nobody references.
+-- Returns the Storage objects the caller must remove before calling
+-- delete_released_file_blobs with their storage paths.
+create or replace function public.release_file_blobs(p_content_hashes text[])
+returns table (storage_path text, thumbnail_path text)
+language plpgsql
+as $$
+begin
+    update public.file_blobs b
+       set ref_count = b.ref_count - r.n
+      from (select h, count(*)::int as n from unnest(p_content_hashes) as h group by h) r
+     where b.content_hash = r.h
+       and b.released_at is null;
+
+    return query
+    update public.file_blobs b
+       set released_at = now()
+     where b.content_hash = any (p_content_hashes)
+       and b.ref_count <= 0
+       and b.released_at is null
+    returning b.storage_path, b.thumbnail_path;
+end;
+$$;
+
+-- Delete tombstones whose objects have been removed. A row revived since it
+-- was tombstoned has a new path and no tombstone, so it is never matched.
+create or replace function public.delete_released_file_blobs(p_storage_paths text[])
+returns integer
+language sql
+as $$
+    with deleted as (
+        delete from public.file_blobs b
+         where b.storage_path = any (p_storage_paths)
+           and b.released_at is not null
+        returning 1
+    )
+    select count(*)::int from deleted;
+$$;
+
+-- Recount references from `files`, repairing drift left by crashed requests,
+-- and tombstone blobs that stayed unreferenced for longer than p_min_age.
+-- Tombstones older than p_grace (a release that crashed before deleting its
+-- row) are returned again so their removal is retried.
+-- Returns the Storage objects the caller must remove before calling
+-- delete_released_file_blobs.
+create or replace function public.reconcile_file_blob_refs(
+    p_min_age interval default interval '1 day',
+    p_grace interval default interval '1 hour'
+)
+returns table (storage_path text, thumbnail_path text)
+language plpgsql
+as $$
+begin
+    update public.file_blobs b
+       set ref_count = c.n
+      from (
+        select fb.content_hash, count(f.content_hash)::int as n
+          from public.file_blobs fb
+          left join public.files f on f.content_hash = fb.content_hash
+         where fb.acquired_at < now() - p_grace
+           and fb.released_at is null
+         group by fb.content_hash
+      ) c
+     where b.content_hash = c.content_hash
+       and b.ref_count <> c.n
+       and b.acquired_at < now() - p_grace
+       and b.released_at is null;
+
+    return query
+    update public.file_blobs b
+       set released_at = now()
+     where (b.released_at is null
+            and b.ref_count <= 0
+            and b.created_at < now() - p_min_age
+            and b.acquired_at < now() - greatest(p_min_age, p_grace))
+        or b.released_at < now() - p_grace
+    returning b.storage_path, b.thumbnail_path;
+end;
+$$;
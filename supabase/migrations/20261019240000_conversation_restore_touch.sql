@@ -0,0 +1,26 @@
+-- A restored conversation was just opened: bump updated_at so the archive job
+-- does not pick it up again on its next run.
+create or replace function public.restore_conversation_messages(p_conversation_id uuid, p_messages jsonb)
+returns boolean
+language plpgsql
+as $$
+begin
+    update public.conversations
+       set archived_at = null,
+           archive_path = null,
+           archive_bytes = null,
+           archive_raw_bytes = null,
+           updated_at = now()
+     where id = p_conversation_id
+       and archived_at is not null;
+    if not found then
+        return false;
+    end if;
+
+    insert into public.messages (id, conversation_id, role, content, created_at)
+    select id, conversation_id, role, content, created_at
+      from jsonb_populate_recordset(null::public.messages, p_messages)
+        on conflict (id) do nothing;
+    return true;
+end;
+$$;